@@ -1,32 +1,50 @@
 """
 Action Executor
-Führt Desktop-Aktionen mit PyAutoGUI aus
+Führt Desktop-Aktionen über das konfigurierte Input-Backend aus
 """
 
 import logging
 import time
-import pyautogui
 from typing import Dict, Any, Optional, Tuple
 import sys
 
 import config
+from capture_backends import create_capture_backend
+from input_backends import FAILSAFE_ERRORS, InputBackend, create_input_backend, timing_policy
+from metrics import get_registry
+from settle_detector import SettleDetector
+from typing_engine import TypingEngine
 
 logger = logging.getLogger(__name__)
 
+# Actions mit Maus- oder Tastatureingaben (Notfall-Stop und Pause laut Timing-Policy)
+INPUT_ACTIONS = ("click", "double_click", "right_click", "move_mouse", "type_text", "press_key",
+                 "scroll", "hotkey")
+
 
 class ActionExecutor:
     """Führt Desktop-Aktionen aus"""
 
-    def __init__(self):
-        # Konfiguriere PyAutoGUI
-        pyautogui.PAUSE = config.PYAUTOGUI_PAUSE
-        pyautogui.FAILSAFE = config.PYAUTOGUI_FAILSAFE
+    def __init__(self, screen_size: Tuple[int, int] = None, settle_detector: SettleDetector = None,
+                 input_backend: InputBackend = None):
+        # Pausen kommen aus INPUT_TIMING_POLICIES (mit Settle-Erkennung genügt eine kurze Pause)
+        self.input = input_backend or create_input_backend(screen_size=screen_size)
+        self.settle_detector = settle_detector
+        self.typing_engine = TypingEngine(self.input)
 
         self.action_count = 0
         self.failed_actions = 0
-        self.screen_width, self.screen_height = pyautogui.size()
-
-        logger.info(f"ActionExecutor initialisiert (Bildschirm: {self.screen_width}x{self.screen_height})")
+        # Letzte Warte-Action lief ins Timeout (ausgeführt, aber Bildschirm nicht wie erwartet)
+        self.last_wait_timed_out = False
+        self.wait_timeouts = 0
+        self.metrics = get_registry()
+        # Bildschirmgröße vom Capture-Backend übernehmen statt erneut abzufragen
+        if screen_size is None:
+            screen_size = self.input.size()
+        self.screen_width, self.screen_height = screen_size
+
+        logger.info(f"ActionExecutor initialisiert (Bildschirm: {self.screen_width}x{self.screen_height}, "
+                    f"Input: {self.input.name})")
 
     def execute_action(self, action: Dict) -> bool:
         """
@@ -36,11 +54,13 @@ class ActionExecutor:
             action: Action Dictionary mit 'action' und 'parameters'
 
         Returns:
-            True bei Erfolg, False bei Fehler
+            True bei Erfolg, False bei Fehler (Timeout einer Warte-Action
+            zählt als Erfolg, siehe last_wait_timed_out)
         """
         action_type = action.get("action")
         parameters = action.get("parameters", {})
         is_critical = action.get("is_critical", False)
+        self.last_wait_timed_out = False
 
         logger.info(f"Führe Action aus: {action_type} {parameters}")
 
@@ -51,7 +71,7 @@ class ActionExecutor:
                 return False
 
         # Validiere Koordinaten falls nötig
-        if action_type in ["click", "double_click", "right_click", "move_mouse"]:
+        if action_type in config.COORDINATE_ACTIONS:
             x, y = parameters.get("x"), parameters.get("y")
             if not self._validate_coordinates(x, y):
                 logger.error(f"Ungültige Koordinaten: ({x}, {y})")
@@ -62,6 +82,12 @@ class ActionExecutor:
         try:
             success = self._execute_action_internal(action_type, parameters)
 
+            # Pause laut Timing-Policy (nur nach Eingaben, Warte-Actions warten selbst)
+            if success and action_type in INPUT_ACTIONS:
+                pause = timing_policy(action_type, self.settle_detector is not None)["pause"]
+                if pause > 0:
+                    time.sleep(pause)
+
             if success:
                 self.action_count += 1
                 logger.info(f"✓ Action erfolgreich: {action_type}")
@@ -69,8 +95,13 @@ class ActionExecutor:
                 self.failed_actions += 1
                 logger.error(f"✗ Action fehlgeschlagen: {action_type}")
 
+            self.metrics.inc("actions_total", action=action_type, result="ok" if success else "failed")
             return success
 
+        except FAILSAFE_ERRORS:
+            self.failed_actions += 1
+            raise
+
         except Exception as e:
             logger.error(f"Fehler bei Action Ausführung: {e}")
             self.failed_actions += 1
@@ -87,42 +118,47 @@ class ActionExecutor:
         Returns:
             True bei Erfolg
         """
+        policy = timing_policy(action_type)
         try:
+            # Notfall-Stop vor jeder Eingabe prüfen (wird nicht als Fehler abgefangen)
+            if action_type in INPUT_ACTIONS:
+                self.input.check_failsafe()
+
             if action_type == "click":
-                x, y = parameters["x"], parameters["y"]
-                pyautogui.click(x, y, duration=config.MOUSE_MOVE_DURATION)
+                x, y = int(parameters["x"]), int(parameters["y"])
+                self.input.click(x, y, duration=policy["move_duration"])
                 return True
 
             elif action_type == "double_click":
-                x, y = parameters["x"], parameters["y"]
-                pyautogui.doubleClick(x, y, duration=config.MOUSE_MOVE_DURATION)
+                x, y = int(parameters["x"]), int(parameters["y"])
+                self.input.click(x, y, clicks=2, interval=policy["click_interval"],
+                                 duration=policy["move_duration"])
                 return True
 
             elif action_type == "right_click":
-                x, y = parameters["x"], parameters["y"]
-                pyautogui.rightClick(x, y, duration=config.MOUSE_MOVE_DURATION)
+                x, y = int(parameters["x"]), int(parameters["y"])
+                self.input.click(x, y, button="right", duration=policy["move_duration"])
                 return True
 
             elif action_type == "move_mouse":
-                x, y = parameters["x"], parameters["y"]
-                pyautogui.moveTo(x, y, duration=config.MOUSE_MOVE_DURATION)
+                x, y = int(parameters["x"]), int(parameters["y"])
+                self.input.move(x, y, duration=policy["move_duration"])
                 return True
 
             elif action_type == "type_text":
                 text = parameters["text"]
-                pyautogui.write(text, interval=config.TYPING_INTERVAL)
-                return True
+                return self.typing_engine.type_text(str(text))
 
             elif action_type == "press_key":
                 key = parameters["key"]
-                pyautogui.press(key)
+                self.input.press(key)
                 return True
 
             elif action_type == "scroll":
                 amount = parameters.get("amount", 0)
-                # PyAutoGUI scroll: positive = up, negative = down
+                # Input-Backend scroll: positive = up, negative = down
                 # Unsere Konvention: positive = down, negative = up
-                pyautogui.scroll(-amount)
+                self.input.scroll(-int(amount))
                 return True
 
             elif action_type == "hotkey":
@@ -135,7 +171,7 @@ class ActionExecutor:
                     logger.error(f"Hotkey nicht erlaubt: {keys}")
                     return False
 
-                pyautogui.hotkey(*keys)
+                self.input.hotkey(*keys)
                 return True
 
             elif action_type == "wait":
@@ -143,6 +179,24 @@ class ActionExecutor:
                 time.sleep(seconds)
                 return True
 
+            elif action_type in ("wait_until_changed", "wait_until_stable"):
+                timeout = min(float(parameters.get("timeout", config.SETTLE_TIMEOUT)),
+                              config.WAIT_ACTION_MAX_TIMEOUT)
+                if self.settle_detector is None:
+                    # Ohne Settle-Erkennung bleibt nur blindes Warten
+                    time.sleep(timeout)
+                    return True
+                if action_type == "wait_until_changed":
+                    reached = self.settle_detector.wait_until_changed(timeout=timeout)
+                else:
+                    reached = self.settle_detector.wait_until_stable(timeout=timeout)
+                # Ein Timeout ist keine fehlgeschlagene Ausführung, nur keine (stabile) Änderung
+                if not reached:
+                    self.last_wait_timed_out = True
+                    self.wait_timeouts += 1
+                    logger.warning(f"{action_type}: Timeout nach {timeout:.1f}s")
+                return True
+
             elif action_type == "done":
                 logger.info("Task als abgeschlossen markiert")
                 return True
@@ -151,6 +205,9 @@ class ActionExecutor:
                 logger.error(f"Unbekannte Action: {action_type}")
                 return False
 
+        except FAILSAFE_ERRORS:
+            raise
+
         except Exception as e:
             logger.error(f"Fehler bei {action_type}: {e}")
             return False
@@ -224,7 +281,7 @@ class ActionExecutor:
         Returns:
             (x, y) Tupel
         """
-        return pyautogui.position()
+        return self.input.position()
 
     def get_screen_size(self) -> Tuple[int, int]:
         """
@@ -243,8 +300,11 @@ class ActionExecutor:
             True bei Erfolg
         """
         try:
-            screenshot = pyautogui.screenshot()
-            return screenshot is not None
+            capture = create_capture_backend()
+            try:
+                return capture.grab() is not None
+            finally:
+                capture.close()
         except Exception as e:
             logger.error(f"Screenshot Test fehlgeschlagen: {e}")
             return False
@@ -254,9 +314,12 @@ class ActionExecutor:
         return {
             "total_actions": self.action_count,
             "failed_actions": self.failed_actions,
+            "wait_timeouts": self.wait_timeouts,
             "success_rate": (self.action_count / max(self.action_count + self.failed_actions, 1)) * 100,
             "screen_size": (self.screen_width, self.screen_height),
-            "failsafe_enabled": pyautogui.FAILSAFE
+            "failsafe_enabled": config.INPUT_FAILSAFE,
+            "input_backend": self.input.name,
+            "typing": self.typing_engine.get_stats()
         }
 
 
@@ -0,0 +1,169 @@
+"""
+Action Schema
+Parser und vorkompilierte Prüfregeln für die Actions der KI (ausführliches und kompaktes Protokoll)
+"""
+
+import json
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Kurze Schlüssel des kompakten Protokolls -> Feldnamen
+COMPACT_KEYS = {
+    "a": "action",
+    "p": "parameters",
+    "c": "confidence",
+    "k": "is_critical",
+    "r": "reasoning",
+    "n": "plan",
+    "e": "expect_change",
+}
+SHORT_KEYS = {name: key for key, name in COMPACT_KEYS.items()}
+
+# Pflichtparameter je Action (alle anderen Parameter sind optional)
+REQUIRED_PARAMETERS = {
+    **{action: ("x", "y") for action in config.COORDINATE_ACTIONS},
+    "type_text": ("text",),
+    "press_key": ("key",),
+    "hotkey": ("keys",),
+    "zoom": ("x", "y", "width", "height"),
+}
+
+_decoder = json.JSONDecoder()
+_ACTION_KEYS = ("action", "a")
+
+
+def extract_json_object(text: str) -> Optional[Dict]:
+    """
+    Findet das Action-Objekt in einer Antwort mit einem Durchlauf von raw_decode
+
+    Beginnt am ersten "{" und dekodiert genau ein JSON-Objekt; Text davor
+    und danach (```json, Erklärungen) wird ignoriert. Nur wenn dort kein
+    vollständiges Objekt mit Action-Feld steht, geht die Suche beim nächsten
+    "{" weiter.
+
+    Args:
+        text: Antwort der KI
+
+    Returns:
+        Dictionary oder None
+    """
+    position = text.find("{")
+    while position != -1:
+        try:
+            obj, end = _decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find("{", position + 1)
+            continue
+        if isinstance(obj, dict) and any(key in obj for key in _ACTION_KEYS):
+            return obj
+        position = text.find("{", end)
+    return None
+
+
+def expand_keys(obj: Dict) -> Dict:
+    """
+    Übersetzt die kurzen Schlüssel des kompakten Protokolls (auch im Plan)
+
+    Args:
+        obj: Action mit kurzen oder langen Schlüsseln
+
+    Returns:
+        Neues Dictionary mit langen Schlüsseln
+    """
+    expanded = {}
+    for key, value in obj.items():
+        name = COMPACT_KEYS.get(key, key)
+        if name in expanded and name != key:
+            continue  # Langer Schlüssel hat Vorrang
+        expanded[name] = value
+
+    plan = expanded.get("plan")
+    if isinstance(plan, list):
+        expanded["plan"] = [expand_keys(step) if isinstance(step, dict) else step for step in plan]
+    if "is_critical" in expanded:
+        expanded["is_critical"] = bool(expanded["is_critical"])
+    return expanded
+
+
+class ActionSchema:
+    """
+    Einmal aus der Konfiguration kompilierte Prüfregeln für Actions
+
+    Gemeinsam genutzt vom Parser (Pflichtfelder, Plan-Schritte) und von
+    GroqHandler.validate_action (erlaubte Actions und Pflichtparameter).
+    """
+
+    def __init__(self, allowed_actions: Iterable[str] = None, compact: bool = None):
+        compact = config.COMPACT_PROTOCOL_ENABLED if compact is None else compact
+        self.allowed: FrozenSet[str] = frozenset(config.ALLOWED_ACTIONS if allowed_actions is None
+                                                 else allowed_actions)
+        self.required: Dict[str, FrozenSet[str]] = {action: frozenset(parameters)
+                                                    for action, parameters in REQUIRED_PARAMETERS.items()}
+        # Im kompakten Protokoll ist das Reasoning optional
+        self.required_fields = ("action", "parameters", "confidence") + (() if compact else ("reasoning",))
+
+    def missing_fields(self, action: Dict) -> Optional[str]:
+        """Fehlende Pflichtfelder einer geparsten Antwort als Text oder None"""
+        missing = [name for name in self.required_fields if name not in action]
+        return ", ".join(missing) if missing else None
+
+    def check(self, action: Any, extra_actions: Iterable[str] = ()) -> Optional[str]:
+        """
+        Prüft Action Type und Parameter
+
+        Args:
+            action: Action Dictionary
+            extra_actions: Zusätzlich erlaubte Actions (z.B. "zoom")
+
+        Returns:
+            Fehlermeldung oder None wenn die Action gültig ist
+        """
+        if not isinstance(action, dict):
+            return "Action muss ein Dictionary sein"
+
+        action_type = action.get("action")
+        if action_type not in self.allowed and action_type not in extra_actions:
+            return f"Action nicht erlaubt: {action_type}"
+
+        parameters = action.get("parameters")
+        if not isinstance(parameters, dict):
+            return "Parameters müssen ein Dictionary sein"
+
+        required = self.required.get(action_type)
+        if required and not required.issubset(parameters):
+            missing = ", ".join(sorted(required.difference(parameters)))
+            return f"{action_type} benötigt Parameter: {missing}"
+        return None
+
+
+def main():
+    """Test-Funktion für das Action Schema"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Action Schema Test")
+    print("=" * 50)
+
+    responses = [
+        '{"a":"click","p":{"x":10,"y":20},"c":0.9,"k":0}',
+        'Hier die Antwort:\n```json\n{"action": "type_text", "parameters": {"text": "}{"}, '
+        '"reasoning": "Feld ist aktiv", "confidence": 0.8}\n```\nWeitere {Klammern}',
+        'Beispiel {"x": 1} und dann {"a": "press_key", "p": {}, "c": 0.7}',
+        '{"a": "click", "p": {"x": 1',
+    ]
+    schema = ActionSchema(compact=True)
+    for text in responses:
+        obj = extract_json_object(text)
+        action = expand_keys(obj) if obj is not None else None
+        error = schema.check(action) if action is not None else "kein JSON"
+        print(f"{text[:40]!r:45} -> {action} | {error or 'gültig'}")
+
+
+if __name__ == "__main__":
+    main()
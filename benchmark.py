@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Benchmark
+Misst die komplette Schleife (DesktopController.execute_task) auf einem virtuellen Display (Xvfb)
+gegen den lokalen Mock Server und vergleicht das Ergebnis mit gespeicherten Baselines
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Gemessene Abschnitte eines Schritts (in Reihenfolge der Schleife)
+STAGES = ("capture", "resize", "encode", "request", "parse", "execute", "settle")
+
+
+class StageTimer:
+    """
+    Misst die Zeit pro Abschnitt über eingehängte Wrapper
+
+    Gemessen wird exklusiv: läuft ein Abschnitt innerhalb eines anderen
+    (parse innerhalb des Requests, settle innerhalb einer wait-Action),
+    zählt seine Zeit nur für den inneren Abschnitt. Der Stack ist pro
+    Thread, damit der Hintergrund-Capture die Messung nicht vermischt.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def wrap(self, obj, attribute: str, stage: str):
+        """Ersetzt obj.attribute durch eine gemessene Variante"""
+        original = getattr(obj, attribute)
+
+        def timed(*args, **kwargs):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.samples[stage].append(elapsed - nested)
+
+        setattr(obj, attribute, timed)
+
+    def reset(self):
+        """Verwirft alle bisherigen Messungen (z.B. nach dem Aufwärmen)"""
+        with self._lock:
+            self.samples.clear()
+
+    def summary(self, steps: int, wall_time: float) -> Dict:
+        """
+        Zeiten pro Abschnitt
+
+        Args:
+            steps: Anzahl der gemessenen Schritte
+            wall_time: Gesamtdauer der gemessenen Durchläufe (Sekunden)
+
+        Returns:
+            {stage: {"ms_per_step", "calls", "p50_ms", "p95_ms"}} inklusive "other"
+        """
+        stages = {}
+        measured = 0.0
+        with self._lock:
+            for stage in STAGES:
+                samples = np.array(self.samples.get(stage, []), dtype=np.float64)
+                total = float(samples.sum())
+                measured += total
+                stages[stage] = {
+                    "ms_per_step": total * 1000 / max(steps, 1),
+                    "calls": int(samples.size),
+                    "p50_ms": float(np.percentile(samples, 50) * 1000) if samples.size else 0.0,
+                    "p95_ms": float(np.percentile(samples, 95) * 1000) if samples.size else 0.0,
+                }
+        # Alles außerhalb der Abschnitte (Request Body, Validierung, Logging, Ausgaben)
+        stages["other"] = {"ms_per_step": max(wall_time - measured, 0.0) * 1000 / max(steps, 1),
+                           "calls": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+        return stages
+
+
+def scripted_actions(steps: int, screen_size: Tuple[int, int]) -> List[Dict]:
+    """
+    Feste Folge von Actions für den Mock Server (letzter Schritt "done")
+
+    Args:
+        steps: Anzahl der Schritte inklusive "done"
+        screen_size: Bildschirmgröße für die Klickpositionen
+
+    Returns:
+        Liste von Actions
+    """
+    width, height = screen_size
+    actions = []
+    for index in range(steps - 1):
+        # Raster im inneren Bereich (Failsafe-Ecken meiden)
+        x = int(width * (0.15 + 0.7 * ((index * 7) % 10) / 9))
+        y = int(height * (0.15 + 0.7 * ((index * 3) % 5) / 4))
+        kind = index % 4
+        if kind == 0:
+            action = {"action": "click", "parameters": {"x": x, "y": y}}
+        elif kind == 1:
+            action = {"action": "type_text", "parameters": {"text": f"schritt {index}"}}
+        elif kind == 2:
+            action = {"action": "double_click", "parameters": {"x": x, "y": y}}
+        else:
+            action = {"action": "scroll", "parameters": {"amount": 3}}
+        action.update({"confidence": 0.95, "is_critical": False, "reasoning": f"Benchmark Schritt {index + 1}"})
+        actions.append(action)
+    actions.append({"action": "done", "parameters": {"message": "Benchmark abgeschlossen"},
+                    "confidence": 1.0, "is_critical": False, "reasoning": "Alle Schritte ausgeführt"})
+    return actions
+
+
+def instrument(controller, timer: StageTimer):
+    """Hängt die Messpunkte in einen DesktopController ein"""
+    handler = controller.screenshot_handler
+    timer.wrap(handler, "capture_screenshot", "capture")
+    timer.wrap(handler, "resize_screenshot", "resize")
+    timer.wrap(handler, "image_to_base64_bytes", "encode")
+    timer.wrap(controller.groq_handler, "_make_api_request", "request")
+    timer.wrap(controller.groq_handler, "_make_streaming_request", "request")
+    timer.wrap(controller.groq_handler, "_parse_action_response", "parse")
+    timer.wrap(controller.action_executor, "execute_action", "execute")
+    if controller.settle_detector is not None:
+        timer.wrap(controller.settle_detector, "wait_until_stable", "settle")
+        timer.wrap(controller.settle_detector, "wait_until_changed", "settle")
+
+
+def _rss_mb() -> float:
+    """Aktueller Resident Set Size des Prozesses in MB (Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def run_worker(size: Tuple[int, int], steps: int, runs: int, latency: str, seed: int = 0) -> Dict:
+    """
+    Führt die Durchläufe im aktuellen Prozess aus (DISPLAY muss gesetzt sein)
+
+    Args:
+        size: Erwartete Bildschirmgröße
+        steps: Schritte pro Task inklusive "done"
+        runs: Gemessene Durchläufe (zusätzlich ein Aufwärm-Durchlauf)
+        latency: Latenzverteilung des Mock Servers (siehe parse_latency)
+        seed: Startwert der Latenzverteilung
+
+    Returns:
+        Ergebnis-Dictionary
+    """
+    from mock_groq_server import MockGroqServer, parse_latency
+
+    server = MockGroqServer(scripted_actions(steps, size), latency=parse_latency(latency, seed)).start()
+    config.GROQ_API_ENDPOINT = server.url
+    config.GROQ_API_KEY = config.GROQ_API_KEY or "benchmark"
+    config.RATE_LIMIT_ENABLED = False  # Der Mock hat keine Limits
+    config.MAX_TASK_STEPS = max(config.MAX_TASK_STEPS, steps + 1)
+
+    from main import DesktopController
+
+    controller = DesktopController()
+    screen_size = controller.screenshot_handler.get_screen_size()
+    if tuple(screen_size) != tuple(size):
+        logger.warning(f"Bildschirmgröße {screen_size} statt {size}")
+
+    timer = StageTimer()
+    instrument(controller, timer)
+    task = f"Benchmark mit {steps} Schritten"
+
+    try:
+        # Aufwärmen: Imports, Verbindungsaufbau, Encoder-Statistik
+        controller.execute_task(task)
+        server.reset()
+        timer.reset()
+        rss_start = _rss_mb()
+        requests_start = controller.groq_handler.request_count
+
+        total_steps, wall_time, failures = 0, 0.0, 0
+        for _ in range(runs):
+            start = time.perf_counter()
+            success = controller.execute_task(task)
+            wall_time += time.perf_counter() - start
+            total_steps += controller.task_steps
+            failures += 0 if success else 1
+            server.reset()
+
+        return {
+            "screen_size": list(screen_size),
+            "steps": steps,
+            "runs": runs,
+            "failures": failures,
+            "steps_per_sec": total_steps / wall_time if wall_time else 0.0,
+            "ms_per_step": wall_time * 1000 / max(total_steps, 1),
+            "stages": timer.summary(total_steps, wall_time),
+            "memory": {
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "rss_growth_mb": _rss_mb() - rss_start,
+            },
+            "api_requests": controller.groq_handler.request_count - requests_start,
+        }
+    finally:
+        controller.screenshot_handler.close()
+        server.stop()
+
+
+def run_scene(size: Tuple[int, int]):
+    """
+    Vollbild-Fenster als Ziel der Actions
+
+    Zeigt ein Raster mit Text (realistischer Encoding-Aufwand) und reagiert
+    auf Klicks, Tasten und Scrollen, damit jede Action eine sichtbare
+    Änderung erzeugt, auf die Änderungs- und Settle-Erkennung warten.
+    """
+    import tkinter
+
+    width, height = size
+    root = tkinter.Tk()
+    root.geometry(f"{width}x{height}+0+0")
+    root.overrideredirect(True)
+    canvas = tkinter.Canvas(root, width=width, height=height, background="#eeeeee", highlightthickness=0)
+    canvas.pack()
+
+    rng = np.random.default_rng(0)
+    for row in range(0, height, 40):
+        for column in range(0, width, 160):
+            shade = int(rng.integers(180, 240))
+            canvas.create_rectangle(column + 4, row + 4, column + 152, row + 36,
+                                    fill=f"#{shade:02x}{shade:02x}ff", outline="#888888")
+            canvas.create_text(column + 78, row + 20, text=f"Element {row // 40}.{column // 160}")
+    status = canvas.create_text(width // 2, 12, text="", font=("TkDefaultFont", 14))
+    events = {"count": 0}
+
+    def changed(description: str):
+        events["count"] += 1
+        canvas.itemconfigure(status, text=f"{events['count']}: {description}")
+
+    def on_click(event):
+        canvas.create_oval(event.x - 12, event.y - 12, event.x + 12, event.y + 12, fill="#d04020")
+        changed(f"Klick {event.x},{event.y}")
+
+    canvas.bind("<Button-1>", on_click)
+    canvas.bind("<Button-3>", on_click)
+    canvas.bind("<Button-4>", lambda event: (canvas.move("all", 0, 40), changed("Scroll hoch")))
+    canvas.bind("<Button-5>", lambda event: (canvas.move("all", 0, -40), changed("Scroll runter")))
+    root.bind("<Key>", lambda event: changed(f"Taste {event.keysym}"))
+    canvas.focus_set()
+
+    root.after(200, lambda: print("ready", flush=True))
+    root.mainloop()
+
+
+class VirtualDisplay:
+    """Startet Xvfb mit der gewünschten Größe und die Testszene darauf"""
+
+    def __init__(self, size: Tuple[int, int], display: str = None):
+        self.size = size
+        self.display = display
+        self._xvfb: Optional[subprocess.Popen] = None
+        self._scene: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "VirtualDisplay":
+        if self.display is None:
+            if shutil.which("Xvfb") is None:
+                raise RuntimeError("Xvfb nicht gefunden (z.B. apt install xvfb)")
+            # -displayfd: Xvfb wählt eine freie Displaynummer und meldet sie
+            self._xvfb = subprocess.Popen(
+                ["Xvfb", "-displayfd", "1", "-screen", "0", f"{self.size[0]}x{self.size[1]}x24",
+                 "-nolisten", "tcp"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            number = self._xvfb.stdout.readline().strip()
+            if not number:
+                raise RuntimeError("Xvfb konnte nicht gestartet werden")
+            self.display = f":{number}"
+
+        self._scene = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--scene", "--size", f"{self.size[0]}x{self.size[1]}"],
+            stdout=subprocess.PIPE, env=dict(os.environ, DISPLAY=self.display), text=True)
+        if self._scene.stdout.readline().strip() != "ready":
+            raise RuntimeError("Testszene konnte nicht gestartet werden")
+        return self
+
+    def __exit__(self, *exc_info):
+        for process in (self._scene, self._xvfb):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=5)
+
+
+def run_case(size: Tuple[int, int], steps: int, runs: int, latency: str,
+             display: str = None, verbose: bool = False) -> Dict:
+    """
+    Misst eine Kombination aus Bildschirmgröße und Task-Länge in einem eigenen Prozess
+
+    Der eigene Prozess sorgt für saubere Speicherwerte und dafür, dass
+    PyAutoGUI das richtige DISPLAY beim Import sieht.
+    """
+    with VirtualDisplay(size, display) as virtual_display, \
+            tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+        command = [sys.executable, os.path.abspath(__file__), "--worker",
+                   "--size", f"{size[0]}x{size[1]}", "--steps", str(steps), "--runs", str(runs),
+                   "--latency", latency, "--result-file", result_file.name]
+        output = None if verbose else subprocess.DEVNULL
+        try:
+            subprocess.run(command, env=dict(os.environ, DISPLAY=virtual_display.display),
+                           stdout=output, stderr=output, check=True)
+            with open(result_file.name, "r", encoding="utf-8") as f:
+                return json.load(f)
+        finally:
+            os.unlink(result_file.name)
+
+
+def case_key(result: Dict) -> str:
+    """Schlüssel einer Messung in der Baseline-Datei"""
+    width, height = result["screen_size"]
+    return f"{width}x{height}/{result['steps']}"
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float = None, min_delta: float = None) -> List[str]:
+    """
+    Vergleicht eine Messung mit ihrer Baseline
+
+    Ein Abschnitt gilt als Regression, wenn er pro Schritt um mehr als
+    tolerance (relativ) und min_delta (absolut, ms) langsamer ist.
+
+    Returns:
+        Liste der Regressionen als Text (leer = keine)
+    """
+    tolerance = config.BENCHMARK_TOLERANCE if tolerance is None else tolerance
+    min_delta = config.BENCHMARK_MIN_DELTA_MS if min_delta is None else min_delta
+
+    regressions = []
+    for stage in STAGES + ("other",):
+        current = result["stages"][stage]["ms_per_step"]
+        reference = baseline["stages"].get(stage, {}).get("ms_per_step")
+        if reference is None:
+            continue
+        if current > reference * (1 + tolerance) and current - reference > min_delta:
+            regressions.append(f"{stage}: {reference:.1f} -> {current:.1f} ms/Schritt "
+                               f"(+{(current / max(reference, 1e-9) - 1) * 100:.0f}%)")
+
+    reference = baseline.get("steps_per_sec")
+    if reference and result["steps_per_sec"] < reference / (1 + tolerance):
+        regressions.append(f"Schritte/s: {reference:.2f} -> {result['steps_per_sec']:.2f}")
+    return regressions
+
+
+def load_baselines(path: str) -> Dict:
+    """Lädt die Baseline-Datei (fehlende Datei = keine Baselines)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(path: str, results: List[Dict], baselines: Dict):
+    """Übernimmt die Messungen als neue Baselines"""
+    for result in results:
+        baselines[case_key(result)] = {
+            "steps_per_sec": result["steps_per_sec"],
+            "stages": {stage: {"ms_per_step": values["ms_per_step"]}
+                       for stage, values in result["stages"].items()},
+            "peak_rss_mb": result["memory"]["peak_rss_mb"],
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def print_result(result: Dict, baseline: Optional[Dict]):
+    """Druckt eine Messung als Tabelle"""
+    print(f"\n{case_key(result)}: {result['steps_per_sec']:.2f} Schritte/s, "
+          f"{result['ms_per_step']:.0f} ms/Schritt, Speicher {result['memory']['peak_rss_mb']:.0f} MB "
+          f"(+{result['memory']['rss_growth_mb']:.1f} MB), Fehlschläge {result['failures']}/{result['runs']}")
+    print(f"  {'Abschnitt':10} {'ms/Schritt':>11} {'Aufrufe':>8} {'p50 ms':>8} {'p95 ms':>8} {'Baseline':>9}")
+    for stage, values in result["stages"].items():
+        reference = (baseline or {}).get("stages", {}).get(stage, {}).get("ms_per_step")
+        reference_text = f"{reference:9.1f}" if reference is not None else f"{'-':>9}"
+        print(f"  {stage:10} {values['ms_per_step']:11.1f} {values['calls']:8d} "
+              f"{values['p50_ms']:8.1f} {values['p95_ms']:8.1f} {reference_text}")
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    """Führt den Benchmark aus"""
+    parser = argparse.ArgumentParser(description="Benchmark der Steuerungsschleife auf Xvfb mit Mock API")
+    parser.add_argument("--sizes", help='Bildschirmgrößen, z.B. "1280x720,1920x1080"')
+    parser.add_argument("--task-steps", help='Task-Längen in Schritten, z.B. "5,20"')
+    parser.add_argument("--runs", type=int, default=config.BENCHMARK_RUNS, help="Gemessene Durchläufe pro Fall")
+    parser.add_argument("--latency", default=config.BENCHMARK_API_LATENCY, help="Latenz des Mock Servers")
+    parser.add_argument("--display", help="Vorhandenes X Display statt Xvfb verwenden (nur eine Größe)")
+    parser.add_argument("--baseline-file", default=config.BENCHMARK_BASELINE_FILE, help="Baseline-Datei")
+    parser.add_argument("--update-baselines", action="store_true", help="Ergebnisse als Baselines speichern")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON speichern")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Ausgaben der Durchläufe anzeigen")
+    # Interne Modi (Unterprozesse)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scene", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    parser.add_argument("--steps", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format=config.LOG_FORMAT
+    )
+
+    if args.scene:
+        run_scene(parse_size(args.size))
+        return
+    if args.worker:
+        result = run_worker(parse_size(args.size), args.steps, args.runs, args.latency)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")] if args.sizes else config.BENCHMARK_SCREEN_SIZES
+    task_steps = [int(steps) for steps in args.task_steps.split(",")] if args.task_steps \
+        else config.BENCHMARK_TASK_STEPS
+
+    print("Desktop Controller Benchmark")
+    print("=" * 50)
+    print(f"Größen: {', '.join(f'{w}x{h}' for w, h in sizes)} | Schritte: {task_steps} | "
+          f"Durchläufe: {args.runs} | API Latenz: {args.latency}")
+
+    baselines = load_baselines(args.baseline_file)
+    results, regressions = [], []
+    for size in sizes:
+        for steps in task_steps:
+            try:
+                result = run_case(size, steps, args.runs, args.latency, args.display, args.verbose)
+            except (RuntimeError, subprocess.CalledProcessError) as e:
+                print(f"❌ {size[0]}x{size[1]}/{steps}: {e}")
+                sys.exit(2)
+            results.append(result)
+            baseline = baselines.get(case_key(result))
+            print_result(result, baseline)
+            if baseline is not None:
+                regressions.extend(f"{case_key(result)} {text}" for text in compare(result, baseline))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baselines:
+        save_baselines(args.baseline_file, results, baselines)
+        print(f"\n✓ Baselines gespeichert: {args.baseline_file}")
+    elif regressions:
+        print("\n⚠️  Regressionen gegenüber der Baseline:")
+        for text in regressions:
+            print(f"  - {text}")
+        sys.exit(1)
+    elif baselines:
+        print("\n✓ Keine Regression gegenüber der Baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Capture Backends
+Austauschbare Screenshot-Backends mit langlebiger Verbindung und gecachter Bildschirmgeometrie
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageGrab
+
+import config
+
+try:
+    import mss
+except ImportError:  # Optional: pip install mss
+    mss = None
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureBackend:
+    """Basisklasse für Screenshot-Backends"""
+
+    name = "base"
+
+    def __init__(self):
+        self._screen_size = None
+
+    def grab(self) -> Image.Image:
+        """
+        Erstellt einen Screenshot
+
+        Returns:
+            PIL Image im RGB Modus
+        """
+        raise NotImplementedError
+
+    def _query_screen_size(self) -> Tuple[int, int]:
+        """Fragt die Bildschirmgröße beim System ab"""
+        raise NotImplementedError
+
+    def get_screen_size(self) -> Tuple[int, int]:
+        """
+        Gibt die (gecachte) Bildschirmgröße zurück
+
+        Returns:
+            (width, height) Tupel
+        """
+        if self._screen_size is None:
+            self._screen_size = self._query_screen_size()
+        return self._screen_size
+
+    def refresh_geometry(self) -> Tuple[int, int]:
+        """Verwirft die gecachte Bildschirmgröße (z.B. nach Auflösungswechsel)"""
+        self._screen_size = None
+        return self.get_screen_size()
+
+    def close(self):
+        """Gibt Ressourcen des Backends frei"""
+        pass
+
+
+class ImageGrabBackend(CaptureBackend):
+    """Fallback über PIL.ImageGrab (neue Verbindung pro Screenshot)"""
+
+    name = "imagegrab"
+
+    def grab(self) -> Image.Image:
+        screenshot = ImageGrab.grab()
+        # Geometrie nebenbei aktualisieren, kostet nichts extra
+        self._screen_size = screenshot.size
+        return screenshot
+
+    def _query_screen_size(self) -> Tuple[int, int]:
+        # ImageGrab kennt keine Geometrie-Abfrage, einmalig beim Start
+        return ImageGrab.grab().size
+
+
+class MssBackend(CaptureBackend):
+    """
+    Screenshots über mss (XShm Shared Memory unter Linux, GDI/CoreGraphics sonst)
+
+    Die mss-Instanz wird pro Thread einmal erstellt und wiederverwendet, da mss
+    Instanzen nicht zwischen Threads geteilt werden dürfen.
+    """
+
+    name = "mss"
+
+    def __init__(self, monitor_index: int = None):
+        super().__init__()
+        if mss is None:
+            raise RuntimeError("mss ist nicht installiert")
+
+        self.monitor_index = config.CAPTURE_MONITOR if monitor_index is None else monitor_index
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+        self._monitor = self._select_monitor(self._get_sct())
+
+    def _get_sct(self):
+        """Gibt die mss-Instanz des aktuellen Threads zurück"""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._instances.append(sct)
+        return sct
+
+    def _select_monitor(self, sct) -> Dict:
+        monitors = sct.monitors
+        if self.monitor_index >= len(monitors):
+            logger.warning(f"Monitor {self.monitor_index} nicht vorhanden, verwende Monitor 0")
+            return monitors[0]
+        return monitors[self.monitor_index]
+
+    def grab(self) -> Image.Image:
+        shot = self._get_sct().grab(self._monitor)
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def _query_screen_size(self) -> Tuple[int, int]:
+        return self._monitor["width"], self._monitor["height"]
+
+    def refresh_geometry(self) -> Tuple[int, int]:
+        self._monitor = self._select_monitor(self._get_sct())
+        return super().refresh_geometry()
+
+    def close(self):
+        with self._lock:
+            for sct in self._instances:
+                try:
+                    sct.close()
+                except Exception as e:
+                    logger.debug(f"Fehler beim Schließen von mss: {e}")
+            self._instances.clear()
+        self._local = threading.local()
+
+
+CAPTURE_BACKENDS = {
+    MssBackend.name: MssBackend,
+    ImageGrabBackend.name: ImageGrabBackend,
+}
+
+
+def create_capture_backend(name: str = None) -> CaptureBackend:
+    """
+    Erstellt das konfigurierte Capture-Backend
+
+    Bei "auto" wird mss bevorzugt und auf ImageGrab zurückgefallen,
+    falls mss nicht verfügbar ist oder nicht initialisiert werden kann.
+
+    Args:
+        name: "auto", "mss" oder "imagegrab" (Standard: config.CAPTURE_BACKEND)
+
+    Returns:
+        CaptureBackend Instanz
+    """
+    if name is None:
+        name = config.CAPTURE_BACKEND
+
+    candidates = [MssBackend.name, ImageGrabBackend.name] if name == "auto" else [name]
+
+    for candidate in candidates:
+        backend_class = CAPTURE_BACKENDS.get(candidate)
+        if backend_class is None:
+            raise ValueError(f"Unbekanntes Capture-Backend: {candidate}")
+        try:
+            backend = backend_class()
+            logger.info(f"Capture-Backend: {backend.name}")
+            return backend
+        except Exception as e:
+            logger.warning(f"Capture-Backend {candidate} nicht verfügbar: {e}")
+
+    # Letzter Ausweg, auch wenn explizit ein anderes Backend gewünscht war
+    logger.warning("Falle auf ImageGrab zurück")
+    return ImageGrabBackend()
+
+
+def main():
+    """Test-Funktion für Capture Backends"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Capture Backends Test")
+    print("=" * 50)
+
+    for name in CAPTURE_BACKENDS:
+        try:
+            backend = CAPTURE_BACKENDS[name]()
+        except Exception as e:
+            print(f"✗ {name}: {e}")
+            continue
+
+        width, height = backend.get_screen_size()
+        start = time.perf_counter()
+        for _ in range(10):
+            backend.grab()
+        elapsed = (time.perf_counter() - start) / 10
+        print(f"✓ {name}: {width}x{height}, {elapsed * 1000:.1f} ms pro Screenshot")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Capture Worker
+Hintergrund-Thread, der laufend einen fertig encodierten Screenshot bereithält
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+import config
+from screenshot_handler import CapturedFrame, ScreenshotHandler
+
+logger = logging.getLogger(__name__)
+
+
+class FrameMailbox:
+    """
+    Briefkasten mit genau einem Platz für den neuesten Frame
+
+    Ein neuer Frame ersetzt den alten, Leser warten bis ein Frame mit
+    ausreichender Generation vorliegt.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+
+    def put(self, frame: CapturedFrame):
+        """Legt einen Frame ab und weckt wartende Leser"""
+        with self._condition:
+            self._frame = frame
+            self._condition.notify_all()
+
+    def get(self, min_generation: int = 0, timeout: float = None) -> Optional[CapturedFrame]:
+        """
+        Gibt den neuesten Frame zurück, sobald er aktuell genug ist
+
+        Args:
+            min_generation: Mindest-Generation des Frames
+            timeout: Maximale Wartezeit in Sekunden (None = unbegrenzt)
+
+        Returns:
+            CapturedFrame oder None bei Timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._frame is None or self._frame.generation < min_generation:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._frame
+
+    def clear(self):
+        """Entfernt den abgelegten Frame"""
+        with self._condition:
+            self._frame = None
+
+
+class CaptureWorker(threading.Thread):
+    """
+    Erstellt im Hintergrund Screenshots im Abstand von SCREENSHOT_INTERVAL
+
+    Jede Aktion erhöht die Generation (mark_action, aufgerufen sobald der
+    Bildschirm nach der Aktion stabil ist). Ein Frame trägt die Generation,
+    die beim Start seiner Aufnahme galt, sodass get_frame nie einen Frame
+    liefert, der vor oder während des Übergangs aufgenommen wurde.
+    """
+
+    def __init__(self, screenshot_handler: ScreenshotHandler, interval: float = None):
+        super().__init__(name="CaptureWorker", daemon=True)
+        self.screenshot_handler = screenshot_handler
+        self.interval = config.SCREENSHOT_INTERVAL if interval is None else interval
+        self.mailbox = FrameMailbox()
+
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+        self.frames_captured = 0
+        self.capture_errors = 0
+
+    def run(self):
+        logger.info(f"Capture Worker gestartet (Intervall: {self.interval}s)")
+        while not self._stop_event.is_set():
+            self._wakeup.clear()
+            generation = self.generation
+
+            try:
+                frame = self.screenshot_handler.capture_frame(generation)
+            except Exception as e:
+                logger.error(f"Fehler im Capture Worker: {e}")
+                frame = None
+
+            if frame is not None:
+                self.frames_captured += 1
+                self.mailbox.put(frame)
+            else:
+                self.capture_errors += 1
+
+            # Bis zum nächsten Intervall warten, mark_action weckt sofort auf
+            self._wakeup.wait(self.interval)
+
+        logger.info("Capture Worker beendet")
+
+    def mark_action(self) -> int:
+        """
+        Meldet eine abgeschlossene Aktion (nach Settle); ältere Frames gelten danach als veraltet
+
+        Returns:
+            Neue Generation
+        """
+        with self._generation_lock:
+            self.generation += 1
+            generation = self.generation
+        self._wakeup.set()
+        return generation
+
+    def get_frame(self, timeout: float = None) -> Optional[CapturedFrame]:
+        """
+        Gibt den neuesten Frame zurück, der nach der letzten Aktion aufgenommen wurde
+
+        Args:
+            timeout: Maximale Wartezeit (Standard: BACKGROUND_CAPTURE_TIMEOUT)
+
+        Returns:
+            CapturedFrame oder None bei Timeout
+        """
+        if timeout is None:
+            timeout = config.BACKGROUND_CAPTURE_TIMEOUT
+        return self.mailbox.get(self.generation, timeout)
+
+    def stop(self, timeout: float = 2.0):
+        """Beendet den Worker"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.mailbox.clear()
+
+    def get_stats(self) -> dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "frames_captured": self.frames_captured,
+            "capture_errors": self.capture_errors,
+            "generation": self.generation,
+        }
+
+
+def main():
+    """Test-Funktion für den Capture Worker"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=config.LOG_FORMAT
+    )
+
+    print("Capture Worker Test")
+    print("=" * 50)
+
+    worker = CaptureWorker(ScreenshotHandler())
+    worker.start()
+
+    for step in range(3):
+        start = time.perf_counter()
+        frame = worker.get_frame()
+        waited = time.perf_counter() - start
+        if frame is None:
+            print("✗ Kein Frame erhalten")
+            break
+        print(f"Schritt {step + 1}: Frame Generation {frame.generation}, "
+              f"{len(frame.base64_image)} Bytes, gewartet {waited * 1000:.0f} ms")
+        worker.mark_action()
+
+    worker.stop()
+    print(f"\nStatistiken: {worker.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
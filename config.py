@@ -15,10 +15,139 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = "llama-3.2-90b-vision-preview"  # Groq Vision Modell
 GROQ_API_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
+# ================== MODELL-KASKADE ==================
+MODEL_CASCADE_ENABLED = False  # Erst schnelles Modell fragen, bei Bedarf an GROQ_MODEL eskalieren
+GROQ_FAST_MODEL = "llama-3.2-11b-vision-preview"  # Kleines, schnelles Vision Modell
+ROUTER_ESCALATE_AFTER_FAILURES = 2  # Nach so vielen Fehlschlägen in Folge direkt das große Modell
+ROUTER_STATS_WINDOW = 50  # Anzahl der Schritte für Latenz- und Trefferstatistik
+ROUTER_MIN_SAMPLES = 10  # Mindestanzahl Schritte, bevor die Statistik das Routing beeinflusst
+ROUTER_MIN_ACCURACY = 0.6  # Darunter wird das kleine Modell übersprungen
+ROUTER_PROBE_INTERVAL = 10  # Übersprungenes kleines Modell alle N Schritte erneut testen
+ROUTER_THRESHOLD_STEP = 0.05  # Anhebung der Konfidenzschwelle pro Fehlschlag des kleinen Modells
+ROUTER_MAX_THRESHOLD = 0.95  # Obergrenze der Konfidenzschwelle des kleinen Modells
+
+# ================== HTTP TRANSPORT ==================
+HTTP_POOL_SIZE = 4  # Maximale Anzahl offener Verbindungen zum API-Host
+HTTP_PREWARM = True  # Verbindung beim Start im Hintergrund aufbauen
+HTTP_CONNECT_TIMEOUT = 5.0  # Timeout für den Verbindungsaufbau in Sekunden
+HTTP_TIMEOUT = 30.0  # Timeout für die Antwort in Sekunden
+HTTP_KEEPALIVE_IDLE = 60.0  # Leerlaufende Verbindungen danach verwerfen (Async-Client)
+
+# ================== AUFZEICHNUNG ==================
+TRAFFIC_RECORD_FILE = None  # JSONL-Datei, z.B. "groq_traffic.jsonl": Requests und Antworten für das Replay
+
+# ================== HEDGING ==================
+HEDGE_ENABLED = False  # Langsame Requests zusätzlich ein zweites Mal senden
+HEDGE_PERCENTILE = 0.9  # Duplikat nach diesem Perzentil der letzten Latenzen
+HEDGE_MAX_RATE = 0.1  # Maximaler Anteil duplizierter Requests (0.1 = höchstens 10% mehr Last)
+HEDGE_MIN_SAMPLES = 20  # Mindestanzahl gemessener Requests vor dem ersten Duplikat
+HEDGE_WINDOW = 100  # Anzahl der Latenzen für das Perzentil
+HEDGE_MIN_DELAY = 0.2  # Frühestens nach so vielen Sekunden duplizieren
+
+# ================== VERLAUF ==================
+MEMORY_ENABLED = False  # Verlauf der bisherigen Schritte mitschicken
+MEMORY_TOKEN_BUDGET = 1500  # Maximale (geschätzte) Tokens für den Verlauf pro Request
+MEMORY_IMAGE_BUDGET_SHARE = 0.6  # Maximaler Anteil der Bilder am Budget
+MEMORY_MAX_IMAGES = 2  # Screenshots früherer Schritte (0 = nur Text)
+MEMORY_IMAGE_SIZE = (640, 360)  # Größe des letzten Screenshots, ältere jeweils halbiert
+MEMORY_IMAGE_QUALITY = 60  # JPEG Qualität der Verlaufsbilder
+MEMORY_PIXELS_PER_TOKEN = 750  # Grobe Schätzung für Bild-Tokens
+MEMORY_MAX_STEPS = 50  # Maximale Anzahl gespeicherter Schritte
+MEMORY_REASONING_CHARS = 120  # Länge des Reasonings im Verlauf
+
+# ================== PLAN-MODUS ==================
+PLAN_MODE_ENABLED = False  # Mehrere Actions pro Screenshot planen lassen
+PLAN_MAX_ACTIONS = 5  # Maximale Länge eines Plans (inkl. erster Action)
+PLAN_CHECKPOINT_TIMEOUT = 2.0  # Wartezeit auf die erwartete Bildschirmänderung in Sekunden
+
+# ================== RATE LIMITS ==================
+RATE_LIMIT_ENABLED = True  # Requests vor dem Senden gegen die Rate Limits planen
+RATE_LIMIT_REQUESTS_PER_MINUTE = 30  # Startwert, wird aus den Response-Headern abgeglichen
+RATE_LIMIT_TOKENS_PER_MINUTE = 7000  # Startwert, wird aus den Response-Headern übernommen
+RATE_LIMIT_ESTIMATED_TOKENS = 1500  # Geschätzte Tokens pro Request (wird aus usage gelernt)
+RATE_LIMIT_MAX_WAIT = 120.0  # Maximale Wartezeit auf einen Slot in Sekunden
+RATE_LIMIT_MAX_RETRIES = 5  # Maximale Wiederholungen nach 429 pro Request
+RATE_LIMIT_BACKOFF_BASE = 0.5  # Basis für exponentielles Backoff in Sekunden
+RATE_LIMIT_BACKOFF_MAX = 30.0  # Obergrenze für eine einzelne Pause in Sekunden
+
+# ================== KOMPAKTES PROTOKOLL ==================
+COMPACT_PROTOCOL_ENABLED = False  # Kurze Schlüssel, optionales Reasoning, wenige Output-Tokens
+COMPACT_JSON_MODE = True  # JSON-Modus der API (response_format), nur ohne Streaming
+COMPACT_MAX_TOKENS = 160  # max_tokens pro Antwort
+COMPACT_PLAN_STEP_TOKENS = 60  # Zusätzliche Tokens pro Plan-Schritt im Plan-Modus
+COMPACT_REASONING_WORDS = 12  # Maximale Länge des optionalen Reasonings (Wörter)
+
+# ================== STREAMING ==================
+STREAMING_ENABLED = False  # Antworten streamen und Action vorzeitig ausführen
+STREAM_EARLY_FIELDS = ["action", "parameters", "confidence", "is_critical"]  # Danach ist die Action ausführbar
+STREAM_REASONING_TIMEOUT = 0.5  # Max. Wartezeit auf das gestreamte Reasoning für den Verlauf (Sekunden)
+
 # ================== SCREENSHOT EINSTELLUNGEN ==================
-SCREENSHOT_INTERVAL = 2.0  # Sekunden zwischen Screenshots
+SCREENSHOT_INTERVAL = 0.25  # Sekunden zwischen Screenshots (Hintergrund-Capture)
 SCREENSHOT_QUALITY = 85  # JPEG Qualität (0-100)
 SCREENSHOT_MAX_SIZE = (1920, 1080)  # Maximale Auflösung
+ENCODER_ADAPTIVE = True  # Format/Qualität automatisch an das Byte-Budget anpassen
+BACKGROUND_CAPTURE_ENABLED = False  # Screenshots im Hintergrund-Thread vorbereiten
+BACKGROUND_CAPTURE_TIMEOUT = 5.0  # Maximale Wartezeit auf einen aktuellen Frame (Sekunden)
+CAPTURE_BACKEND = "auto"  # auto, mss (XShm unter Linux) oder imagegrab
+CAPTURE_MONITOR = 1  # mss Monitor-Index (0 = alle Monitore, 1 = Hauptmonitor)
+
+# ================== BILD-ENCODER ==================
+ENCODER_BYTE_BUDGET = 350_000  # Maximale Bildgröße im Request (Base64 Bytes)
+ENCODER_TIME_BUDGET = 0.25  # CPU-Zeit pro Bild für die Qualitätssuche (Sekunden)
+ENCODER_MIN_QUALITY = 30  # Untergrenze der Qualitätssuche
+ENCODER_MAX_QUALITY = 90  # Obergrenze der Qualitätssuche
+ENCODER_QUALITY_STEP = 5  # Granularität der Qualitätssuche
+ENCODER_MAX_ATTEMPTS = 6  # Maximale Encoding-Versuche pro Bild
+ENCODER_RESEARCH_RATIO = 0.5  # Unter diesem Anteil des Budgets wird nach höherer Qualität gesucht
+ENCODER_CLASSIFY_SIZE = (160, 90)  # Thumbnail für die Bildschirmtyp-Erkennung
+ENCODER_FLAT_MAX_COLORS = 256  # Bis zu dieser Farbanzahl -> Palette-PNG
+ENCODER_PHOTO_COLOR_RATIO = 0.5  # Ab diesem Anteil eindeutiger Farben -> Foto
+ENCODER_PNG_COLORS = 64  # Palettengröße für PNG
+ENCODER_PNG_COMPRESS_LEVEL = 3  # zlib Level (höher = kleiner, aber langsamer)
+ENCODER_WEBP_METHOD = 2  # WebP Methode 0-6 (höher = kleiner, aber langsamer)
+
+# ================== ZOOM-MODUS ==================
+# Sendet zuerst eine niedrig aufgelöste Übersicht; bei Bedarf fordert die KI
+# einen hochauflösenden Ausschnitt an (Action "zoom")
+ZOOM_MODE_ENABLED = False
+OVERVIEW_MAX_SIZE = (1024, 576)  # Auflösung der Übersicht
+ZOOM_MAX_SIZE = (1280, 720)  # Maximale Auflösung des Ausschnitts
+ZOOM_MIN_REGION = (320, 180)  # Minimale Ausschnittgröße in Bildschirmpixeln
+
+# ================== ÄNDERUNGSERKENNUNG ==================
+# Vergleicht jeden Screenshot mit dem vorherigen (Perceptual Hash + Pixel-Diff),
+# damit bei unverändertem Bildschirm kein neuer API Request nötig ist
+CHANGE_DETECTION_ENABLED = True
+CHANGE_HASH_SIZE = 8  # Kantenlänge des pHash (8 -> 64 Bit)
+CHANGE_DIFF_SIZE = (320, 180)  # Auflösung für den Pixelvergleich
+CHANGE_PIXEL_TOLERANCE = 12  # Grauwert-Differenz ab der ein Pixel als geändert gilt
+CHANGE_UNCHANGED_RATIO = 0.0  # Anteil geänderter Pixel bis "unverändert"
+CHANGE_MAJOR_RATIO = 0.05  # Anteil geänderter Pixel ab "große Änderung"
+CHANGE_MAJOR_HASH_DISTANCE = 10  # Hamming-Distanz des pHash ab "große Änderung"
+CHANGE_REUSE_ON_MINOR = False  # Letzte Entscheidung auch bei kleinen Änderungen wiederverwenden
+CHANGE_MAX_DECISION_REUSE = 3  # Maximale Wiederverwendungen in Folge
+
+# ================== DECISION CACHE ==================
+DECISION_CACHE_ENABLED = False  # Entscheidungen für bekannte Bildschirme wiederverwenden
+DECISION_CACHE_HASH_SIZE = 16  # Kantenlänge des pHash (16 = 256 Bits)
+DECISION_CACHE_MAX_DISTANCE = 6  # Maximale Hamming-Distanz für einen Treffer
+DECISION_CACHE_MAX_ENTRIES = 500  # Maximale Anzahl Einträge (LRU)
+DECISION_CACHE_TTL = 7 * 24 * 3600  # Gültigkeit eines Eintrags in Sekunden
+DECISION_CACHE_MIN_CONFIDENCE = 0.8  # Nur sichere Entscheidungen speichern
+DECISION_CACHE_FILE = "decision_cache.json"  # Persistenz zwischen Läufen ("" = nur im Speicher)
+
+# ================== ELEMENT LOCATOR ==================
+LOCATOR_ENABLED = False  # Bekannte Klickziele per Template Matching lokal finden
+LOCATOR_PATCH_SIZE = 64  # Kantenlänge des gespeicherten Ausschnitts (Frame-Pixel)
+LOCATOR_MIN_SCORE = 0.92  # Minimale normalisierte Kreuzkorrelation für einen Treffer
+LOCATOR_MIN_MARGIN = 0.1  # Mindestabstand zum zweitbesten Treffer (Eindeutigkeit)
+LOCATOR_MIN_CONTRAST = 10.0  # Minimale Standardabweichung des Ausschnitts (Graustufen)
+LOCATOR_SEARCH_RADIUS = 160  # Suchradius um die letzte Position in voller Auflösung
+LOCATOR_COARSE_FACTOR = 2  # Verkleinerung für die Suche im ganzen Frame
+LOCATOR_MAX_ENTRIES = 300  # Maximale Anzahl Templates (LRU)
+LOCATOR_TTL = 7 * 24 * 3600  # Ablaufzeit eines Templates in Sekunden
+LOCATOR_FILE = "element_locator.npz"  # Persistenz über Programmläufe ("" = nur im Speicher)
 
 # ================== AKTION EINSTELLUNGEN ==================
 # Aktionen die eine Sicherheitsbestätigung erfordern
@@ -35,9 +164,46 @@ CRITICAL_ACTIONS = [
 
 # PyAutoGUI Einstellungen
 PYAUTOGUI_PAUSE = 0.5  # Pause zwischen Aktionen (Sekunden)
-PYAUTOGUI_FAILSAFE = True  # Maus in obere linke Ecke = Notfall-Stop
-MOUSE_MOVE_DURATION = 0.3  # Dauer der Mausbewegung (Sekunden)
-TYPING_INTERVAL = 0.05  # Intervall zwischen Tastenanschlägen
+PYAUTOGUI_FAILSAFE = True  # Maus in eine Bildschirmecke = Notfall-Stop
+TYPING_INTERVAL = 0.05  # Höchstes Intervall zwischen Tastenanschlägen (nach Fehleingaben)
+
+# Typing Engine (Texteingabe ohne Pause pro Zeichen)
+TYPING_STRATEGY = "auto"  # "auto", "keys" (Tastenereignisse über das Input-Backend) oder "clipboard"
+TYPING_CHUNK_SIZE = 64  # Zeichen pro Block
+TYPING_CHUNK_PAUSE = 0.005  # Pause zwischen Blöcken (Sekunden)
+TYPING_KEY_INTERVAL = 0.01  # Startintervall ohne gebündelte Events (key_interval der Timing-Policy)
+TYPING_MIN_INTERVAL = 0.0  # Untergrenze nach erfolgreichen Prüfungen (TYPING_VERIFY)
+TYPING_REMAP_DELAY = 0.02  # Wartezeit nach Umbelegung freier Keycodes (XTest)
+TYPING_PASTE_MIN_LENGTH = 32  # Ab dieser Länge über die Zwischenablage einfügen
+TYPING_PASTE_HOTKEY = None  # None = Strg+V (Cmd+V unter macOS)
+TYPING_PASTE_RESTORE_DELAY = 0.15  # Wartezeit bevor die Zwischenablage wiederhergestellt wird
+TYPING_RESTORE_CLIPBOARD = True  # Vorherigen Inhalt der Zwischenablage wiederherstellen
+TYPING_VERIFY = False  # Eingabe per Alles markieren + Kopieren prüfen (nur einzeilige Felder)
+
+# Input-Backend (Maus und Tastatur)
+INPUT_BACKEND = "auto"  # auto (XTest, sonst PyAutoGUI), xtest, uinput oder pyautogui
+INPUT_FAILSAFE = PYAUTOGUI_FAILSAFE  # Notfall-Stop für alle Backends
+INPUT_FAILSAFE_MARGIN = 0  # Abstand zur Ecke (Pixel), der noch als Ecke zählt
+INPUT_UINPUT_SETUP_DELAY = 0.3  # Wartezeit bis der Compositor neue uinput-Geräte erkennt
+# Wartezeiten pro Action Type (Sekunden): move_duration (sichtbare Mausbewegung),
+# click_interval (zwischen Mehrfachklicks), pause (nach der Action; fehlt sie, gilt
+# PYAUTOGUI_PAUSE bzw. SETTLE_PYAUTOGUI_PAUSE mit Settle-Erkennung)
+INPUT_TIMING_POLICIES = {
+    "default": {"move_duration": 0.0},
+    "double_click": {"click_interval": 0.05},
+}
+
+# ================== SETTLE-ERKENNUNG ==================
+# Statt fester Pausen nach jeder Aktion warten bis der Bildschirm stabil ist
+SETTLE_ENABLED = True
+SETTLE_SAMPLE_SIZE = (160, 90)  # Auflösung der Vergleichsframes
+SETTLE_POLL_INTERVAL = 0.1  # Abstand zwischen Abfragen (Sekunden)
+SETTLE_STABLE_POLLS = 3  # Unveränderte Abfragen in Folge = stabil
+SETTLE_TIMEOUT = 3.0  # Maximale Wartezeit nach einer Aktion (Sekunden)
+SETTLE_PIXEL_TOLERANCE = 8  # Grauwert-Differenz ab der ein Pixel als geändert gilt
+SETTLE_CHANGE_RATIO = 0.001  # Anteil geänderter Pixel ab dem ein Frame als verändert gilt
+SETTLE_PYAUTOGUI_PAUSE = 0.05  # PyAutoGUI Pause wenn die Settle-Erkennung aktiv ist
+WAIT_ACTION_MAX_TIMEOUT = 30.0  # Obergrenze für wait_until_changed / wait_until_stable
 
 # ================== SICHERHEIT ==================
 SAFETY_CHECK_ENABLED = True  # Sicherheitsabfragen aktivieren
@@ -51,9 +217,14 @@ ALLOWED_ACTIONS = [
     "move_mouse",
     "hotkey",
     "wait",
+    "wait_until_changed",
+    "wait_until_stable",
     "screenshot"
 ]
 
+# Aktionen mit Bildschirmkoordinaten (x, y)
+COORDINATE_ACTIONS = ["click", "double_click", "right_click", "move_mouse"]
+
 # Tastenkombinationen die erlaubt sind
 ALLOWED_HOTKEYS = [
     ["ctrl", "c"],  # Kopieren
@@ -76,6 +247,37 @@ LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR
 LOG_FILE = "desktop_controller.log"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
+# Metriken: Histogramme pro Abschnitt, Tokens, Retries (Export als JSON und Prometheus)
+METRICS_ENABLED = True
+METRICS_WINDOW = 1000  # Letzte Werte pro Histogramm für p50/p95/p99
+METRICS_FILE = ""  # JSON-Stand, wird beim Start geladen und nach jeder Aufgabe geschrieben ("" = aus)
+METRICS_PROMETHEUS_FILE = ""  # Prometheus-Textdatei (z.B. für den node_exporter Textfile Collector)
+METRICS_HTTP_PORT = 0  # Port für /metrics und /metrics.json auf localhost (0 = aus)
+
+# Tracing: Zeitleiste jeder Aufgabe (Spans pro Abschnitt) als Datei für Trace-Viewer
+TRACE_ENABLED = True
+TRACE_DIR = "traces"  # Zielverzeichnis (eine Datei pro Aufgabe)
+TRACE_FORMAT = "chrome"  # chrome (chrome://tracing, Perfetto) oder otlp (OTLP-JSON)
+TRACE_MAX_FILES = 50  # Ältere Traces werden gelöscht
+TRACE_MAX_SPANS = 20000  # Obergrenze pro Aufgabe (schützt den Speicher)
+
+# Debug Recorder: gesendete Screenshots asynchron aufzeichnen (im DEBUG Level automatisch aktiv)
+DEBUG_RECORDER_ENABLED = False
+DEBUG_RECORDER_DIR = "debug_frames"  # Zielverzeichnis
+DEBUG_RECORDER_MAX_FRAMES = 200  # Maximale Anzahl eindeutiger Frames
+DEBUG_RECORDER_MAX_BYTES = 100 * 1024 * 1024  # Maximale Gesamtgröße (Bytes)
+DEBUG_RECORDER_MAX_AGE = 3600  # Maximales Alter eines Frames (Sekunden)
+DEBUG_RECORDER_QUEUE_SIZE = 16  # Wartende Frames bevor verworfen wird
+
+# ================== BENCHMARK ==================
+BENCHMARK_SCREEN_SIZES = [(1280, 720), (1920, 1080), (2560, 1440)]  # Xvfb Bildschirmgrößen
+BENCHMARK_TASK_STEPS = [5, 20]  # Task-Längen in Schritten (inklusive "done")
+BENCHMARK_RUNS = 3  # Gemessene Durchläufe pro Fall (plus ein Aufwärm-Durchlauf)
+BENCHMARK_API_LATENCY = "fixed:0.1"  # Antwortzeit des Mock Servers (siehe parse_latency)
+BENCHMARK_TOLERANCE = 0.2  # Relative Verschlechterung ab der ein Abschnitt als Regression gilt
+BENCHMARK_MIN_DELTA_MS = 2.0  # Mindestverschlechterung in ms/Schritt (gegen Rauschen)
+BENCHMARK_BASELINE_FILE = "benchmark_baselines.json"  # Gespeicherte Baselines
+
 # ================== WEB UI (OPTIONAL) ==================
 WEB_UI_ENABLED = False  # Web-UI aktivieren
 WEB_UI_PORT = 5000
@@ -97,6 +299,8 @@ Verfügbare Aktionen:
 - move_mouse(x, y): Bewege Maus zu Position (x, y)
 - hotkey(keys): Tastenkombination (z.B. ['ctrl', 'c'])
 - wait(seconds): Warte X Sekunden
+- wait_until_changed(timeout): Warte bis sich der Bildschirm ändert (max. timeout Sekunden)
+- wait_until_stable(timeout): Warte bis der Bildschirm sich nicht mehr ändert (z.B. Ladevorgang)
 - done(message): Task abgeschlossen
 
 Antworte IMMER im folgenden JSON-Format:
@@ -133,6 +337,96 @@ Wichtig:
 - Wenn der Task abgeschlossen ist, verwende action: "done"
 """
 
+# Ergänzung des System-Prompts im Zoom-Modus
+ZOOM_PROMPT = """
+Zoom-Modus:
+Du erhältst zunächst eine verkleinerte Übersicht des Bildschirms. Wenn Details
+(kleine Schrift, Icons, Eingabefelder) nicht sicher erkennbar sind, fordere einen
+hochauflösenden Ausschnitt an:
+- zoom(x, y, width, height): Bereich der Übersicht vergrößern
+
+Beispiel:
+{
+    "reasoning": "Die Symbolleiste oben rechts ist zu klein, ich vergrößere sie",
+    "action": "zoom",
+    "parameters": {"x": 800, "y": 0, "width": 224, "height": 60},
+    "confidence": 0.9,
+    "is_critical": false
+}
+"""
+
+PLAN_PROMPT = f"""
+Plan-Modus:
+Wenn mehrere Actions offensichtlich aufeinander folgen (z.B. Feld anklicken, Text tippen,
+Enter drücken), gib die weiteren Actions zusätzlich im Feld "plan" als Liste an. Jede
+Action im Plan hat dasselbe Format ("action", "parameters", "confidence", "is_critical"),
+alle Koordinaten beziehen sich auf diesen Screenshot. Setze "expect_change": true bei
+Actions, nach denen sich der Bildschirm sichtbar ändern muss (z.B. ein Dialog öffnet sich);
+bleibt die Änderung aus, wird der Rest des Plans verworfen und du erhältst einen neuen
+Screenshot. Plane höchstens {PLAN_MAX_ACTIONS} Actions und nur so weit, wie du den Bildschirm
+sicher vorhersagen kannst. "done" gehört nie in den Plan.
+
+Beispiel:
+{{
+    "reasoning": "Ich sehe das Login-Formular, das E-Mail-Feld ist leer",
+    "action": "click",
+    "parameters": {{"x": 400, "y": 300}},
+    "confidence": 0.9,
+    "is_critical": false,
+    "plan": [
+        {{"action": "type_text", "parameters": {{"text": "max@example.com"}}, "confidence": 0.9, "is_critical": false}},
+        {{"action": "press_key", "parameters": {{"key": "enter"}}, "confidence": 0.9, "is_critical": false, "expect_change": true}}
+    ]
+}}
+"""
+
+STREAM_PROMPT = """
+Feldreihenfolge:
+Gib die Felder in dieser Reihenfolge aus: "action", "parameters", "confidence",
+"is_critical", (im Plan-Modus "plan") und zuletzt "reasoning".
+"""
+
+# System-Prompt des kompakten Protokolls (COMPACT_PROTOCOL_ENABLED)
+COMPACT_SYSTEM_PROMPT = f"""Du steuerst einen Desktop anhand eines Screenshots und einer Benutzeranfrage.
+Bestimme die nächste Aktion.
+
+Aktionen (Parameter):
+click, double_click, right_click, move_mouse (x, y); type_text (text); press_key (key);
+scroll (amount, positiv = runter); hotkey (keys, z.B. ["ctrl", "c"]); wait (seconds);
+wait_until_changed, wait_until_stable (timeout); done (message)
+
+Antworte NUR mit einem JSON-Objekt ohne Leerzeichen und ohne weiteren Text:
+a = Action, p = Parameter, c = Konfidenz (0.0 - 1.0), k = kritisch (true/false),
+r = optional, höchstens {COMPACT_REASONING_WORDS} Wörter Begründung
+
+Beispiele:
+{{"a":"click","p":{{"x":100,"y":200}},"c":0.9,"k":false}}
+{{"a":"type_text","p":{{"text":"Groq AI"}},"c":0.95,"k":false,"r":"Suchfeld ist aktiv"}}
+{{"a":"done","p":{{"message":"Suche geöffnet"}},"c":0.9,"k":false}}
+"""
+
+COMPACT_ZOOM_PROMPT = """
+Ist ein Detail zu klein, fordere einen vergrößerten Ausschnitt der Übersicht an:
+{"a":"zoom","p":{"x":800,"y":0,"width":224,"height":60},"c":0.9,"k":false}
+"""
+
+COMPACT_PLAN_PROMPT = f"""
+Folgen weitere Actions sicher aufeinander, gib sie in n als Liste an (gleiches Format, Koordinaten
+dieses Screenshots, höchstens {PLAN_MAX_ACTIONS} Actions insgesamt, nie "done"). e = true, wenn sich
+der Bildschirm danach sichtbar ändern muss:
+{{"a":"click","p":{{"x":400,"y":300}},"c":0.9,"k":false,"n":[{{"a":"type_text","p":{{"text":"max@example.com"}},"c":0.9,"k":false}},{{"a":"press_key","p":{{"key":"enter"}},"c":0.9,"k":false,"e":true}}]}}
+"""
+
+COMPACT_STREAM_PROMPT = """
+Reihenfolge der Felder: a, p, c, k, (n), r zuletzt.
+"""
+
+# Kontext für die Anfrage mit dem vergrößerten Ausschnitt
+ZOOM_CROP_CONTEXT = (
+    "Dies ist der angeforderte vergrößerte Ausschnitt. Alle Koordinaten beziehen sich "
+    "auf diesen Ausschnitt. Ein weiterer Zoom ist nicht möglich."
+)
+
 # ================== VALIDIERUNG ==================
 def validate_config() -> bool:
     """Validiert die Konfiguration"""
@@ -0,0 +1,182 @@
+"""
+Conversation Memory
+Begrenzter Verlauf der bisherigen Schritte (Text und wenige verkleinerte Screenshots)
+"""
+
+import base64
+import io
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+import config
+from frame import Frame, fit_size
+
+logger = logging.getLogger(__name__)
+
+# (Base64 Daten, MIME-Type, Beschriftung)
+HistoryImage = Tuple[bytes, str, str]
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Grobe Schätzung: etwa 4 Zeichen pro Token"""
+    return len(text) // 4 + 1
+
+
+def estimate_image_tokens(size: Tuple[int, int]) -> int:
+    """Grobe Schätzung der Tokens eines Bildes aus seiner Pixelzahl"""
+    return size[0] * size[1] // config.MEMORY_PIXELS_PER_TOKEN + 1
+
+
+@dataclass
+class StepRecord:
+    """Ein vergangener Schritt im Verlauf"""
+    step: int
+    text: str
+    frame: Optional[Frame] = None  # Nur für die letzten MEMORY_MAX_IMAGES Schritte
+    encoded: Dict[Tuple[int, int], bytes] = field(default_factory=dict)
+
+
+class ConversationMemory:
+    """
+    Verlauf eines Tasks mit festem Token-Budget
+
+    Jeder Schritt hinterlässt eine kurze Textzeile. Die Screenshots der letzten
+    max_images Schritte werden zusätzlich mitgeschickt, je älter desto kleiner;
+    ältere Screenshots werden verworfen. build() wählt vom neuesten Schritt
+    rückwärts so viele Bilder (höchstens MEMORY_IMAGE_BUDGET_SHARE des Budgets)
+    und Textzeilen aus, wie ins Budget passen, sodass die Request-Größe nicht
+    mit der Task-Länge wächst.
+    """
+
+    def __init__(self, token_budget: int = None, max_images: int = None, max_steps: int = None):
+        self.token_budget = token_budget or config.MEMORY_TOKEN_BUDGET
+        self.max_images = config.MEMORY_MAX_IMAGES if max_images is None else max_images
+        self.records: Deque[StepRecord] = deque(maxlen=max_steps or config.MEMORY_MAX_STEPS)
+        self.last_tokens = 0
+
+    def reset(self):
+        """Leert den Verlauf (neuer Task)"""
+        self.records.clear()
+        self.last_tokens = 0
+
+    def add_step(self, step: int, action: Dict, outcome: str, frame: Optional[Frame] = None):
+        """
+        Nimmt einen ausgeführten Schritt in den Verlauf auf
+
+        Args:
+            step: Schrittnummer
+            action: Ausgeführte Action
+            outcome: Ergebnis in Kurzform (z.B. "erfolgreich")
+            frame: Screenshot, auf dem die Entscheidung beruhte (optional)
+        """
+        parameters = ", ".join(f"{key}={value!r}" for key, value in (action.get("parameters") or {}).items())
+        text = f"Schritt {step}: {action.get('action')}({parameters}) -> {outcome}"
+        reasoning = (action.get("reasoning") or "").strip()
+        if reasoning:
+            limit = config.MEMORY_REASONING_CHARS
+            text += f" | {reasoning[:limit]}{'…' if len(reasoning) > limit else ''}"
+
+        self.records.append(StepRecord(step, text, frame if self.max_images else None))
+
+        # Nur die letzten max_images Schritte behalten ihren Screenshot
+        with_frames = [record for record in self.records if record.frame is not None]
+        for record in with_frames[:max(len(with_frames) - self.max_images, 0)]:
+            record.frame = None
+            record.encoded.clear()
+
+    def _image_size(self, frame: Frame, age: int) -> Tuple[int, int]:
+        """Zielgröße nach Alter (0 = letzter Schritt), jede Stufe halbiert"""
+        width, height = config.MEMORY_IMAGE_SIZE
+        scale = 0.5 ** age
+        return fit_size(frame.size, (max(int(width * scale), 1), max(int(height * scale), 1)))
+
+    def _encode(self, record: StepRecord, size: Tuple[int, int]) -> bytes:
+        data = record.encoded.get(size)
+        if data is None:
+            buffer = io.BytesIO()
+            record.frame.downscaled(size).save(buffer, format="JPEG", quality=config.MEMORY_IMAGE_QUALITY)
+            data = record.encoded[size] = base64.b64encode(buffer.getvalue())
+        return data
+
+    def build(self) -> Tuple[str, List[HistoryImage]]:
+        """
+        Erstellt den Verlauf für den nächsten Request
+
+        Returns:
+            (Verlaufstext, Liste von (Base64, MIME-Type, Beschriftung) alt -> neu)
+        """
+        # Bilder zuerst, aber höchstens ihr Anteil am Budget; der Rest gehört dem Text
+        budget = self.token_budget
+        image_budget = int(budget * config.MEMORY_IMAGE_BUDGET_SHARE)
+        images = []
+        age = 0
+        for record in reversed(self.records):
+            if record.frame is None:
+                continue
+            size = self._image_size(record.frame, age)
+            age += 1
+            cost = estimate_image_tokens(size)
+            if cost > image_budget:
+                continue  # Zu teuer, ältere (kleinere) Bilder passen eventuell noch
+            images.append((self._encode(record, size), "image/jpeg",
+                           f"Screenshot vor Schritt {record.step} (verkleinert auf {size[0]}x{size[1]})"))
+            image_budget -= cost
+            budget -= cost
+
+        lines = []
+        for record in reversed(self.records):
+            cost = estimate_text_tokens(record.text)
+            if cost > budget:
+                break
+            lines.append(record.text)
+            budget -= cost
+
+        omitted = len(self.records) - len(lines)
+        if omitted:
+            lines.append(f"({omitted} frühere Schritte ausgelassen)")
+
+        self.last_tokens = self.token_budget - budget
+        lines.reverse()
+        images.reverse()
+        return "\n".join(lines), images
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "steps": len(self.records),
+            "images": sum(1 for record in self.records if record.frame is not None),
+            "last_tokens": self.last_tokens,
+            "token_budget": self.token_budget,
+        }
+
+
+def main():
+    """Test-Funktion für den Conversation Memory"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    from PIL import Image
+
+    print("Conversation Memory Test")
+    print("=" * 50)
+
+    memory = ConversationMemory(token_budget=600, max_images=2)
+    for step in range(1, 31):
+        frame = Frame(Image.new("RGB", (1920, 1080), (step * 8, 100, 200)))
+        action = {"action": "click", "parameters": {"x": step * 10, "y": 50},
+                  "reasoning": "Klicke auf das nächste Element in der Liste"}
+        memory.add_step(step, action, "erfolgreich", frame)
+
+    text, images = memory.build()
+    print(text)
+    print()
+    for data, mime_type, label in images:
+        print(f"{label}: {len(data)} Bytes ({mime_type})")
+    print(f"\nStatistiken: {memory.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
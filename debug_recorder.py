@@ -0,0 +1,287 @@
+"""
+Debug Recorder
+Asynchrone, begrenzte Aufzeichnung der gesendeten Screenshots für Debugging
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import config
+from screenshot_handler import CapturedFrame
+
+logger = logging.getLogger(__name__)
+
+FILE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+    "image/png": "png",
+}
+
+
+@dataclass
+class RecordedFrame:
+    """Eintrag im Ringpuffer (ein eindeutiger Frame)"""
+    digest: str
+    data: bytes
+    mime_type: str
+    first_seen: float
+    last_seen: float
+    steps: List[int] = field(default_factory=list)
+    filename: Optional[str] = None
+    size: int = 0  # Bytes auf der Platte (data ist bei Frames früherer Läufe leer)
+
+
+class DebugRecorder:
+    """
+    Zeichnet Frames in einem begrenzten Ringpuffer auf und schreibt sie im Hintergrund
+
+    record() legt nur einen Verweis in eine Queue und kehrt sofort zurück.
+    Der Writer-Thread decodiert, dedupliziert über den Inhalts-Hash (identische
+    Frames werden nur einmal gespeichert) und schreibt neue Frames samt
+    Index-Eintrag auf die Platte. Einträge, die den Ringpuffer wegen Anzahl,
+    Größe oder Alter verlassen, werden auch von der Platte entfernt und aus
+    dem Index gestrichen. Frames früherer Läufe im selben Verzeichnis werden
+    beim Start (nach Änderungszeit) in den Ringpuffer übernommen und zählen
+    zu denselben Grenzen.
+    """
+
+    def __init__(self, directory: str = None, max_frames: int = None,
+                 max_bytes: int = None, max_age: float = None):
+        self.directory = directory or config.DEBUG_RECORDER_DIR
+        self.max_frames = max_frames or config.DEBUG_RECORDER_MAX_FRAMES
+        self.max_bytes = max_bytes or config.DEBUG_RECORDER_MAX_BYTES
+        self.max_age = max_age or config.DEBUG_RECORDER_MAX_AGE
+
+        self.frames: "OrderedDict[str, RecordedFrame]" = OrderedDict()
+        self.total_bytes = 0
+        self._frames_lock = threading.Lock()
+
+        self.recorded_count = 0
+        self.duplicate_count = 0
+        self.dropped_count = 0
+        self.evicted_count = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, "index.jsonl")
+        self._load_existing()
+
+        self._queue = queue.Queue(maxsize=config.DEBUG_RECORDER_QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._write_loop, name="DebugRecorder", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _load_existing(self):
+        """Übernimmt Frames früherer Läufe in den Ringpuffer und wendet die Grenzen an"""
+        mime_types = {extension: mime_type for mime_type, extension in FILE_EXTENSIONS.items()}
+        found = []
+        for filename in os.listdir(self.directory):
+            digest, _, extension = filename.partition(".")
+            # Nur eigene Dateien: <blake2b-Hash>.<Endung>
+            if len(digest) != 32 or not all(c in "0123456789abcdef" for c in digest) \
+                    or (extension not in mime_types and extension != "bin"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, digest, filename, extension, stat.st_size))
+
+        with self._frames_lock:
+            for mtime, digest, filename, extension, size in sorted(found):
+                self.frames[digest] = RecordedFrame(digest, b"", mime_types.get(extension, "application/octet-stream"), mtime, mtime,
+                                                    filename=filename, size=size)
+                self.total_bytes += size
+            evicted = self._evict(time.time())
+
+        for old in evicted:
+            self._remove_file(old)
+        self._compact_index()
+        if found:
+            logger.info(f"Debug Recorder: {len(self.frames)} Frames früherer Läufe übernommen, "
+                        f"{len(evicted)} entfernt")
+
+    def record(self, step: int, frame: CapturedFrame, metadata: Dict = None) -> bool:
+        """
+        Übergibt einen Frame an den Writer-Thread (blockiert nie)
+
+        Args:
+            step: Schrittnummer
+            frame: Gesendeter Frame
+            metadata: Zusätzliche Angaben für den Index (z.B. Kontext)
+
+        Returns:
+            True wenn angenommen, False wenn die Queue voll ist
+        """
+        try:
+            self._queue.put_nowait((step, frame.base64_image, frame.mime_type, time.time(), metadata))
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            logger.debug(f"Debug Recorder ausgelastet, Frame von Schritt {step} verworfen")
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._store(*item)
+            except Exception as e:
+                logger.error(f"Fehler im Debug Recorder: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _store(self, step: int, base64_image: bytes, mime_type: str, timestamp: float,
+               metadata: Optional[Dict]):
+        """Dedupliziert, speichert und schreibt den Index-Eintrag (Writer-Thread)"""
+        data = base64.b64decode(base64_image)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+        with self._frames_lock:
+            entry = self.frames.get(digest)
+            if entry is not None:
+                # Identischer Frame: nur Verweis aktualisieren
+                entry.last_seen = timestamp
+                entry.steps.append(step)
+                self.frames.move_to_end(digest)
+                self.duplicate_count += 1
+            else:
+                entry = RecordedFrame(digest, data, mime_type, timestamp, timestamp, [step], size=len(data))
+                self.frames[digest] = entry
+                self.total_bytes += len(data)
+                self.recorded_count += 1
+            evicted = self._evict(timestamp)
+
+        if entry.filename is None:
+            entry.filename = f"{digest}.{FILE_EXTENSIONS.get(mime_type, 'bin')}"
+            with open(os.path.join(self.directory, entry.filename), "wb") as f:
+                f.write(data)
+
+        with open(self._index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "step": step,
+                "time": timestamp,
+                "file": entry.filename,
+                "metadata": metadata or {},
+            }, ensure_ascii=False) + "\n")
+
+        for old in evicted:
+            self._remove_file(old)
+        if evicted:
+            self._compact_index()
+
+    def _evict(self, now: float) -> List[RecordedFrame]:
+        """Entfernt die ältesten Einträge bis alle Grenzen eingehalten sind (Lock gehalten)"""
+        evicted = []
+        while self.frames:
+            oldest = next(iter(self.frames.values()))
+            too_many = len(self.frames) > self.max_frames
+            too_large = self.total_bytes > self.max_bytes and len(self.frames) > 1
+            too_old = now - oldest.last_seen > self.max_age
+            if not (too_many or too_large or too_old):
+                break
+            self.frames.popitem(last=False)
+            self.total_bytes -= oldest.size
+            self.evicted_count += 1
+            evicted.append(oldest)
+        return evicted
+
+    def _remove_file(self, entry: RecordedFrame):
+        if entry.filename is None:
+            return
+        try:
+            os.remove(os.path.join(self.directory, entry.filename))
+        except OSError as e:
+            logger.debug(f"Konnte {entry.filename} nicht löschen: {e}")
+
+    def _compact_index(self):
+        """Streicht Index-Einträge, deren Datei nicht mehr im Ringpuffer ist (atomar ersetzt)"""
+        if not os.path.exists(self._index_path):
+            return
+        with self._frames_lock:
+            retained = {entry.filename for entry in self.frames.values()}
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            kept = []
+            for line in lines:
+                try:
+                    if json.loads(line).get("file") in retained:
+                        kept.append(line)
+                except ValueError:
+                    continue  # Abgebrochene Zeile (z.B. nach Absturz)
+            if len(kept) == len(lines):
+                return
+            temp_path = f"{self._index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.writelines(kept)
+            os.replace(temp_path, self._index_path)
+        except OSError as e:
+            logger.warning(f"Index des Debug Recorders konnte nicht bereinigt werden: {e}")
+
+    def flush(self):
+        """Wartet bis alle angenommenen Frames geschrieben sind"""
+        self._queue.join()
+
+    def close(self):
+        """Schreibt ausstehende Frames und beendet den Writer-Thread"""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=5.0)
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        with self._frames_lock:
+            return {
+                "frames": len(self.frames),
+                "bytes": self.total_bytes,
+                "recorded": self.recorded_count,
+                "duplicates": self.duplicate_count,
+                "dropped": self.dropped_count,
+                "evicted": self.evicted_count,
+            }
+
+
+def main():
+    """Test-Funktion für den Debug Recorder"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    from screenshot_handler import ScreenshotHandler
+
+    print("Debug Recorder Test")
+    print("=" * 50)
+
+    handler = ScreenshotHandler()
+    recorder = DebugRecorder(max_frames=3)
+
+    for step in range(1, 6):
+        frame = handler.capture_frame()
+        if frame is None:
+            print("✗ Screenshot fehlgeschlagen")
+            break
+        start = time.perf_counter()
+        recorder.record(step, frame)
+        print(f"Schritt {step}: aufgezeichnet in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    recorder.flush()
+    print(f"\nStatistiken: {recorder.get_stats()}")
+    print(f"Verzeichnis: {recorder.directory}")
+    recorder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Decision Cache
+Merkt sich Entscheidungen der KI für wiederkehrende Bildschirme (Perceptual Hash als Schlüssel)
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_task(task: str) -> str:
+    """Normalisiert eine Aufgabenbeschreibung (Groß-/Kleinschreibung, Leerzeichen)"""
+    return re.sub(r"\s+", " ", task.strip().lower())
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Anzahl unterschiedlicher Bits zweier Hashes"""
+    return bin(a ^ b).count("1")
+
+
+def cacheable_action(action: Dict) -> Optional[Dict]:
+    """
+    Speicherbarer Teil einer Action oder None
+
+    "done" wird nie gespeichert: ein ähnlich aussehender Bildschirm würde die
+    Aufgabe sonst ohne Rückfrage als erledigt beenden. Plan-Schritte und
+    Metadaten (z.B. "_model") gehören nur zur ursprünglichen Antwort.
+    """
+    if action.get("action") == "done":
+        return None
+    return {key: value for key, value in action.items() if not key.startswith("_") and key != "plan"}
+
+
+class DecisionCache:
+    """
+    LRU-Cache für Actions, Schlüssel: (normalisierte Aufgabe, Kontext, Bild-Hash)
+
+    Aufgabe und Kontext müssen exakt übereinstimmen, der Bild-Hash darf sich
+    um bis zu max_distance Bits unterscheiden. Einträge verfallen nach ttl
+    Sekunden und werden bei Fehlschlag der Action entfernt. Optional wird der
+    Cache als JSON-Datei über Programmläufe hinweg gespeichert.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = None,
+                 max_distance: int = None, ttl: float = None):
+        self.path = config.DECISION_CACHE_FILE if path is None else path
+        self.max_entries = max_entries or config.DECISION_CACHE_MAX_ENTRIES
+        self.max_distance = config.DECISION_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self.ttl = ttl or config.DECISION_CACHE_TTL
+
+        # (task, context, hash) -> Eintrag, Reihenfolge = LRU
+        self.entries: "OrderedDict[Tuple[str, str, int], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def _find(self, task: str, context: str, image_hash: int, now: float) -> Optional[Tuple]:
+        """Sucht den ähnlichsten gültigen Eintrag (Lock gehalten)"""
+        best_key, best_distance = None, self.max_distance + 1
+        expired = []
+        for key, entry in self.entries.items():
+            if key[0] != task or key[1] != context:
+                continue
+            if now - entry["created"] > self.ttl:
+                expired.append(key)
+                continue
+            distance = hamming_distance(key[2], image_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        for key in expired:
+            del self.entries[key]
+            self._dirty = True
+        return best_key
+
+    def get(self, task: str, context: str, image_hash: int) -> Optional[Dict]:
+        """
+        Sucht eine gespeicherte Action
+
+        Args:
+            task: Benutzeraufgabe
+            context: Kontext des Schritts
+            image_hash: Perceptual Hash des Bildschirms
+
+        Returns:
+            Kopie der Action oder None
+        """
+        now = time.time()
+        with self._lock:
+            key = self._find(normalize_task(task), context or "", image_hash, now)
+            if key is None:
+                self.misses += 1
+                return None
+
+            entry = self.entries[key]
+            entry["hits"] += 1
+            entry["last_used"] = now
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self._dirty = True
+            return json.loads(json.dumps(entry["action"]))
+
+    def put(self, task: str, context: str, image_hash: int, action: Dict):
+        """
+        Speichert eine Action (erfolgreich ausgeführt, Bildschirmkoordinaten)
+
+        Args:
+            task: Benutzeraufgabe
+            context: Kontext des Schritts
+            image_hash: Perceptual Hash des Bildschirms
+            action: Action Dictionary
+        """
+        if action.get("confidence", 0) < config.DECISION_CACHE_MIN_CONFIDENCE:
+            return
+        action = cacheable_action(action)
+        if action is None:
+            return
+
+        now = time.time()
+        key = (normalize_task(task), context or "", image_hash)
+        with self._lock:
+            self.entries[key] = {
+                "action": action,
+                "created": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+    def invalidate(self, task: str, context: str, image_hash: int) -> bool:
+        """
+        Entfernt den Eintrag, der für diesen Schritt verwendet würde
+
+        Returns:
+            True wenn ein Eintrag entfernt wurde
+        """
+        with self._lock:
+            key = self._find(normalize_task(task), context or "", image_hash, time.time())
+            if key is None:
+                return False
+            del self.entries[key]
+            self.invalidations += 1
+            self._dirty = True
+        logger.info("Cache-Eintrag nach fehlgeschlagener Action entfernt")
+        return True
+
+    def load(self):
+        """Lädt den Cache aus der Datei (fehlende oder defekte Datei = leerer Cache)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            with self._lock:
+                for item in data.get("entries", []):
+                    action = cacheable_action(item["action"])
+                    if action is None or now - item["created"] > self.ttl:
+                        continue  # Auch ältere Dateien können "done" enthalten
+                    key = (item["task"], item["context"], int(item["hash"], 16))
+                    self.entries[key] = {
+                        "action": action,
+                        "created": item["created"],
+                        "last_used": item["last_used"],
+                        "hits": item.get("hits", 0),
+                    }
+            logger.info(f"Decision Cache geladen: {len(self.entries)} Einträge")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Decision Cache konnte nicht geladen werden: {e}")
+
+    def save(self):
+        """Speichert den Cache atomar in die Datei"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {"entries": [
+                {
+                    "task": task,
+                    "context": context,
+                    "hash": format(image_hash, "x"),
+                    **entry,
+                }
+                for (task, context, image_hash), entry in self.entries.items()
+            ]}
+            self._dirty = False
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Decision Cache konnte nicht gespeichert werden: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def main():
+    """Test-Funktion für den Decision Cache"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    import random
+
+    print("Decision Cache Test")
+    print("=" * 50)
+
+    cache = DecisionCache(path="")
+    task = "Öffne  den Browser"
+    screen_hash = random.getrandbits(256)
+    action = {"action": "click", "parameters": {"x": 10, "y": 20}, "reasoning": "Test", "confidence": 0.9}
+
+    cache.put(task, "Schritt 1 - Initialisierung", screen_hash, action)
+    similar_hash = screen_hash ^ 0b101  # 2 Bits Unterschied
+
+    print(f"Ähnlicher Bildschirm: {cache.get('öffne den browser', 'Schritt 1 - Initialisierung', similar_hash)}")
+    print(f"Anderer Kontext: {cache.get(task, 'Letzte Action (click) war erfolgreich', similar_hash)}")
+    print(f"Anderer Bildschirm: {cache.get(task, 'Schritt 1 - Initialisierung', screen_hash ^ ((1 << 256) - 1))}")
+
+    cache.invalidate(task, "Schritt 1 - Initialisierung", screen_hash)
+    print(f"Nach Invalidierung: {cache.get(task, 'Schritt 1 - Initialisierung', screen_hash)}")
+    print(f"\nStatistiken: {cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Element Locator
+Findet früher geklickte Elemente per Template Matching (FFT) wieder, ohne die KI zu fragen
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import config
+from decision_cache import normalize_task
+from frame import Frame
+
+logger = logging.getLogger(__name__)
+
+# (normalisierte Aufgabe, Schritt, Kontext)
+LocatorKey = Tuple[str, int, str]
+
+
+def _window_sums(array: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Summen aller Fenster der Größe height x width (Integralbild)"""
+    integral = np.zeros((array.shape[0] + 1, array.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(array, axis=0, dtype=np.float64), axis=1, out=integral[1:, 1:])
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+def match_template(image: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """
+    Normalisierte Kreuzkorrelation (NCC) des Templates an jeder Position
+
+    Die Korrelation wird per FFT berechnet, Mittelwert und Varianz jedes
+    Fensters über Integralbilder, alles ohne Python-Schleifen.
+
+    Args:
+        image: Graustufenbild (H, W)
+        template: Graustufen-Template (h, w), h <= H und w <= W
+
+    Returns:
+        Scores in [-1, 1] der Form (H - h + 1, W - w + 1) für die linke obere Ecke
+    """
+    image = image.astype(np.float32, copy=False)
+    height, width = template.shape
+    zero_mean = template.astype(np.float32) - float(template.mean())
+    template_norm = float(np.sqrt((zero_mean ** 2).sum()))
+
+    # Zirkuläre Korrelation in Bildgröße reicht: gültige Positionen wickeln nicht um
+    spectrum = np.fft.rfft2(image) * np.conj(np.fft.rfft2(zero_mean, s=image.shape))
+    correlation = np.fft.irfft2(spectrum, s=image.shape)[:image.shape[0] - height + 1,
+                                                         :image.shape[1] - width + 1]
+
+    count = height * width
+    sums = _window_sums(image, height, width)
+    squares = _window_sums(np.square(image, dtype=np.float64), height, width)
+    deviation = np.sqrt(np.maximum(squares - sums * sums / count, 0.0))
+
+    denominator = deviation * template_norm
+    scores = np.zeros_like(correlation)
+    np.divide(correlation, denominator, out=scores, where=denominator > 1e-6 * count)
+    return np.clip(scores, -1.0, 1.0)
+
+
+def best_match(scores: np.ndarray, exclusion: Tuple[int, int]) -> Tuple[Tuple[int, int], float, float]:
+    """
+    Bester Treffer und bester Treffer außerhalb seiner Umgebung
+
+    Args:
+        scores: Ergebnis von match_template
+        exclusion: Halbe Größe (h, w) der Umgebung, die für den zweiten Treffer ausgeblendet wird
+
+    Returns:
+        ((x, y) des Treffers, Score, zweitbester Score)
+    """
+    index = int(np.argmax(scores))
+    y, x = divmod(index, scores.shape[1])
+    score = float(scores[y, x])
+
+    masked = scores.copy()
+    masked[max(y - exclusion[0], 0):y + exclusion[0] + 1, max(x - exclusion[1], 0):x + exclusion[1] + 1] = -1.0
+    second = float(masked.max()) if masked.size else -1.0
+    return (x, y), score, second
+
+
+@dataclass
+class ElementTemplate:
+    """Bildausschnitt um ein erfolgreich geklicktes Element"""
+    label: str
+    action: Dict  # Action mit Bildschirmkoordinaten
+    patch: np.ndarray  # Graustufen uint8 in Frame-Auflösung
+    offset: Tuple[int, int]  # Klickpunkt relativ zur linken oberen Ecke des Patches
+    position: Tuple[int, int]  # Zuletzt gefundene linke obere Ecke im Frame
+    created: float
+    last_used: float
+    hits: int = 0
+    _coarse: Dict[int, np.ndarray] = field(default_factory=dict, repr=False)
+
+    def coarse(self, factor: int) -> np.ndarray:
+        """Um factor verkleinerter Patch für die Grobsuche"""
+        patch = self._coarse.get(factor)
+        if patch is None:
+            size = (max(self.patch.shape[1] // factor, 1), max(self.patch.shape[0] // factor, 1))
+            patch = np.asarray(Image.fromarray(self.patch).resize(size, Image.Resampling.BOX), dtype=np.float32)
+            self._coarse[factor] = patch
+        return patch
+
+
+class ElementLocator:
+    """
+    Löst Klicks auf bekannte Elemente lokal auf
+
+    Nach jedem erfolgreichen Klick wird ein kleiner Ausschnitt um das Ziel
+    gespeichert, Schlüssel: (Aufgabe, Schritt, Kontext). Kommt derselbe
+    Schritt wieder, wird der Ausschnitt im aktuellen Frame gesucht: erst in
+    der Umgebung der letzten Position in voller Auflösung, dann im ganzen
+    Frame verkleinert mit anschließender Verfeinerung. Nur ein eindeutiger
+    Treffer (Score und Abstand zum zweitbesten Treffer) ersetzt den API
+    Request. Schlägt ein lokal aufgelöster Klick fehl, wird der Eintrag
+    entfernt; sonst LRU mit Höchstzahl und Ablaufzeit.
+    """
+
+    def __init__(self, screen_size: Tuple[int, int] = None, path: Optional[str] = None,
+                 max_entries: int = None, ttl: float = None):
+        self.screen_size = screen_size
+        self.path = config.LOCATOR_FILE if path is None else path
+        self.max_entries = max_entries or config.LOCATOR_MAX_ENTRIES
+        self.ttl = ttl or config.LOCATOR_TTL
+
+        self.entries: "OrderedDict[LocatorKey, ElementTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.last_search_time = 0.0
+
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def _scale(self, frame: Frame) -> Tuple[float, float]:
+        """Frame-Pixel pro Bildschirmpixel"""
+        if not self.screen_size:
+            return 1.0, 1.0
+        return frame.width / self.screen_size[0], frame.height / self.screen_size[1]
+
+    @staticmethod
+    def _key(task: str, step: int, context: str) -> LocatorKey:
+        return normalize_task(task), step, context or ""
+
+    def remember(self, task: str, step: int, context: str, action: Dict, frame: Frame) -> bool:
+        """
+        Speichert den Ausschnitt um das Ziel eines erfolgreichen Klicks
+
+        Args:
+            task: Benutzeraufgabe
+            step: Schrittnummer
+            context: Kontext des Schritts
+            action: Ausgeführte Action (Bildschirmkoordinaten)
+            frame: Frame, auf dem die Entscheidung beruhte
+
+        Returns:
+            True wenn ein Template gespeichert wurde
+        """
+        if action.get("action") not in config.COORDINATE_ACTIONS:
+            return False
+        try:
+            x, y = float(action["parameters"]["x"]), float(action["parameters"]["y"])
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        scale_x, scale_y = self._scale(frame)
+        center_x, center_y = int(round(x * scale_x)), int(round(y * scale_y))
+        half = config.LOCATOR_PATCH_SIZE // 2
+        left, top = max(center_x - half, 0), max(center_y - half, 0)
+        right, bottom = min(center_x + half, frame.width), min(center_y + half, frame.height)
+        if right - left < half or bottom - top < half:
+            return False  # Ziel am Rand, Ausschnitt zu klein
+
+        gray = frame.gray_array(frame.size, np.uint8)
+        patch = np.array(gray[top:bottom, left:right])
+        if float(patch.std()) < config.LOCATOR_MIN_CONTRAST:
+            logger.debug("Kein Template: Umgebung des Klicks ist zu gleichförmig")
+            return False
+
+        now = time.time()
+        label = (action.get("reasoning") or action["action"]).strip()[:60]
+        template = ElementTemplate(
+            label=label,
+            action={k: v for k, v in action.items() if not k.startswith("_") and k != "plan"},
+            patch=patch,
+            offset=(center_x - left, center_y - top),
+            position=(left, top),
+            created=now,
+            last_used=now,
+        )
+        key = self._key(task, step, context)
+        with self._lock:
+            self.entries[key] = template
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+        return True
+
+    def find(self, task: str, step: int, context: str, frame: Frame) -> Optional[Dict]:
+        """
+        Sucht das Element dieses Schritts im aktuellen Frame
+
+        Args:
+            task: Benutzeraufgabe
+            step: Schrittnummer
+            context: Kontext des Schritts
+            frame: Aktueller Frame
+
+        Returns:
+            Action mit aktuellen Bildschirmkoordinaten (markiert mit "_located") oder None
+        """
+        key = self._key(task, step, context)
+        now = time.time()
+        with self._lock:
+            template = self.entries.get(key)
+            if template is not None and now - template.created > self.ttl:
+                del self.entries[key]
+                self._dirty = True
+                template = None
+        if template is None:
+            return None
+
+        start = time.perf_counter()
+        match = self._search(template, frame)
+        self.last_search_time = time.perf_counter() - start
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                logger.debug(f"Element '{template.label}' nicht eindeutig gefunden "
+                             f"({self.last_search_time * 1000:.0f} ms)")
+                return None
+
+            (left, top), score = match
+            template.position = (left, top)
+            template.last_used = now
+            template.hits += 1
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self._dirty = True
+
+        scale_x, scale_y = self._scale(frame)
+        x = int(round((left + template.offset[0]) / scale_x))
+        y = int(round((top + template.offset[1]) / scale_y))
+        action = json.loads(json.dumps(template.action))
+        action["parameters"] = dict(action["parameters"], x=x, y=y)
+        action["confidence"] = score
+        action["reasoning"] = f"Lokal gefunden: {template.label} (Score {score:.2f})"
+        action["_located"] = True
+        logger.info(f"Element lokal gefunden bei ({x}, {y}), Score {score:.3f} "
+                    f"in {self.last_search_time * 1000:.0f} ms")
+        return action
+
+    def _search(self, template: ElementTemplate, frame: Frame) -> Optional[Tuple[Tuple[int, int], float]]:
+        """Sucht das Template: erst lokal, dann grob im ganzen Frame mit Verfeinerung"""
+        gray = frame.gray_array(frame.size, np.uint8)
+        height, width = template.patch.shape
+        if height > gray.shape[0] or width > gray.shape[1]:
+            return None
+
+        # 1. Umgebung der letzten Position in voller Auflösung
+        radius = config.LOCATOR_SEARCH_RADIUS
+        match = self._search_window(gray, template.patch, template.position, radius)
+        if match is not None:
+            return match
+
+        # 2. Ganzer Frame verkleinert, Kandidat in voller Auflösung bestätigen
+        factor = config.LOCATOR_COARSE_FACTOR
+        coarse_frame = frame.gray_array((frame.width // factor, frame.height // factor), np.float32)
+        coarse_patch = template.coarse(factor)
+        if coarse_patch.shape[0] > coarse_frame.shape[0] or coarse_patch.shape[1] > coarse_frame.shape[1]:
+            return None
+        scores = match_template(coarse_frame, coarse_patch)
+        (x, y), score, second = best_match(scores, (coarse_patch.shape[0] // 2, coarse_patch.shape[1] // 2))
+        if score < config.LOCATOR_MIN_SCORE - 0.1 or score - second < config.LOCATOR_MIN_MARGIN:
+            return None
+        return self._search_window(gray, template.patch, (x * factor, y * factor), 2 * factor,
+                                   check_margin=False)
+
+    @staticmethod
+    def _search_window(gray: np.ndarray, patch: np.ndarray, position: Tuple[int, int], radius: int,
+                       check_margin: bool = True) -> Optional[Tuple[Tuple[int, int], float]]:
+        height, width = patch.shape
+        left, top = max(position[0] - radius, 0), max(position[1] - radius, 0)
+        right = min(position[0] + width + radius, gray.shape[1])
+        bottom = min(position[1] + height + radius, gray.shape[0])
+        if right - left < width or bottom - top < height:
+            return None
+
+        scores = match_template(gray[top:bottom, left:right], patch)
+        (x, y), score, second = best_match(scores, (height // 2, width // 2))
+        if score < config.LOCATOR_MIN_SCORE:
+            return None
+        if check_margin and score - second < config.LOCATOR_MIN_MARGIN:
+            return None  # Mehrdeutig (z.B. gleiche Icons nebeneinander)
+        return (left + x, top + y), score
+
+    def invalidate(self, task: str, step: int, context: str) -> bool:
+        """
+        Entfernt das Template nach einem fehlgeschlagenen lokal aufgelösten Klick
+
+        Returns:
+            True wenn ein Eintrag entfernt wurde
+        """
+        with self._lock:
+            if self.entries.pop(self._key(task, step, context), None) is None:
+                return False
+            self.invalidations += 1
+            self._dirty = True
+        logger.info("Element-Template nach fehlgeschlagener Action entfernt")
+        return True
+
+    def load(self):
+        """Lädt die Templates aus der Datei (fehlende oder defekte Datei = leer)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                now = time.time()
+                with self._lock:
+                    for index, item in enumerate(meta):
+                        if now - item["created"] > self.ttl:
+                            continue
+                        key = (item["task"], item["step"], item["context"])
+                        self.entries[key] = ElementTemplate(
+                            label=item["label"],
+                            action=item["action"],
+                            patch=data[f"patch_{index}"],
+                            offset=tuple(item["offset"]),
+                            position=tuple(item["position"]),
+                            created=item["created"],
+                            last_used=item["last_used"],
+                            hits=item.get("hits", 0),
+                        )
+            logger.info(f"Element Locator geladen: {len(self.entries)} Templates")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Element Locator konnte nicht geladen werden: {e}")
+
+    def save(self):
+        """Speichert die Templates atomar in die Datei"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            meta, patches = [], {}
+            for index, ((task, step, context), template) in enumerate(self.entries.items()):
+                meta.append({
+                    "task": task, "step": step, "context": context,
+                    "label": template.label, "action": template.action,
+                    "offset": template.offset, "position": template.position,
+                    "created": template.created, "last_used": template.last_used, "hits": template.hits,
+                })
+                patches[f"patch_{index}"] = template.patch
+            self._dirty = False
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **patches)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Element Locator konnte nicht gespeichert werden: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        lookups = self.hits + self.misses
+        return {
+            "templates": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "last_search_time": self.last_search_time,
+        }
+
+
+def main():
+    """Test-Funktion für den Element Locator"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    from PIL import ImageDraw
+
+    print("Element Locator Test")
+    print("=" * 50)
+
+    def desktop(icon_position: Tuple[int, int]) -> Frame:
+        image = Image.new("RGB", (1920, 1080), (40, 90, 140))
+        draw = ImageDraw.Draw(image)
+        for i in range(12):
+            draw.rectangle([60 + i * 150, 980, 140 + i * 150, 1060], fill=(200, 200, 200))
+        x, y = icon_position
+        draw.ellipse([x - 24, y - 24, x + 24, y + 24], fill=(240, 120, 20))
+        draw.text((x - 10, y - 6), "OK", fill=(0, 0, 0))
+        return Frame(image)
+
+    locator = ElementLocator(path="")
+    action = {"action": "click", "parameters": {"x": 500, "y": 300}, "confidence": 0.9,
+              "is_critical": False, "reasoning": "OK-Button"}
+    print(f"Gespeichert: {locator.remember('Test', 1, '', action, desktop((500, 300)))}")
+
+    for position in [(505, 302), (1400, 700)]:
+        found = locator.find("Test", 1, "", desktop(position))
+        params = found["parameters"] if found else None
+        print(f"Element bei {position}: {params} ({locator.last_search_time * 1000:.0f} ms)")
+
+    print(f"\nStatistiken: {locator.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
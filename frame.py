@@ -0,0 +1,138 @@
+"""
+Frame
+Screenshot mit gemeinsam genutzter, lazy berechneter Auflösungspyramide
+"""
+
+import threading
+import time
+from typing import Dict, Tuple, Union
+import numpy as np
+from PIL import Image
+
+Size = Tuple[int, int]
+
+
+def fit_size(size: Size, max_size: Size) -> Size:
+    """Größe unter Beibehaltung des Seitenverhältnisses in max_size einpassen"""
+    width, height = size
+    if width <= max_size[0] and height <= max_size[1]:
+        return size
+    scale = min(max_size[0] / width, max_size[1] / height)
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+class Frame:
+    """
+    Ein aufgenommener Screenshot und alle daraus abgeleiteten Ansichten
+
+    Verkleinerte Versionen, Graustufen und NumPy-Arrays werden beim ersten
+    Zugriff berechnet und gemerkt. Jede Ansicht wird aus der kleinsten bereits
+    vorhandenen Stufe erzeugt, die noch groß genug ist, sodass Encoder,
+    Änderungserkennung und Settle-Erkennung sich eine Verkleinerung teilen.
+    Frames sind nach der Aufnahme unveränderlich und threadsicher.
+    """
+
+    def __init__(self, image: Image.Image, captured_at: float = None):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        self.image = image
+        self.captured_at = time.time() if captured_at is None else captured_at
+
+        self._levels: Dict[Size, Image.Image] = {image.size: image}
+        self._gray: Dict[Size, Image.Image] = {}
+        self._arrays: Dict[Tuple[Size, str], np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> Size:
+        return self.image.size
+
+    @property
+    def width(self) -> int:
+        return self.image.width
+
+    @property
+    def height(self) -> int:
+        return self.image.height
+
+    def _source_for(self, size: Size) -> Image.Image:
+        """Kleinste vorhandene RGB-Stufe, die mindestens size groß ist"""
+        candidates = [level for level_size, level in self._levels.items()
+                      if level_size[0] >= size[0] and level_size[1] >= size[1]]
+        return min(candidates, key=lambda level: level.width * level.height)
+
+    def downscaled(self, max_size: Size) -> Image.Image:
+        """
+        Verkleinerte Version (Seitenverhältnis bleibt erhalten, LANCZOS)
+
+        Args:
+            max_size: Maximale Größe (width, height)
+
+        Returns:
+            PIL Image (nicht verändern, wird geteilt)
+        """
+        target = fit_size(self.size, max_size)
+        with self._lock:
+            level = self._levels.get(target)
+            if level is None:
+                level = self._source_for(target).resize(target, Image.Resampling.LANCZOS)
+                self._levels[target] = level
+            return level
+
+    def gray(self, size: Size) -> Image.Image:
+        """
+        Graustufen-Version in exakt dieser Größe (BOX-Filter, für Vergleiche)
+
+        Args:
+            size: Zielgröße (width, height), Seitenverhältnis wird nicht erhalten
+
+        Returns:
+            PIL Image im Modus L (nicht verändern, wird geteilt)
+        """
+        with self._lock:
+            gray = self._gray.get(size)
+            if gray is None:
+                source = self._source_for(size)
+                if source is self.image:
+                    source = self._reduced_for(size)
+                gray = source.convert("L").resize(size, Image.Resampling.BOX)
+                self._gray[size] = gray
+            return gray
+
+    def _reduced_for(self, size: Size) -> Image.Image:
+        """
+        Günstige Zwischenstufe per ganzzahliger Box-Reduktion (Lock gehalten)
+
+        Vermeidet, dass kleine Vergleichsansichten jedes Mal die volle
+        Auflösung in Graustufen umrechnen.
+        """
+        factor = min(self.width // max(size[0], 1), self.height // max(size[1], 1))
+        if factor < 2:
+            return self.image
+        level = self.image.reduce(factor)
+        self._levels.setdefault(level.size, level)
+        return level
+
+    def gray_array(self, size: Size, dtype: Union[str, type] = np.int16) -> np.ndarray:
+        """
+        Graustufen-Version als NumPy Array
+
+        Args:
+            size: Zielgröße (width, height)
+            dtype: Datentyp des Arrays (int16 erlaubt Differenzen ohne Überlauf)
+
+        Returns:
+            Array der Form (height, width), schreibgeschützt
+        """
+        key = (size, np.dtype(dtype).str)
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is None:
+                array = np.asarray(self.gray(size), dtype=dtype)
+                array.flags.writeable = False
+                self._arrays[key] = array
+            return array
+
+    def crop(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        """Ausschnitt aus der vollen Auflösung"""
+        return self.image.crop(box)
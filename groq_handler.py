@@ -3,17 +3,40 @@ Groq Handler
 Verwaltet die Kommunikation mit der Groq Vision API
 """
 
-import json
+import asyncio
 import logging
+import threading
 import requests
-from typing import Dict, Optional, List
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, List, Tuple, Union
 import time
 
 import config
+from action_schema import SHORT_KEYS, ActionSchema, expand_keys, extract_json_object
+from conversation_memory import ConversationMemory
+from decision_cache import DecisionCache
+from frame import Frame
+from groq_transport import (AsyncGroqTransport, GroqTransport, HttpStatusError, TransportError,
+                            get_shared_async_transport)
+from metrics import get_registry
+from model_router import ModelRouter
+from payload_builder import PayloadBuilder
+from rate_limiter import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, RateLimiter, get_rate_limiter
+from request_hedger import RequestHedger
+from stream_parser import IncrementalActionParser, iter_completion_deltas
+from traffic_recorder import TrafficRecorder
 
 logger = logging.getLogger(__name__)
 
 
+class RateLimitedError(Exception):
+    """Die API hat mit 429 geantwortet"""
+
+    def __init__(self, headers=None):
+        super().__init__("HTTP 429: Rate Limit erreicht")
+        self.headers = headers or {}
+
+
 class GroqHandler:
     """Verwaltet Groq API Anfragen und Antworten"""
 
@@ -21,13 +44,45 @@ class GroqHandler:
         self.api_key = api_key or config.GROQ_API_KEY
         self.model = config.GROQ_MODEL
         self.endpoint = config.GROQ_API_ENDPOINT
-        self.conversation_history = []
+        self.conversation_history = ConversationMemory() if config.MEMORY_ENABLED else None
         self.request_count = 0
+        self.zoom_count = 0
+        self.last_payload_size = 0
+        self.streamed_count = 0
+        self.early_action_count = 0
+        self.last_time_to_action = None
+        # Reasoning vorzeitig ausgeführter Actions (Stream-Nummer -> Future aus dem GroqStream Thread)
+        self.stream_reasoning: Dict[int, Future] = {}
+        self._stream_number = 0
 
         if not self.api_key:
             raise ValueError("Groq API Key ist erforderlich!")
 
-    def create_vision_message(self, base64_image: str, user_task: str, context: str = None) -> List[Dict]:
+        self.payload_builder = PayloadBuilder()
+        self.schema = ActionSchema()
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.decision_cache = DecisionCache() if config.DECISION_CACHE_ENABLED else None
+        self.router = ModelRouter() if config.MODEL_CASCADE_ENABLED else None
+        self.escalation_count = 0
+
+        # Gemeinsamer Rate Limiter aller Handler mit diesem API Key
+        self.rate_limiter: Optional[RateLimiter] = None
+        if config.RATE_LIMIT_ENABLED:
+            self.rate_limiter = get_rate_limiter(self.api_key)
+
+        # Persistenter Connection Pool, Verbindung wird parallel zum ersten Screenshot aufgebaut
+        self.transport = GroqTransport(self.endpoint)
+        if config.HTTP_PREWARM:
+            self.transport.prewarm()
+        self.hedger = RequestHedger() if config.HEDGE_ENABLED else None
+        self.recorder = TrafficRecorder() if config.TRAFFIC_RECORD_FILE else None
+        self.metrics = get_registry()
+
+    def create_vision_message(self, base64_image: Union[str, bytes], user_task: str, context: str = None,
+                              mime_type: str = "image/jpeg", allow_zoom: bool = False) -> List[Dict]:
         """
         Erstellt eine Nachricht mit Bild für die Vision API
 
@@ -35,10 +90,26 @@ class GroqHandler:
             base64_image: Base64-encoded Screenshot
             user_task: Benutzeraufgabe
             context: Zusätzlicher Kontext (optional)
+            mime_type: MIME-Type des Bildes
+            allow_zoom: Zoom-Action im System-Prompt anbieten
 
         Returns:
             Message List für API Request
         """
+        if isinstance(base64_image, bytes):
+            base64_image = base64_image.decode('ascii')
+        return self._build_messages(f"data:{mime_type};base64,{base64_image}",
+                                    user_task, context, allow_zoom)
+
+    def _build_messages(self, image_url: str, user_task: str, context: str = None,
+                        allow_zoom: bool = False, stream: bool = False,
+                        history: Tuple[str, List[Tuple[str, str]]] = None) -> List[Dict]:
+        """
+        Erstellt die Message List mit der angegebenen Bild-URL (oder Platzhalter)
+
+        history ist (Verlaufstext, Liste von (Bild-URL, Beschriftung)) und
+        steht vor dem aktuellen Screenshot.
+        """
         # User Content mit Bild und Text
         content = [
             {
@@ -48,11 +119,24 @@ class GroqHandler:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                    "url": image_url
                 }
             }
         ]
 
+        # Verlauf der bisherigen Schritte vor den aktuellen Screenshot
+        if history is not None:
+            history_text, history_images = history
+            history_content = []
+            if history_text:
+                history_content.append({"type": "text", "text": f"Bisherige Schritte:\n{history_text}\n\n"})
+            for url, label in history_images:
+                history_content.append({"type": "text", "text": f"{label}:"})
+                history_content.append({"type": "image_url", "image_url": {"url": url}})
+            if history_images:
+                history_content.append({"type": "text", "text": "Aktueller Screenshot folgt.\n\n"})
+            content[0:0] = history_content
+
         # Füge Kontext hinzu wenn vorhanden
         if context:
             content.insert(0, {
@@ -60,95 +144,389 @@ class GroqHandler:
                 "text": f"Kontext: {context}\n\n"
             })
 
+        if config.COMPACT_PROTOCOL_ENABLED:
+            prompts = (config.COMPACT_SYSTEM_PROMPT, config.COMPACT_ZOOM_PROMPT,
+                       config.COMPACT_PLAN_PROMPT, config.COMPACT_STREAM_PROMPT)
+        else:
+            prompts = (config.SYSTEM_PROMPT, config.ZOOM_PROMPT, config.PLAN_PROMPT, config.STREAM_PROMPT)
+        system_prompt, zoom_prompt, plan_prompt, stream_prompt = prompts
+
+        if allow_zoom:
+            system_prompt += zoom_prompt
+        if config.PLAN_MODE_ENABLED:
+            system_prompt += plan_prompt
+        if stream:
+            system_prompt += stream_prompt
+
         return [
-            {"role": "system", "content": config.SYSTEM_PROMPT},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": content}
         ]
 
-    def get_next_action(self, base64_image: str, user_task: str,
-                       context: str = None, max_retries: int = 3) -> Optional[Dict]:
+    def build_request_body(self, base64_image: Union[str, bytes], user_task: str, context: str = None,
+                           mime_type: str = "image/jpeg", allow_zoom: bool = False,
+                           stream: bool = None, model: str = None) -> bytes:
+        """
+        Erstellt den fertigen Request Body
+
+        Das Bild wird ohne Umweg über Strings und json.dumps direkt in den
+        serialisierten Request eingesetzt; der Body wird für alle
+        Wiederholungsversuche unverändert verwendet.
+
+        Args:
+            base64_image: Base64-encoded Screenshot (bytes bevorzugt)
+            user_task: Benutzeraufgabe
+            context: Zusätzlicher Kontext
+            mime_type: MIME-Type des Bildes
+            allow_zoom: Zoom-Action im System-Prompt anbieten
+            stream: Antwort als Server-Sent Events (Standard: STREAMING_ENABLED)
+            model: Modell (Standard: GROQ_MODEL)
+
+        Returns:
+            Request Body als UTF-8 JSON Bytes
+        """
+        stream = config.STREAMING_ENABLED if stream is None else stream
+
+        # Bilder in der Reihenfolge ihres Vorkommens: erst Verlauf, dann aktueller Screenshot
+        history = None
+        images = []
+        if self.conversation_history is not None:
+            history_text, history_images = self.conversation_history.build()
+            history = (history_text, [(self.payload_builder.placeholder(index), label)
+                                      for index, (_, _, label) in enumerate(history_images)])
+            images = [(data, image_mime_type) for data, image_mime_type, _ in history_images]
+
+        messages = self._build_messages(self.payload_builder.placeholder(len(images)),
+                                        user_task, context, allow_zoom, stream, history)
+        images.append((base64_image, mime_type))
+        return self.payload_builder.build(self._create_payload(messages, stream, model), images)
+
+    def _create_payload(self, messages: List[Dict], stream: bool = False, model: str = None) -> Dict:
+        """Request Parameter ohne Bilddaten"""
+        payload = {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": 0.3,  # Niedrige Temperatur für konsistente Ergebnisse
+            "max_tokens": 1024,
+            "top_p": 1,
+            "stream": stream
+        }
+        if config.COMPACT_PROTOCOL_ENABLED:
+            # Output-Tokens bestimmen die Generierungszeit: Antwort knapp begrenzen
+            payload["max_tokens"] = config.COMPACT_MAX_TOKENS
+            if config.PLAN_MODE_ENABLED:
+                payload["max_tokens"] += config.COMPACT_PLAN_STEP_TOKENS * (config.PLAN_MAX_ACTIONS - 1)
+            # Die API unterstützt den JSON-Modus nicht zusammen mit Streaming
+            if config.COMPACT_JSON_MODE and not stream:
+                payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def get_next_action(self, base64_image: Union[str, bytes], user_task: str,
+                       context: str = None, max_retries: int = 3,
+                       mime_type: str = "image/jpeg", allow_zoom: bool = False,
+                       priority: int = PRIORITY_NORMAL) -> Optional[Dict]:
         """
         Fragt Groq nach der nächsten Aktion
 
+        Mit Modell-Kaskade geht die Anfrage zuerst an das vom Router gewählte
+        Modell; ist die Antwort des kleinen Modells ungültig oder zu unsicher,
+        wird dasselbe Bild an GROQ_MODEL geschickt. Die Action enthält dann
+        unter "_model" das Modell, das sie geliefert hat (siehe record_outcome).
+
+        Jeder Versuch wartet vorher im Rate Limiter auf einen Slot. Antworten
+        mit 429 zählen nicht als Fehlversuch, sondern pausieren alle Requests
+        bis retry-after (höchstens RATE_LIMIT_MAX_RETRIES mal).
+
         Args:
             base64_image: Base64-encoded Screenshot
             user_task: Benutzeraufgabe
             context: Zusätzlicher Kontext
             max_retries: Maximale Anzahl von Wiederholungsversuchen
+            mime_type: MIME-Type des Bildes
+            allow_zoom: Zoom-Action im System-Prompt anbieten
+            priority: Priorität im Rate Limiter (PRIORITY_HIGH/NORMAL/LOW)
 
         Returns:
             Action Dictionary oder None bei Fehler
         """
-        messages = self.create_vision_message(base64_image, user_task, context)
+        stream = config.STREAMING_ENABLED
+        model = self.router.choose() if self.router is not None else None
+        body = self.build_request_body(base64_image, user_task, context, mime_type, allow_zoom, stream, model)
+        action = self._request_action(body, stream, max_retries, priority, model)
+
+        if self._should_escalate(model, action, allow_zoom):
+            body = self.build_request_body(base64_image, user_task, context, mime_type, allow_zoom,
+                                           stream, self.router.strong_model)
+            # Das kleine Modell hat den Schritt bereits verzögert: Eskalation vorziehen
+            strong_action = self._request_action(body, stream, max_retries, PRIORITY_HIGH,
+                                                 self.router.strong_model)
+            if strong_action is not None:
+                action, model = strong_action, self.router.strong_model
+
+        return self._tag_model(action, model)
+
+    def _should_escalate(self, model: Optional[str], action: Optional[Dict], allow_zoom: bool) -> bool:
+        """Modell-Kaskade: Antwort des kleinen Modells ungültig oder zu unsicher?"""
+        if self.router is None or model == self.router.strong_model:
+            return False
+        valid = action is not None and ((allow_zoom and action["action"] == "zoom")
+                                        or self.validate_action(action))
+        if not self.router.should_escalate(model, action, valid):
+            return False
+        self.escalation_count += 1
+        return True
+
+    @staticmethod
+    def _tag_model(action: Optional[Dict], model: Optional[str]) -> Optional[Dict]:
+        """Vermerkt das liefernde Modell in der Action und ihren Plan-Schritten ("_model")"""
+        if action is not None and model is not None:
+            for routed in [action] + list(action.get("plan") or []):
+                routed["_model"] = model
+        return action
+
+    def _request_action(self, body: bytes, stream: bool, max_retries: int, priority: int,
+                        model: str = None) -> Optional[Dict]:
+        """
+        Sendet einen fertigen Request Body mit Wiederholungen
+
+        Args:
+            body: Request Body (siehe build_request_body)
+            stream: Body verlangt eine gestreamte Antwort
+            max_retries: Maximale Anzahl von Wiederholungsversuchen
+            priority: Priorität im Rate Limiter
+            model: Modell im Body (für die Latenzstatistik des Routers)
+
+        Returns:
+            Action Dictionary oder None bei Fehler
+        """
+        self.last_payload_size = len(body)
+        self.metrics.observe("payload_bytes", len(body))
+        model_label = model or self.model
+
+        attempt = 0
+        rate_limited = 0
+        while attempt < max_retries:
+            if self.rate_limiter is not None:
+                with self.metrics.time("stage_seconds", stage="rate_limit"):
+                    acquired = self.rate_limiter.acquire(priority)
+                if not acquired:
+                    logger.error("Kein Request-Slot innerhalb der maximalen Wartezeit")
+                    return None
+            if attempt or rate_limited:
+                self.metrics.inc("api_retries_total")
 
-        for attempt in range(max_retries):
             try:
                 logger.info(f"Sende Request an Groq API (Versuch {attempt + 1}/{max_retries})...")
 
-                response = self._make_api_request(messages)
+                request_timer = self.metrics.time("api_request_seconds", model=model_label)
+                with request_timer:
+                    request_timer.set(attempt=attempt + rate_limited + 1, bytes=len(body), stream=stream)
+                    if stream:
+                        response = self._make_streaming_request(body, model)
+                    else:
+                        response = self._make_api_request(body, model)
 
                 if response:
                     self.request_count += 1
+                    self.metrics.inc("api_requests_total", result="ok")
+                    request_timer.set(result="ok", action=response.get("action"),
+                                      confidence=response.get("confidence"))
+                    if self.router is not None and model is not None:
+                        self.router.record_latency(model, request_timer.elapsed)
                     return response
 
+                self.metrics.inc("api_requests_total", result="failed")
+                request_timer.set(result="failed")
                 logger.warning(f"Versuch {attempt + 1} fehlgeschlagen")
-                time.sleep(1)  # Kurze Pause vor Wiederholung
+
+            except RateLimitedError as e:
+                self.metrics.inc("api_requests_total", result="rate_limited")
+                request_timer.set(result="rate_limited")
+                if rate_limited >= config.RATE_LIMIT_MAX_RETRIES:
+                    logger.error("Rate Limit: maximale Anzahl an Wiederholungen erreicht")
+                    return None
+                if self.rate_limiter is not None:
+                    # Pause gilt für alle Handler, acquire() wartet sie ab
+                    self.rate_limiter.on_rate_limited(e.headers, rate_limited)
+                else:
+                    time.sleep(RateLimiter.backoff_delay(rate_limited))
+                rate_limited += 1
+                continue
 
             except Exception as e:
+                self.metrics.inc("api_requests_total", result="error")
+                request_timer.set(result="error", error=str(e))
                 logger.error(f"Fehler bei API Request (Versuch {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # Längere Pause bei Fehler
+
+            attempt += 1
+            if attempt < max_retries:
+                with self.metrics.time("stage_seconds", stage="backoff"):
+                    time.sleep(RateLimiter.backoff_delay(attempt))  # Jitter statt fester Pausen
 
         logger.error("Alle Versuche fehlgeschlagen")
         return None
 
-    def _make_api_request(self, messages: List[Dict]) -> Optional[Dict]:
+    def get_next_action_zoomed(self, base64_image: Union[str, bytes], user_task: str, context: str = None,
+                               zoom_provider: Callable[[Dict], Optional[Tuple[bytes, str]]] = None,
+                               mime_type: str = "image/jpeg") -> Optional[Dict]:
         """
-        Macht den eigentlichen API Request
+        Zweistufige Anfrage: erst Übersicht, bei Bedarf vergrößerter Ausschnitt
+
+        Antwortet die KI auf die Übersicht mit "zoom", wird über zoom_provider
+        ein hochauflösender Ausschnitt erstellt und erneut angefragt. Die
+        Koordinaten der Antwort beziehen sich dann auf den Ausschnitt.
 
         Args:
-            messages: Message List
+            base64_image: Base64-encoded Übersicht
+            user_task: Benutzeraufgabe
+            context: Zusätzlicher Kontext
+            zoom_provider: Erstellt zu einer Region (x, y, width, height) den
+                Ausschnitt und gibt (Base64 Bytes, MIME-Type) zurück
+            mime_type: MIME-Type der Übersicht
 
         Returns:
-            Parsed Action Dictionary oder None
+            Action Dictionary oder None bei Fehler
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        action = self.get_next_action(base64_image, user_task, context,
+                                      mime_type=mime_type, allow_zoom=zoom_provider is not None)
+        if not action or action["action"] != "zoom" or zoom_provider is None:
+            return action
 
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": 0.3,  # Niedrige Temperatur für konsistente Ergebnisse
-            "max_tokens": 1024,
-            "top_p": 1,
-            "stream": False
-        }
+        zoomed = zoom_provider(action["parameters"])
+        if zoomed is None:
+            logger.warning("Zoom-Ausschnitt konnte nicht erstellt werden")
+            return action
 
-        try:
-            response = requests.post(
-                self.endpoint,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+        crop_base64, crop_mime_type = zoomed
+        self.zoom_count += 1
+        logger.info(f"Frage Groq mit Zoom-Ausschnitt ({action['parameters']})")
 
-            response.raise_for_status()
-            result = response.json()
+        zoom_context = f"{context}\n{config.ZOOM_CROP_CONTEXT}" if context else config.ZOOM_CROP_CONTEXT
+        # Der Schritt läuft bereits, der Zoom-Request wird vorgezogen
+        return self.get_next_action(crop_base64, user_task, zoom_context, mime_type=crop_mime_type,
+                                    priority=PRIORITY_HIGH)
 
-            # Extrahiere Antwort
-            if "choices" in result and len(result["choices"]) > 0:
-                content = result["choices"][0]["message"]["content"]
-                logger.debug(f"Groq Antwort: {content}")
+    def record_step(self, step: int, action: Dict, outcome: str, frame: Optional[Frame] = None):
+        """
+        Nimmt einen ausgeführten Schritt in den Verlauf auf
 
-                # Parse JSON Response
-                action = self._parse_action_response(content)
-                return action
+        Args:
+            step: Schrittnummer
+            action: Ausgeführte Action
+            outcome: Ergebnis in Kurzform
+            frame: Screenshot, auf dem die Entscheidung beruhte
+        """
+        if self.conversation_history is not None:
+            reasoning = self.get_reasoning(action, timeout=config.STREAM_REASONING_TIMEOUT)
+            if reasoning != action.get("reasoning"):
+                action = {**action, "reasoning": reasoning}
+            self.conversation_history.add_step(step, action, outcome, frame)
 
-            logger.error("Ungültige API Response Struktur")
+    def record_outcome(self, action: Dict, success: bool):
+        """
+        Meldet dem Model Router das Ergebnis einer ausgeführten Action
+
+        Actions ohne "_model" (Cache, Element Locator) hat der Router nicht
+        entschieden; sie ändern weder Schwelle noch Fehlerserie.
+
+        Args:
+            action: Ausgeführte Action (mit "_model" aus get_next_action)
+            success: Action erfolgreich und wie erwartet
+        """
+        if self.router is not None and action.get("_model"):
+            self.router.record_outcome(action["_model"], success)
+
+    def reset_history(self):
+        """Leert den Verlauf (neuer Task)"""
+        if self.conversation_history is not None:
+            self.conversation_history.reset()
+
+    def get_cached_action(self, user_task: str, context: str,
+                          image_hash: Optional[int]) -> Optional[Dict]:
+        """
+        Sucht eine gespeicherte Entscheidung für einen bekannten Bildschirm
+
+        Bei einem Treffer entfällt der API Request. Gespeicherte Actions
+        enthalten bereits Bildschirmkoordinaten.
+
+        Args:
+            user_task: Benutzeraufgabe
+            context: Kontext des Schritts
+            image_hash: pHash des Frames (CapturedFrame.image_hash)
+
+        Returns:
+            Action Dictionary oder None
+        """
+        if self.decision_cache is None or image_hash is None:
             return None
+        action = self.decision_cache.get(user_task, context, image_hash)
+        if action:
+            logger.info(f"Decision Cache Treffer: {action['action']}")
+        return action
+
+    def cache_action(self, user_task: str, context: str, image_hash: Optional[int], action: Dict):
+        """Speichert eine erfolgreich ausgeführte Action (Bildschirmkoordinaten)"""
+        if self.decision_cache is not None and image_hash is not None:
+            self.decision_cache.put(user_task, context, image_hash, action)
+
+    def invalidate_cached_action(self, user_task: str, context: str, image_hash: Optional[int]):
+        """Entfernt eine gespeicherte Action, deren Ausführung fehlgeschlagen ist"""
+        if self.decision_cache is not None and image_hash is not None:
+            self.decision_cache.invalidate(user_task, context, image_hash)
+
+    def _post(self, body: bytes, model: str = None, **kwargs) -> requests.Response:
+        """
+        Sendet den Request, mit Hedging bei langsamer Antwort
+
+        Args:
+            body: Request Body
+            model: Modell im Body (eigene Latenzstatistik pro Modell)
+            **kwargs: Weitere Argumente für den Transport (z.B. stream=True)
+
+        Returns:
+            requests.Response der schnelleren Anfrage
+        """
+        if self.hedger is None:
+            return self.transport.post(body, self.headers, **kwargs)
+        return self.hedger.run(lambda: self.transport.post(body, self.headers, **kwargs), key=model,
+                               accept=lambda response: response.status_code < 400,
+                               before_hedge=self._acquire_hedge_slot,
+                               on_discard=self._discard_response)
+
+    def _acquire_hedge_slot(self) -> bool:
+        """Duplikate nur mit sofort freiem Rate-Limit-Slot (niedrigste Priorität)"""
+        return self.rate_limiter is None or self.rate_limiter.acquire(PRIORITY_LOW, timeout=0)
+
+    def _discard_response(self, response: requests.Response):
+        """Verworfene Antwort: Rate-Limit-Stand übernehmen, Verbindung freigeben"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(response.headers)
+        response.close()
+
+    def _make_api_request(self, body: bytes, model: str = None) -> Optional[Dict]:
+        """
+        Macht den eigentlichen API Request
 
+        Args:
+            body: Fertiger Request Body (siehe build_request_body)
+            model: Modell im Body (für Hedging)
+
+        Returns:
+            Parsed Action Dictionary oder None
+        """
+        try:
+            start = time.perf_counter()
+            response = self._post(body, model)
+            self._check_rate_limit(response.status_code, response.headers)
+
+            response.raise_for_status()
+            result = response.json()
+            self._record_usage(result.get("usage"))
+            self._record_traffic(body, response.status_code, response.headers, result, start)
+            return self._extract_action(result)
+
+        except RateLimitedError:
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"HTTP Request Fehler: {e}")
             if hasattr(e, 'response') and e.response is not None:
@@ -159,6 +537,293 @@ class GroqHandler:
             logger.error(f"Unerwarteter Fehler: {e}")
             return None
 
+    def _make_streaming_request(self, body: bytes, model: str = None) -> Optional[Dict]:
+        """
+        Streaming Request: gibt die Action zurück, sobald sie ausführbar ist
+
+        Sind alle Felder aus STREAM_EARLY_FIELDS vollständig, kehrt die Methode
+        sofort zurück. Der Rest des Streams (reasoning) wird in einem
+        Hintergrund-Thread gelesen, geloggt und in die Action übernommen.
+
+        Args:
+            body: Fertiger Request Body (mit "stream": true)
+            model: Modell im Body (für Hedging)
+
+        Returns:
+            Action Dictionary oder None
+        """
+        start = time.perf_counter()
+        try:
+            response = self._post(body, model, stream=True)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"HTTP Request Fehler: {e}")
+            return None
+
+        accepted = False
+        try:
+            self._check_rate_limit(response.status_code, response.headers)
+            response.raise_for_status()
+            accepted = True
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP Request Fehler: {e}")
+            logger.error(f"Response Body: {response.text}")
+            return None
+        finally:
+            if not accepted:
+                response.close()  # Verbindung zurück in den Pool, auch bei 429 (RateLimitedError)
+
+        # Im Plan-Modus gehören die Folgeschritte zur ausführbaren Antwort
+        early_fields = config.STREAM_EARLY_FIELDS + (["plan"] if config.PLAN_MODE_ENABLED else [])
+        if config.COMPACT_PROTOCOL_ENABLED:
+            early_fields = [SHORT_KEYS.get(name, name) for name in early_fields]
+        parser = IncrementalActionParser()
+        deltas = iter_completion_deltas(response.iter_lines(chunk_size=None))
+        try:
+            for delta in deltas:
+                if parser.feed(delta) and parser.has_fields(early_fields):
+                    action = self._early_action(parser.fields)
+                    if action is None:
+                        break
+                    self._record_time_to_action(start, early=True)
+                    # Der Thread schreibt nicht in die Action: das Reasoning kommt über ein Future
+                    reasoning = Future()
+                    self._stream_number += 1
+                    action["_stream"] = self._stream_number
+                    self.stream_reasoning[self._stream_number] = reasoning
+                    while len(self.stream_reasoning) > 16:
+                        self.stream_reasoning.pop(next(iter(self.stream_reasoning)))
+                    threading.Thread(target=self._finish_stream,
+                                     args=(response, deltas, parser, reasoning, body, start),
+                                     name="GroqStream", daemon=True).start()
+                    return action
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Fehler beim Lesen des Streams: {e}")
+            response.close()
+            return None
+
+        # Kein vorzeitiger Abschluss möglich: gesamte Antwort auswerten
+        for delta in deltas:
+            parser.feed(delta)
+        response.close()
+        self._record_traffic(body, response.status_code, response.headers, parser.text, start)
+        with self.metrics.time("stage_seconds", stage="parse"):
+            action = self._parse_action_response(parser.text)
+        if action:
+            self._record_time_to_action(start, early=False)
+        return action
+
+    def _record_usage(self, usage: Optional[Dict]):
+        """Übernimmt den Token-Verbrauch (usage) in Rate Limiter und Metriken"""
+        usage = usage or {}
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(usage.get("total_tokens"))
+        self.metrics.inc("tokens_total", usage.get("prompt_tokens") or 0, kind="prompt")
+        self.metrics.inc("tokens_total", usage.get("completion_tokens") or 0, kind="completion")
+
+    def _check_rate_limit(self, status: int, headers):
+        """Gleicht den Rate Limiter ab und meldet 429 als RateLimitedError"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(headers)
+        if status == 429:
+            raise RateLimitedError(headers)
+
+    def _early_action(self, fields: Dict) -> Optional[Dict]:
+        """Baut aus den bisher vollständigen Feldern eine ausführbare Action"""
+        action = expand_keys(fields)
+        if not isinstance(action.get("parameters"), dict) or not isinstance(action.get("action"), str):
+            return None
+        action.setdefault("reasoning", "")
+        action.setdefault("is_critical", False)
+        self._normalize_plan(action)
+        logger.info(f"Action vorab aus Stream: {action['action']} (Konfidenz: {action.get('confidence')})")
+        return action
+
+    def _finish_stream(self, response: requests.Response, deltas, parser: IncrementalActionParser,
+                       reasoning: Future, body: bytes, start: float):
+        """Liest den Rest des Streams und liefert das Reasoning über das Future (Hintergrund-Thread)"""
+        try:
+            for delta in deltas:
+                parser.feed(delta)
+            self._record_traffic(body, response.status_code, response.headers, parser.text, start)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.debug(f"Stream nach vorzeitiger Action abgebrochen: {e}")
+        finally:
+            response.close()
+            text = expand_keys(parser.fields).get("reasoning")
+            reasoning.set_result(text if isinstance(text, str) else None)
+        if text:
+            logger.info(f"Reasoning: {text}")
+
+    def get_reasoning(self, action: Dict, timeout: float = 0.0) -> str:
+        """
+        Reasoning einer Action, bei vorzeitig ausgeführten Actions aus dem Stream
+
+        Args:
+            action: Action (auch Kopien tragen die Stream-Nummer "_stream")
+            timeout: Maximale Wartezeit auf das Ende des Streams (Sekunden)
+
+        Returns:
+            Reasoning oder "" wenn (noch) keines vorliegt
+        """
+        reasoning = action.get("reasoning") or ""
+        future = self.stream_reasoning.get(action.get("_stream"))
+        if reasoning or future is None:
+            return reasoning
+        try:
+            return future.result(timeout=timeout) or ""
+        except FutureTimeoutError:
+            return ""
+
+    def _record_traffic(self, body: bytes, status: int, headers, response: Union[Dict, str], start: float):
+        """
+        Zeichnet Request und Antwort auf (TRAFFIC_RECORD_FILE)
+
+        Args:
+            body: Gesendeter Request Body
+            status: HTTP Status
+            headers: Response Header
+            response: Chat Completion Response oder gestreamter Text
+            start: Startzeit des Requests (perf_counter)
+        """
+        if self.recorder is None:
+            return
+        latency = time.perf_counter() - start
+        usage = None
+        if isinstance(response, dict):
+            usage = response.get("usage")
+            choices = response.get("choices") or [{}]
+            response = (choices[0].get("message") or {}).get("content")
+        self.recorder.record(body, status, headers, response, latency, usage)
+
+    def _record_time_to_action(self, start: float, early: bool):
+        self.streamed_count += 1
+        if early:
+            self.early_action_count += 1
+        self.last_time_to_action = time.perf_counter() - start
+        logger.debug(f"Zeit bis zur Action: {self.last_time_to_action * 1000:.0f} ms "
+                     f"({'vorzeitig' if early else 'vollständig'})")
+
+    def _extract_action(self, result: Dict) -> Optional[Dict]:
+        """Holt die Action aus einer Chat Completion Response"""
+        if "choices" in result and len(result["choices"]) > 0:
+            content = result["choices"][0]["message"]["content"]
+            logger.debug(f"Groq Antwort: {content}")
+
+            # Parse JSON Response
+            with self.metrics.time("stage_seconds", stage="parse"):
+                return self._parse_action_response(content)
+
+        logger.error("Ungültige API Response Struktur")
+        return None
+
+    async def get_next_action_async(self, base64_image: Union[str, bytes], user_task: str,
+                                    context: str = None, max_retries: int = 3,
+                                    mime_type: str = "image/jpeg", allow_zoom: bool = False,
+                                    transport: AsyncGroqTransport = None,
+                                    priority: int = PRIORITY_NORMAL) -> Optional[Dict]:
+        """
+        Asynchrone Variante von get_next_action
+
+        Ohne eigenen Transport wird der gemeinsame Pool des laufenden Event
+        Loops verwendet, sodass mehrere Controller Verbindungen teilen. Die
+        Modell-Kaskade gilt wie bei get_next_action.
+
+        Args:
+            base64_image: Base64-encoded Screenshot
+            user_task: Benutzeraufgabe
+            context: Zusätzlicher Kontext
+            max_retries: Maximale Anzahl von Wiederholungsversuchen
+            mime_type: MIME-Type des Bildes
+            allow_zoom: Zoom-Action im System-Prompt anbieten
+            transport: Asynchroner Transport (Standard: gemeinsamer Pool)
+            priority: Priorität im Rate Limiter
+
+        Returns:
+            Action Dictionary oder None bei Fehler
+        """
+        transport = transport or get_shared_async_transport(self.endpoint)
+        model = self.router.choose() if self.router is not None else None
+        body = self.build_request_body(base64_image, user_task, context, mime_type, allow_zoom,
+                                       stream=False, model=model)
+        action = await self._request_action_async(body, transport, max_retries, priority, model)
+
+        if self._should_escalate(model, action, allow_zoom):
+            body = self.build_request_body(base64_image, user_task, context, mime_type, allow_zoom,
+                                           stream=False, model=self.router.strong_model)
+            strong_action = await self._request_action_async(body, transport, max_retries, PRIORITY_HIGH,
+                                                             self.router.strong_model)
+            if strong_action is not None:
+                action, model = strong_action, self.router.strong_model
+
+        return self._tag_model(action, model)
+
+    async def _request_action_async(self, body: bytes, transport: AsyncGroqTransport, max_retries: int,
+                                    priority: int, model: str = None) -> Optional[Dict]:
+        """Asynchrone Variante von _request_action (ohne Streaming)"""
+        self.last_payload_size = len(body)
+        self.metrics.observe("payload_bytes", len(body))
+        model_label = model or self.model
+
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        rate_limited = 0
+        while attempt < max_retries:
+            # acquire() blockiert, daher im Thread Pool statt im Event Loop warten
+            if (self.rate_limiter is not None and
+                    not await loop.run_in_executor(None, self.rate_limiter.acquire, priority)):
+                logger.error("Kein Request-Slot innerhalb der maximalen Wartezeit")
+                return None
+
+            try:
+                logger.info(f"Sende Request an Groq API (async, Versuch {attempt + 1}/{max_retries})...")
+                if attempt or rate_limited:
+                    self.metrics.inc("api_retries_total")
+                start = time.perf_counter()
+                response = await transport.post(body, self.headers)
+                self._check_rate_limit(response.status, response.headers)
+                response.raise_for_status()
+                result = response.json()
+                self._record_usage(result.get("usage"))
+                self._record_traffic(body, response.status, response.headers, result, start)
+                action = self._extract_action(result)
+
+                latency = time.perf_counter() - start
+                self.metrics.observe("api_request_seconds", latency, model=model_label)
+                if action:
+                    self.request_count += 1
+                    self.metrics.inc("api_requests_total", result="ok")
+                    if self.router is not None and model is not None:
+                        self.router.record_latency(model, latency)
+                    return action
+
+                self.metrics.inc("api_requests_total", result="failed")
+                logger.warning(f"Versuch {attempt + 1} fehlgeschlagen")
+
+            except RateLimitedError as e:
+                self.metrics.inc("api_requests_total", result="rate_limited")
+                if rate_limited >= config.RATE_LIMIT_MAX_RETRIES:
+                    logger.error("Rate Limit: maximale Anzahl an Wiederholungen erreicht")
+                    return None
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_rate_limited(e.headers, rate_limited)
+                else:
+                    await asyncio.sleep(RateLimiter.backoff_delay(rate_limited))
+                rate_limited += 1
+                continue
+
+            except (OSError, TransportError, asyncio.TimeoutError, ValueError) as e:
+                self.metrics.inc("api_requests_total", result="error")
+                logger.error(f"Fehler bei API Request (Versuch {attempt + 1}): {e}")
+                if isinstance(e, HttpStatusError):
+                    logger.error(f"Response Body: {e.response.text}")
+
+            attempt += 1
+            if attempt < max_retries:
+                await asyncio.sleep(RateLimiter.backoff_delay(attempt))
+
+        logger.error("Alle Versuche fehlgeschlagen")
+        return None
+
     def _parse_action_response(self, content: str) -> Optional[Dict]:
         """
         Parst die JSON Response von Groq
@@ -170,47 +835,73 @@ class GroqHandler:
             Action Dictionary oder None bei Fehler
         """
         try:
-            # Suche nach JSON in der Response (könnte von Text umgeben sein)
-            # Versuche zuerst direktes JSON Parsing
-            try:
-                action = json.loads(content)
-            except json.JSONDecodeError:
-                # Suche nach JSON Block in Text
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    action = json.loads(json_match.group())
-                else:
-                    logger.error(f"Kein JSON in Response gefunden: {content}")
-                    return None
+            # Erstes JSON-Objekt mit Action-Feld (könnte von Text umgeben sein)
+            action = extract_json_object(content)
+            if action is None:
+                logger.error(f"Kein JSON in Response gefunden: {content}")
+                return None
+            action = expand_keys(action)
 
             # Validiere Action Format
-            required_fields = ["action", "parameters", "reasoning", "confidence"]
-            if not all(field in action for field in required_fields):
-                logger.error(f"Fehlende Felder in Action: {action}")
+            missing = self.schema.missing_fields(action)
+            if missing:
+                logger.error(f"Fehlende Felder in Action ({missing}): {action}")
                 return None
+            action.setdefault("reasoning", "")
 
             # Validiere Action Type
-            if action["action"] not in config.ALLOWED_ACTIONS + ["done"]:
+            if action["action"] not in config.ALLOWED_ACTIONS + ["done", "zoom"]:
                 logger.warning(f"Unbekannte Action: {action['action']}")
 
             # Set default for is_critical
             if "is_critical" not in action:
                 action["is_critical"] = False
 
+            self._normalize_plan(action)
+
             logger.info(f"Action geparst: {action['action']} (Konfidenz: {action['confidence']})")
             logger.debug(f"Reasoning: {action['reasoning']}")
 
             return action
 
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON Parse Fehler: {e}")
-            logger.error(f"Content: {content}")
-            return None
         except Exception as e:
             logger.error(f"Fehler beim Parsen: {e}")
             return None
 
+    def _normalize_plan(self, action: Dict):
+        """
+        Bereinigt die Folgeschritte eines Plans (Plan-Modus)
+
+        Ungültige Schritte beenden den Plan, "done" wird nie vorab geplant und
+        die Länge ist auf PLAN_MAX_ACTIONS begrenzt. Fehlende Felder werden von
+        der ersten Action übernommen.
+
+        Args:
+            action: Geparste Action, wird verändert
+        """
+        plan = action.get("plan")
+        if plan is None:
+            return
+        if not config.PLAN_MODE_ENABLED or not isinstance(plan, list):
+            del action["plan"]
+            return
+
+        steps = []
+        for step in plan[:config.PLAN_MAX_ACTIONS - 1]:
+            if self.schema.check(step) is not None:
+                logger.debug(f"Plan ab ungültigem Schritt abgeschnitten: {step}")
+                break
+            step = dict(step)
+            step.setdefault("reasoning", f"Plan: {action['reasoning']}" if action.get("reasoning") else "Plan")
+            step.setdefault("confidence", action.get("confidence", 0.0))
+            step.setdefault("is_critical", False)
+            steps.append(step)
+
+        action["plan"] = steps
+        if steps:
+            logger.info(f"Plan mit {len(steps) + 1} Actions: "
+                        f"{', '.join([action['action']] + [step['action'] for step in steps])}")
+
     def validate_action(self, action: Dict) -> bool:
         """
         Validiert eine Action
@@ -228,36 +919,15 @@ class GroqHandler:
                 return False
 
             # Prüfe Action Type
-            action_type = action["action"]
-            if action_type == "done":
+            if action["action"] == "done":
                 return True
 
-            if action_type not in config.ALLOWED_ACTIONS:
-                logger.error(f"Action nicht erlaubt: {action_type}")
+            # Prüfe Action Type und Parameter (gemeinsame Regeln mit dem Parser)
+            error = self.schema.check(action)
+            if error:
+                logger.error(error)
                 return False
 
-            # Prüfe Parameter
-            params = action["parameters"]
-            if not isinstance(params, dict):
-                logger.error("Parameters müssen ein Dictionary sein")
-                return False
-
-            # Spezifische Validierung je nach Action Type
-            if action_type in ["click", "double_click", "right_click", "move_mouse"]:
-                if "x" not in params or "y" not in params:
-                    logger.error(f"{action_type} benötigt x und y Parameter")
-                    return False
-
-            elif action_type == "type_text":
-                if "text" not in params:
-                    logger.error("type_text benötigt text Parameter")
-                    return False
-
-            elif action_type == "hotkey":
-                if "keys" not in params:
-                    logger.error("hotkey benötigt keys Parameter")
-                    return False
-
             return True
 
         except Exception as e:
@@ -266,11 +936,32 @@ class GroqHandler:
 
     def get_stats(self) -> Dict:
         """Gibt Statistiken zurück"""
-        return {
+        stats = {
             "request_count": self.request_count,
+            "zoom_count": self.zoom_count,
+            "last_payload_size": self.last_payload_size,
             "model": self.model,
             "api_configured": bool(self.api_key)
         }
+        if self.decision_cache is not None:
+            stats["decision_cache"] = self.decision_cache.get_stats()
+        if self.router is not None:
+            stats["escalation_count"] = self.escalation_count
+            stats["router"] = self.router.get_stats()
+        stats["transport"] = self.transport.get_stats()
+        if self.hedger is not None:
+            stats["hedging"] = self.hedger.get_stats()
+        if self.recorder is not None:
+            stats["traffic_recorder"] = self.recorder.get_stats()
+        if self.rate_limiter is not None:
+            stats["rate_limiter"] = self.rate_limiter.get_stats()
+        if self.conversation_history is not None:
+            stats["conversation_history"] = self.conversation_history.get_stats()
+        if self.streamed_count:
+            stats["streamed_count"] = self.streamed_count
+            stats["early_action_count"] = self.early_action_count
+            stats["last_time_to_action"] = self.last_time_to_action
+        return stats
 
 
 def main():
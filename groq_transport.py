@@ -0,0 +1,384 @@
+"""
+Groq Transport
+HTTP-Transport mit Connection Pool, Keep-Alive und vorgewärmten Verbindungen
+"""
+
+import asyncio
+import json
+import logging
+import ssl
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TransportError(Exception):
+    """Fehler im asynchronen Transport (Verbindung, Protokoll, HTTP-Status)"""
+
+
+class HttpStatusError(TransportError):
+    """HTTP-Antwort mit Fehlerstatus"""
+
+    def __init__(self, response: "HttpResponse"):
+        super().__init__(f"HTTP {response.status}")
+        self.response = response
+
+
+@dataclass
+class HttpResponse:
+    """Antwort des asynchronen Transports"""
+    status: int
+    headers: Dict[str, str]  # Namen in Kleinbuchstaben
+    body: bytes
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self) -> Dict:
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HttpStatusError(self)
+
+
+class GroqTransport:
+    """
+    Synchroner Transport auf Basis einer requests.Session
+
+    Die Session hält TCP- und TLS-Verbindungen im Pool offen, sodass nur der
+    erste Request DNS, Verbindungsaufbau und Handshake bezahlt. prewarm()
+    öffnet diese Verbindung im Hintergrund, während der erste Screenshot
+    entsteht.
+    """
+
+    def __init__(self, endpoint: str = None, pool_size: int = None):
+        self.endpoint = endpoint or config.GROQ_API_ENDPOINT
+        self.timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_TIMEOUT)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or config.HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.request_count = 0
+        self.prewarm_time = None
+        self._prewarm_thread = None
+
+    def prewarm(self) -> threading.Thread:
+        """
+        Baut die Verbindung zum API-Host im Hintergrund auf
+
+        Returns:
+            Gestarteter Thread (muss nicht abgewartet werden)
+        """
+        if self._prewarm_thread is None:
+            self._prewarm_thread = threading.Thread(target=self._prewarm, name="GroqPrewarm", daemon=True)
+            self._prewarm_thread.start()
+        return self._prewarm_thread
+
+    def _prewarm(self):
+        start = time.perf_counter()
+        try:
+            # Der Status ist egal, es geht nur um die offene Verbindung im Pool
+            self.session.head(self.endpoint, timeout=self.timeout)
+            self.prewarm_time = time.perf_counter() - start
+            logger.debug(f"Verbindung zu {urlsplit(self.endpoint).netloc} vorgewärmt "
+                         f"({self.prewarm_time * 1000:.0f} ms)")
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Vorwärmen der Verbindung fehlgeschlagen: {e}")
+
+    def post(self, body: bytes, headers: Dict[str, str], **kwargs) -> requests.Response:
+        """
+        Sendet einen POST Request über den Pool
+
+        Args:
+            body: Request Body
+            headers: Request Header
+            **kwargs: Weitere Argumente für requests (z.B. stream=True)
+
+        Returns:
+            requests.Response
+        """
+        self.request_count += 1
+        return self.session.post(self.endpoint, headers=headers, data=body,
+                                 timeout=kwargs.pop("timeout", self.timeout), **kwargs)
+
+    def close(self):
+        """Schließt alle Verbindungen"""
+        self.session.close()
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "request_count": self.request_count,
+            "prewarm_time": self.prewarm_time,
+        }
+
+
+class AsyncGroqTransport:
+    """
+    Asyncio-nativer HTTP/1.1 Client mit Keep-Alive Pool (nur Standardbibliothek)
+
+    Mehrere Controller im selben Event Loop können sich eine Instanz teilen
+    (siehe get_shared_async_transport), die Anzahl gleichzeitiger Verbindungen
+    ist durch pool_size begrenzt. Leerlaufende Verbindungen werden nach
+    HTTP_KEEPALIVE_IDLE Sekunden verworfen.
+    """
+
+    def __init__(self, endpoint: str = None, pool_size: int = None,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.endpoint = endpoint or config.GROQ_API_ENDPOINT
+        url = urlsplit(self.endpoint)
+        self.use_ssl = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port or (443 if self.use_ssl else 80)
+        self.path = url.path or "/"
+        if url.query:
+            self.path += "?" + url.query
+        self.pool_size = pool_size or config.HTTP_POOL_SIZE
+        self.ssl_context = ssl_context or (ssl.create_default_context() if self.use_ssl else None)
+
+        # (reader, writer, zuletzt benutzt)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, float]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.request_count = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Erst im laufenden Loop erzeugen (ältere Python-Versionen binden ihn beim Erstellen)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+        return self._semaphore
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl_context,
+                                    server_hostname=self.host if self.use_ssl else None),
+            timeout=config.HTTP_CONNECT_TIMEOUT
+        )
+        self.connections_opened += 1
+        return reader, writer
+
+    def _take_idle(self) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        now = time.monotonic()
+        while self._idle:
+            reader, writer, last_used = self._idle.pop()
+            if (now - last_used <= config.HTTP_KEEPALIVE_IDLE and not reader.at_eof()
+                    and not writer.is_closing()):
+                self.connections_reused += 1
+                return reader, writer
+            writer.close()
+        return None
+
+    def _release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reusable: bool):
+        if reusable and len(self._idle) < self.pool_size:
+            self._idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    async def prewarm(self, connections: int = 1):
+        """
+        Öffnet Verbindungen vorab (DNS, TCP und TLS-Handshake)
+
+        Args:
+            connections: Anzahl der Verbindungen
+        """
+        connections = min(connections, self.pool_size - len(self._idle))
+        results = await asyncio.gather(*(self._open() for _ in range(connections)),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.debug(f"Vorwärmen der Verbindung fehlgeschlagen: {result}")
+            else:
+                self._release(*result, reusable=True)
+
+    async def post(self, body: bytes, headers: Dict[str, str], timeout: float = None) -> HttpResponse:
+        """
+        Sendet einen POST Request über eine Pool-Verbindung
+
+        Args:
+            body: Request Body
+            headers: Request Header
+            timeout: Timeout für den gesamten Request in Sekunden
+
+        Returns:
+            HttpResponse
+        """
+        request = self._build_request(body, headers)
+        timeout = config.HTTP_TIMEOUT if timeout is None else timeout
+
+        async with self._get_semaphore():
+            self.request_count += 1
+            connection = self._take_idle()
+            if connection is not None:
+                try:
+                    return await asyncio.wait_for(self._exchange(*connection, request), timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # Server hat die Keep-Alive Verbindung inzwischen geschlossen
+                    logger.debug("Wiederverwendete Verbindung geschlossen, öffne neue")
+
+            connection = await self._open()
+            return await asyncio.wait_for(self._exchange(*connection, request), timeout)
+
+    def _build_request(self, body: bytes, headers: Dict[str, str]) -> bytes:
+        lines = [
+            f"POST {self.path} HTTP/1.1",
+            f"Host: {self.host}",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive",
+            "Accept-Encoding: identity",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _exchange(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        request: bytes) -> HttpResponse:
+        reusable = False
+        try:
+            writer.write(request)
+            await writer.drain()
+            response, reusable = await self._read_response(reader)
+            return response
+        finally:
+            self._release(reader, writer, reusable)
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> Tuple[HttpResponse, bool]:
+        """Liest Statuszeile, Header und Body (Content-Length, chunked oder bis EOF)"""
+        status_line = await reader.readuntil(b"\r\n")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise TransportError(f"Ungültige Statuszeile: {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    # Optionale Trailer bis zur Leerzeile überspringen
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        return HttpResponse(status, headers, body), keep_alive
+
+    async def close(self):
+        """Schließt alle Leerlauf-Verbindungen"""
+        idle, self._idle = self._idle, []
+        for _, writer, _ in idle:
+            writer.close()
+        for _, writer, _ in idle:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "request_count": self.request_count,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "idle_connections": len(self._idle),
+        }
+
+
+# Event Loop -> {Endpoint -> Transport}
+_shared_async_transports: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_transport(endpoint: str = None) -> AsyncGroqTransport:
+    """
+    Gemeinsamer asynchroner Transport für den laufenden Event Loop
+
+    Args:
+        endpoint: API Endpoint (Standard: GROQ_API_ENDPOINT)
+
+    Returns:
+        AsyncGroqTransport, pro Loop und Endpoint genau eine Instanz
+    """
+    endpoint = endpoint or config.GROQ_API_ENDPOINT
+    loop = asyncio.get_running_loop()
+    transports = _shared_async_transports.setdefault(loop, {})
+    transport = transports.get(endpoint)
+    if transport is None:
+        transport = transports[endpoint] = AsyncGroqTransport(endpoint)
+    return transport
+
+
+def main():
+    """Test-Funktion für den Transport"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Groq Transport Test")
+    print("=" * 50)
+
+    transport = GroqTransport()
+    transport.prewarm().join()
+    print(f"Vorwärmen (sync): {transport.prewarm_time}")
+
+    for attempt in range(3):
+        start = time.perf_counter()
+        try:
+            response = transport.post(b"{}", {"Content-Type": "application/json"})
+            print(f"Request {attempt + 1}: HTTP {response.status_code} "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Request fehlgeschlagen: {e}")
+            break
+    transport.close()
+
+    async def run_async():
+        async_transport = get_shared_async_transport()
+        await async_transport.prewarm()
+        for attempt in range(3):
+            start = time.perf_counter()
+            try:
+                response = await async_transport.post(b"{}", {"Content-Type": "application/json"})
+                print(f"Async Request {attempt + 1}: HTTP {response.status} "
+                      f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except (OSError, TransportError, asyncio.TimeoutError) as e:
+                print(f"✗ Async Request fehlgeschlagen: {e}")
+                break
+        print(f"\nStatistiken: {async_transport.get_stats()}")
+        await async_transport.close()
+
+    asyncio.run(run_async())
+
+
+if __name__ == "__main__":
+    main()
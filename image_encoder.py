@@ -0,0 +1,250 @@
+"""
+Image Encoder
+Adaptiver Bild-Encoder mit Byte-Budget (WebP/JPEG/Palette-PNG und Qualitätssuche)
+"""
+
+import io
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, features
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Bildschirmtypen für die Format-Auswahl
+SCREEN_FLAT = "flat"  # Wenige Farben (Dialoge, Terminals, einfache UIs)
+SCREEN_UI = "ui"  # Typische Anwendungsfenster mit Text und Icons
+SCREEN_PHOTO = "photo"  # Fotos, Videos, Verläufe
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+# Reihenfolge der Formate je Bildschirmtyp (bestes zuerst)
+FORMAT_PREFERENCES = {
+    SCREEN_FLAT: ["PNG", "WEBP", "JPEG"],
+    SCREEN_UI: ["WEBP", "JPEG"],
+    SCREEN_PHOTO: ["JPEG", "WEBP"],
+}
+
+
+def base64_size(byte_count: int) -> int:
+    """Größe der Base64-Darstellung für byte_count Bytes"""
+    return (byte_count + 2) // 3 * 4
+
+
+@dataclass
+class EncodedImage:
+    """Ergebnis eines Encoding-Vorgangs"""
+    data: bytes
+    format: str
+    quality: Optional[int]
+    screen_type: str
+    encode_time: float
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    @property
+    def payload_size(self) -> int:
+        """Größe im Request (Base64)"""
+        return base64_size(len(self.data))
+
+
+class AdaptiveEncoder:
+    """
+    Wählt Format und Qualität so, dass das Bild in ein Byte-Budget passt
+
+    Pro Bildschirmtyp wird die zuletzt passende Einstellung gemerkt, sodass
+    Folgebilder meist mit einem einzigen Encoding auskommen. Die Suche ist
+    durch eine maximale Anzahl von Versuchen und ein CPU-Zeitbudget begrenzt.
+    """
+
+    def __init__(self, byte_budget: int = None, time_budget: float = None):
+        self.byte_budget = byte_budget or config.ENCODER_BYTE_BUDGET
+        self.time_budget = time_budget or config.ENCODER_TIME_BUDGET
+        self.webp_available = features.check("webp")
+
+        # Gemerkte Einstellung pro Bildschirmtyp: (format, quality)
+        self.best_settings: Dict[str, Tuple[str, Optional[int]]] = {}
+
+        self.encode_count = 0
+        self.search_count = 0
+        self.over_budget_count = 0
+
+    def classify(self, image: Image.Image) -> str:
+        """
+        Bestimmt den Bildschirmtyp anhand der Farbanzahl eines Thumbnails
+
+        Args:
+            image: PIL Image
+
+        Returns:
+            SCREEN_FLAT, SCREEN_UI oder SCREEN_PHOTO
+        """
+        sample = image.resize(config.ENCODER_CLASSIFY_SIZE, Image.Resampling.NEAREST)
+        pixel_count = sample.width * sample.height
+        colors = sample.getcolors(maxcolors=pixel_count)
+        color_count = len(colors) if colors else pixel_count
+
+        if color_count <= config.ENCODER_FLAT_MAX_COLORS:
+            return SCREEN_FLAT
+        if color_count / pixel_count < config.ENCODER_PHOTO_COLOR_RATIO:
+            return SCREEN_UI
+        return SCREEN_PHOTO
+
+    def _formats_for(self, screen_type: str) -> List[str]:
+        formats = FORMAT_PREFERENCES[screen_type]
+        if not self.webp_available:
+            formats = [f for f in formats if f != "WEBP"]
+        return formats
+
+    def _encode(self, image: Image.Image, fmt: str, quality: Optional[int]) -> bytes:
+        """Encodiert das Bild in einem Format"""
+        buffer = io.BytesIO()
+        if fmt == "PNG":
+            palette = image.quantize(
+                colors=config.ENCODER_PNG_COLORS,
+                method=Image.Quantize.FASTOCTREE
+            )
+            palette.save(buffer, format="PNG", compress_level=config.ENCODER_PNG_COMPRESS_LEVEL)
+        elif fmt == "WEBP":
+            image.save(buffer, format="WEBP", quality=quality, method=config.ENCODER_WEBP_METHOD)
+        else:
+            image.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+
+    def encode(self, image: Image.Image) -> EncodedImage:
+        """
+        Encodiert ein Bild innerhalb des Byte-Budgets
+
+        Args:
+            image: PIL Image (bereits verkleinert)
+
+        Returns:
+            EncodedImage
+        """
+        start = time.thread_time()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        screen_type = self.classify(image)
+        self.encode_count += 1
+
+        # Gemerkte Einstellung zuerst probieren
+        remembered = self.best_settings.get(screen_type)
+        if remembered is not None:
+            fmt, quality = remembered
+            data = self._encode(image, fmt, quality)
+            size = base64_size(len(data))
+            # Deutlich unter Budget mit niedriger Qualität -> nach oben neu suchen
+            has_headroom = (quality is not None and
+                            quality < config.ENCODER_MAX_QUALITY - config.ENCODER_QUALITY_STEP and
+                            size < self.byte_budget * config.ENCODER_RESEARCH_RATIO)
+            if size <= self.byte_budget and not has_headroom:
+                return EncodedImage(data, fmt, quality, screen_type, time.thread_time() - start)
+            logger.debug(f"Gemerkte Einstellung {fmt}/{quality} passt nicht mehr ({size} Bytes), suche neu")
+
+        return self._search(image, screen_type, start)
+
+    def _search(self, image: Image.Image, screen_type: str, start: float) -> EncodedImage:
+        """Begrenzte Suche nach Format und höchster passender Qualität"""
+        self.search_count += 1
+        attempts = 0
+        best = None  # Beste Variante innerhalb des Budgets
+        smallest = None  # Kleinste Variante als Notlösung
+
+        def out_of_time() -> bool:
+            return (attempts >= config.ENCODER_MAX_ATTEMPTS or
+                    time.thread_time() - start >= self.time_budget)
+
+        for fmt in self._formats_for(screen_type):
+            # PNG hat keine Qualitätsstufe, ein Versuch genügt
+            if fmt == "PNG":
+                low, high = 0, 0
+            else:
+                low, high = config.ENCODER_MIN_QUALITY, config.ENCODER_MAX_QUALITY
+
+            # Binäre Suche nach der höchsten Qualität innerhalb des Budgets
+            while low <= high and not out_of_time():
+                quality = (low + high) // 2 if fmt != "PNG" else None
+                data = self._encode(image, fmt, quality)
+                attempts += 1
+                if smallest is None or len(data) < len(smallest[0]):
+                    smallest = (data, fmt, quality)
+                if base64_size(len(data)) <= self.byte_budget:
+                    best = (data, fmt, quality)
+                    if quality is None:
+                        break
+                    low = quality + config.ENCODER_QUALITY_STEP
+                elif quality is None:
+                    break
+                else:
+                    high = quality - config.ENCODER_QUALITY_STEP
+
+            if best is not None or out_of_time():
+                break
+
+        if best is None:
+            self.over_budget_count += 1
+            best = smallest
+            logger.warning(
+                f"Byte-Budget ({self.byte_budget}) nicht erreichbar, "
+                f"verwende {best[1]}/{best[2]} mit {base64_size(len(best[0]))} Bytes"
+            )
+        else:
+            self.best_settings[screen_type] = (best[1], best[2])
+
+        data, fmt, quality = best
+        elapsed = time.thread_time() - start
+        logger.debug(
+            f"Encoder-Suche ({screen_type}): {fmt}/{quality}, "
+            f"{base64_size(len(data))} Bytes, {attempts} Versuche, {elapsed * 1000:.0f} ms"
+        )
+        return EncodedImage(data, fmt, quality, screen_type, elapsed)
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "encode_count": self.encode_count,
+            "search_count": self.search_count,
+            "over_budget_count": self.over_budget_count,
+            "best_settings": dict(self.best_settings),
+        }
+
+
+def main():
+    """Test-Funktion für den adaptiven Encoder"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    from PIL import ImageDraw
+
+    print("Adaptive Encoder Test")
+    print("=" * 50)
+
+    # Einfache UI mit Text
+    image = Image.new("RGB", (1920, 1080), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, 1920, 40], fill=(40, 40, 60))
+    for row in range(40):
+        draw.text((20, 60 + row * 24), f"Zeile {row}: Lorem ipsum dolor sit amet", fill=(0, 0, 0))
+
+    encoder = AdaptiveEncoder()
+    for i in range(3):
+        result = encoder.encode(image)
+        print(f"Bild {i + 1}: {result.format}/{result.quality} ({result.screen_type}), "
+              f"{result.payload_size} Bytes, {result.encode_time * 1000:.0f} ms CPU")
+
+    print(f"\nStatistiken: {encoder.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,642 @@
+"""
+Input Backends
+Austauschbare Backends für Maus- und Tastatureingaben (XTest, uinput, PyAutoGUI)
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+from capture_backends import create_capture_backend
+
+try:
+    from Xlib import X, XK, display as xdisplay
+    from Xlib.ext import xtest
+except ImportError:  # Optional: pip install python-xlib (unter Linux mit PyAutoGUI installiert)
+    xdisplay = None
+
+try:
+    from evdev import AbsInfo, UInput, ecodes
+except ImportError:  # Optional: pip install evdev (nur Linux)
+    UInput = None
+
+logger = logging.getLogger(__name__)
+
+
+class FailSafeError(Exception):
+    """Maus wurde in eine Bildschirmecke bewegt (Notfall-Stop)"""
+    pass
+
+
+# Fehler, die den Task sofort abbrechen statt nur die Action fehlschlagen zu lassen
+# (der Fail-Safe von PyAutoGUI wird im PyAutoGUIBackend in FailSafeError übersetzt)
+FAILSAFE_ERRORS = (FailSafeError,)
+
+_BUTTONS = ("left", "middle", "right")
+
+# Steuerzeichen -> X11 Keysym
+_SPECIAL_KEYSYMS = {"\n": 0xff0d, "\r": 0xff0d, "\t": 0xff09}  # Return, Tab
+
+
+def keysym_for(char: str) -> int:
+    """X11 Keysym eines Zeichens (Latin-1 direkt, sonst Unicode-Keysym)"""
+    if char in _SPECIAL_KEYSYMS:
+        return _SPECIAL_KEYSYMS[char]
+    codepoint = ord(char)
+    if 0x20 <= codepoint <= 0x7e or 0xa0 <= codepoint <= 0xff:
+        return codepoint
+    return 0x01000000 | codepoint
+
+
+class InputBackend:
+    """
+    Basisklasse für Input-Backends
+
+    Alle Methoden senden sofort, ohne eigene Pausen. Wartezeiten (Dauer der
+    Mausbewegung, Pause nach der Action) legt der ActionExecutor über
+    INPUT_TIMING_POLICIES fest. Scroll-Richtung wie PyAutoGUI: positiv = hoch.
+    """
+
+    name = "base"
+    # Tastenereignisse eines Texts werden gebündelt gesendet (kein Intervall pro Zeichen nötig)
+    batched_typing = False
+
+    def move(self, x: int, y: int, duration: float = 0.0):
+        """Bewegt die Maus (duration > 0: sichtbare Bewegung in Schritten)"""
+        raise NotImplementedError
+
+    def click(self, x: int, y: int, button: str = "left", clicks: int = 1,
+              interval: float = 0.0, duration: float = 0.0):
+        """Bewegt die Maus und klickt"""
+        raise NotImplementedError
+
+    def scroll(self, clicks: int):
+        """Scrollt um clicks Rasterschritte (positiv = hoch)"""
+        raise NotImplementedError
+
+    def press(self, key: str):
+        """Drückt eine Taste (PyAutoGUI Tastennamen)"""
+        self.hotkey(key)
+
+    def hotkey(self, *keys: str):
+        """Drückt eine Tastenkombination (loslassen in umgekehrter Reihenfolge)"""
+        raise NotImplementedError
+
+    def can_type(self, text: str) -> bool:
+        """Kann das Backend jedes Zeichen des Texts als Tastenereignis senden?"""
+        return False
+
+    def type_chars(self, text: str, interval: float = 0.0):
+        """
+        Tippt den Text Zeichen für Zeichen ("\\n" = Enter, "\\t" = Tab)
+
+        Args:
+            text: Einzugebender Text (siehe can_type)
+            interval: Pause nach jedem Zeichen in Sekunden
+        """
+        for char in text:
+            self.press(char)
+            if interval > 0:
+                time.sleep(interval)
+
+    def position(self) -> Tuple[int, int]:
+        """Aktuelle Mausposition"""
+        raise NotImplementedError
+
+    def size(self) -> Tuple[int, int]:
+        """Bildschirmgröße"""
+        raise NotImplementedError
+
+    def check_failsafe(self):
+        """
+        Notfall-Stop wie bei PyAutoGUI: Maus in einer Bildschirmecke
+
+        Raises:
+            FailSafeError wenn die Maus in einer Ecke steht
+        """
+        if not config.INPUT_FAILSAFE:
+            return
+        x, y = self.position()
+        width, height = self.size()
+        margin = config.INPUT_FAILSAFE_MARGIN
+        if (x <= margin or x >= width - 1 - margin) and (y <= margin or y >= height - 1 - margin):
+            raise FailSafeError(f"Notfall-Stop: Maus in Bildschirmecke ({x}, {y})")
+
+    def close(self):
+        """Gibt Ressourcen des Backends frei"""
+        pass
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    Fallback über PyAutoGUI (alle Plattformen)
+
+    PyAutoGUI wird erst hier importiert: XTest und uinput brauchen es nicht.
+    """
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        # Pausen kommen aus der Timing-Policy statt aus dem globalen PyAutoGUI PAUSE
+        pyautogui.PAUSE = 0
+        pyautogui.FAILSAFE = config.INPUT_FAILSAFE
+        self.pyautogui = pyautogui
+
+    def _call(self, function: str, *args, **kwargs):
+        """Ruft eine PyAutoGUI-Funktion auf (deren Notfall-Stop als FailSafeError)"""
+        try:
+            return getattr(self.pyautogui, function)(*args, **kwargs)
+        except self.pyautogui.FailSafeException as e:
+            raise FailSafeError("Notfall-Stop: PyAutoGUI Fail-Safe (Maus in Bildschirmecke)") from e
+
+    def move(self, x: int, y: int, duration: float = 0.0):
+        self._call("moveTo", x, y, duration=duration)
+
+    def click(self, x: int, y: int, button: str = "left", clicks: int = 1,
+              interval: float = 0.0, duration: float = 0.0):
+        self._call("click", x, y, clicks=clicks, interval=interval, button=button, duration=duration)
+
+    def scroll(self, clicks: int):
+        self._call("scroll", clicks)
+
+    def press(self, key: str):
+        self._call("press", key)
+
+    def hotkey(self, *keys: str):
+        self._call("hotkey", *keys)
+
+    def can_type(self, text: str) -> bool:
+        return text.isascii()
+
+    def type_chars(self, text: str, interval: float = 0.0):
+        self._call("write", text, interval=interval)
+
+    def position(self) -> Tuple[int, int]:
+        return tuple(self.pyautogui.position())
+
+    def size(self) -> Tuple[int, int]:
+        return tuple(self.pyautogui.size())
+
+
+# PyAutoGUI Tastennamen -> X11 Keysym-Namen
+_X_KEY_NAMES = {
+    "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape",
+    "tab": "Tab", "space": "space", "backspace": "BackSpace", "delete": "Delete", "del": "Delete",
+    "insert": "Insert", "home": "Home", "end": "End", "pageup": "Prior", "pgup": "Prior",
+    "pagedown": "Next", "pgdn": "Next", "up": "Up", "down": "Down", "left": "Left", "right": "Right",
+    "ctrl": "Control_L", "ctrlleft": "Control_L", "ctrlright": "Control_R",
+    "shift": "Shift_L", "shiftleft": "Shift_L", "shiftright": "Shift_R",
+    "alt": "Alt_L", "altleft": "Alt_L", "altright": "ISO_Level3_Shift", "altgr": "ISO_Level3_Shift",
+    "win": "Super_L", "winleft": "Super_L", "winright": "Super_R", "super": "Super_L", "command": "Super_L",
+    "capslock": "Caps_Lock", "numlock": "Num_Lock", "printscreen": "Print", "prtsc": "Print",
+    "apps": "Menu", "menu": "Menu",
+}
+
+
+class XTestBackend(InputBackend):
+    """
+    Direkte Eingaben über die XTest-Erweiterung (Linux/X11)
+
+    Jede Action ist eine Handvoll fake_input Requests mit einem einzigen
+    sync, ohne die Pausen und Positionsabfragen von PyAutoGUI. Text wird
+    gebündelt getippt; Zeichen ohne Taste im aktuellen Layout (Umlaute auf
+    US-Layout, Emoji, CJK) werden vorübergehend auf freie Keycodes gelegt
+    und danach wieder entfernt.
+    """
+
+    name = "xtest"
+    batched_typing = True
+
+    def __init__(self):
+        if xdisplay is None:
+            raise RuntimeError("python-xlib nicht installiert")
+        self.display = xdisplay.Display()
+        if not self.display.query_extension("XTEST").present:
+            self.display.close()
+            raise RuntimeError("X Server ohne XTest-Erweiterung")
+        self.root = self.display.screen().root
+        self.shift = self.display.keysym_to_keycode(XK.XK_Shift_L)
+        first = self.display.display.info.min_keycode
+        count = self.display.display.info.max_keycode - first + 1
+        mapping = self.display.get_keyboard_mapping(first, count)
+        # Keycodes ohne Belegung dienen als Platz für fehlende Zeichen
+        self.spare_keycodes = [first + index for index, keysyms in enumerate(mapping)
+                               if not any(keysyms)]
+        self._keys: Dict[str, Tuple[int, bool]] = {}
+        self._chars: Dict[str, Optional[Tuple[int, bool]]] = {}
+
+    def _key(self, name: str) -> Tuple[int, bool]:
+        """(Keycode, Shift nötig) für einen PyAutoGUI Tastennamen"""
+        if name not in self._keys:
+            if len(name) == 1:
+                keysym = keysym_for(name)
+            elif name.lower() in _X_KEY_NAMES:
+                keysym = XK.string_to_keysym(_X_KEY_NAMES[name.lower()])
+            elif name[0] in "fF" and name[1:].isdigit():
+                keysym = XK.string_to_keysym(name.upper())  # Funktionstasten: F1 ... F24
+            else:
+                keysym = XK.string_to_keysym(name)
+            keycode = self.display.keysym_to_keycode(keysym) if keysym else 0
+            if not keycode:
+                raise ValueError(f"Unbekannte Taste: {name}")
+            shift = (len(name) == 1 and self.display.keycode_to_keysym(keycode, 0) != keysym
+                     and self.display.keycode_to_keysym(keycode, 1) == keysym)
+            self._keys[name] = (keycode, shift)
+        return self._keys[name]
+
+    def _char(self, char: str) -> Optional[Tuple[int, bool]]:
+        """(Keycode, Shift nötig) eines Zeichens im aktuellen Layout oder None"""
+        if char not in self._chars:
+            keysym = keysym_for(char)
+            keycode = self.display.keysym_to_keycode(keysym)
+            key = None
+            if keycode:
+                if self.display.keycode_to_keysym(keycode, 0) == keysym:
+                    key = (keycode, False)
+                elif self.display.keycode_to_keysym(keycode, 1) == keysym:
+                    key = (keycode, True)
+            self._chars[char] = key  # Andere Ebenen (AltGr) werden umgelegt
+        return self._chars[char]
+
+    def can_type(self, text: str) -> bool:
+        return bool(self.spare_keycodes) or all(self._char(char) is not None for char in set(text))
+
+    def type_chars(self, text: str, interval: float = 0.0):
+        if not self.can_type(text):
+            raise ValueError("XTest: keine freien Keycodes für Zeichen außerhalb des Layouts")
+        chars: List[str] = []
+        remapped: Dict[str, int] = {}
+        for char in text:
+            if self._char(char) is None and char not in remapped:
+                if len(remapped) == len(self.spare_keycodes):
+                    self._send_chars(chars, remapped, interval)
+                    chars, remapped = [], {}
+                remapped[char] = self.spare_keycodes[len(remapped)]
+            chars.append(char)
+        if chars:
+            self._send_chars(chars, remapped, interval)
+
+    def _send_chars(self, chars: List[str], remapped: Dict[str, int], interval: float):
+        """Sendet Zeichen mit einem sync (mit vorübergehend belegten Keycodes)"""
+        for char, keycode in remapped.items():
+            keysym = keysym_for(char)
+            self.display.change_keyboard_mapping(keycode, [(keysym, keysym)])
+        if remapped:
+            # Clients müssen das neue Mapping (MappingNotify) vor den Tasten sehen
+            self.display.sync()
+            time.sleep(config.TYPING_REMAP_DELAY)
+
+        for char in chars:
+            keycode, shift = (remapped[char], False) if char in remapped else self._char(char)
+            if shift:
+                xtest.fake_input(self.display, X.KeyPress, self.shift)
+            xtest.fake_input(self.display, X.KeyPress, keycode)
+            xtest.fake_input(self.display, X.KeyRelease, keycode)
+            if shift:
+                xtest.fake_input(self.display, X.KeyRelease, self.shift)
+            if interval > 0:
+                self.display.sync()
+                time.sleep(interval)
+        self.display.sync()
+
+        if remapped:
+            time.sleep(config.TYPING_REMAP_DELAY)
+            for keycode in remapped.values():
+                self.display.change_keyboard_mapping(keycode, [(0, 0)])
+            self.display.sync()
+
+    def move(self, x: int, y: int, duration: float = 0.0):
+        if duration > 0:
+            start_x, start_y = self.position()
+            steps = max(int(duration * 60), 1)
+            for step in range(1, steps):
+                xtest.fake_input(self.display, X.MotionNotify,
+                                 x=round(start_x + (x - start_x) * step / steps),
+                                 y=round(start_y + (y - start_y) * step / steps))
+                self.display.sync()
+                time.sleep(duration / steps)
+        xtest.fake_input(self.display, X.MotionNotify, x=int(x), y=int(y))
+        self.display.sync()
+
+    def click(self, x: int, y: int, button: str = "left", clicks: int = 1,
+              interval: float = 0.0, duration: float = 0.0):
+        self.move(x, y, duration)
+        number = _BUTTONS.index(button) + 1
+        for index in range(clicks):
+            xtest.fake_input(self.display, X.ButtonPress, number)
+            xtest.fake_input(self.display, X.ButtonRelease, number)
+            if interval > 0 and index < clicks - 1:
+                self.display.sync()
+                time.sleep(interval)
+        self.display.sync()
+
+    def scroll(self, clicks: int):
+        number = 4 if clicks > 0 else 5  # X11: Taste 4 = hoch, 5 = runter
+        for _ in range(abs(int(clicks))):
+            xtest.fake_input(self.display, X.ButtonPress, number)
+            xtest.fake_input(self.display, X.ButtonRelease, number)
+        self.display.sync()
+
+    def hotkey(self, *keys: str):
+        pressed: List[int] = []
+        for key in keys:
+            keycode, shift = self._key(key)
+            if shift and self.shift not in pressed:
+                xtest.fake_input(self.display, X.KeyPress, self.shift)
+                pressed.append(self.shift)
+            xtest.fake_input(self.display, X.KeyPress, keycode)
+            pressed.append(keycode)
+        for keycode in reversed(pressed):
+            xtest.fake_input(self.display, X.KeyRelease, keycode)
+        self.display.sync()
+
+    def position(self) -> Tuple[int, int]:
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def size(self) -> Tuple[int, int]:
+        screen = self.display.screen()
+        return screen.width_in_pixels, screen.height_in_pixels
+
+    def close(self):
+        self.display.close()
+
+
+# PyAutoGUI Tastennamen / Zeichen -> evdev Keycodes (US-Layout)
+_UINPUT_KEY_NAMES = {
+    "enter": "KEY_ENTER", "return": "KEY_ENTER", "esc": "KEY_ESC", "escape": "KEY_ESC",
+    "del": "KEY_DELETE", "pgup": "KEY_PAGEUP", "pgdn": "KEY_PAGEDOWN",
+    "ctrl": "KEY_LEFTCTRL", "ctrlleft": "KEY_LEFTCTRL", "ctrlright": "KEY_RIGHTCTRL",
+    "shift": "KEY_LEFTSHIFT", "shiftleft": "KEY_LEFTSHIFT", "shiftright": "KEY_RIGHTSHIFT",
+    "alt": "KEY_LEFTALT", "altleft": "KEY_LEFTALT", "altright": "KEY_RIGHTALT", "altgr": "KEY_RIGHTALT",
+    "win": "KEY_LEFTMETA", "winleft": "KEY_LEFTMETA", "winright": "KEY_RIGHTMETA",
+    "super": "KEY_LEFTMETA", "command": "KEY_LEFTMETA",
+    "printscreen": "KEY_SYSRQ", "prtsc": "KEY_SYSRQ", "apps": "KEY_COMPOSE", "menu": "KEY_COMPOSE",
+    " ": "KEY_SPACE", "\n": "KEY_ENTER", "\t": "KEY_TAB", "-": "KEY_MINUS", "=": "KEY_EQUAL",
+    ",": "KEY_COMMA", ".": "KEY_DOT", "/": "KEY_SLASH", ";": "KEY_SEMICOLON", "'": "KEY_APOSTROPHE",
+    "`": "KEY_GRAVE", "\\": "KEY_BACKSLASH", "[": "KEY_LEFTBRACE", "]": "KEY_RIGHTBRACE",
+}
+_UINPUT_SHIFTED = dict(zip('!@#$%^&*()_+{}|:"~<>?', '1234567890-=[]\\;\'`,./'))
+
+
+class UInputBackend(InputBackend):
+    """
+    Virtuelle Maus und Tastatur über /dev/uinput (Linux, auch Wayland)
+
+    Benötigt Schreibrechte auf /dev/uinput. Die Maus ist ein absolutes
+    Zeigegerät über den ganzen Bildschirm (bei mehreren Monitoren bildet
+    der Compositor es auf die Gesamtfläche ab). Tasten sind Scancodes, der
+    Compositor wendet das Layout an: Zeichen werden für US-Layout
+    aufgelöst. Die Bildschirmgröße kommt vom Capture-Backend, die
+    Mausposition für den Notfall-Stop über X11/XWayland (python-xlib),
+    sonst gilt die zuletzt gesetzte Position.
+    """
+
+    name = "uinput"
+
+    def __init__(self, screen_size: Tuple[int, int] = None):
+        if UInput is None:
+            raise RuntimeError("evdev nicht installiert")
+        if screen_size is None:
+            capture = create_capture_backend()
+            try:
+                screen_size = capture.get_screen_size()
+            finally:
+                capture.close()
+        self._size = tuple(screen_size)
+        width, height = self._size
+        keys = [code for name, code in ecodes.ecodes.items() if name.startswith("KEY_") and code < 0x200]
+        self.keyboard = UInput({ecodes.EV_KEY: keys}, name="desktopcontroller-keyboard")
+        self.pointer = UInput({
+            ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_MIDDLE, ecodes.BTN_RIGHT],
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, 0, width - 1, 0, 0, 0)),
+                            (ecodes.ABS_Y, AbsInfo(0, 0, height - 1, 0, 0, 0))],
+            ecodes.EV_REL: [ecodes.REL_WHEEL],
+        }, name="desktopcontroller-pointer")
+        self._display = None
+        if xdisplay is not None:
+            try:
+                self._display = xdisplay.Display()
+            except Exception as e:
+                logger.debug(f"uinput: keine X11-Verbindung für die Mausposition ({e})")
+        # Ohne X11 bis zur ersten Bewegung unbekannt: Bildschirmmitte
+        self._position = (width // 2, height // 2)
+        self._position = self.position()
+        # Der Compositor muss die neuen Geräte erst erkennen
+        time.sleep(config.INPUT_UINPUT_SETUP_DELAY)
+
+    @staticmethod
+    def _key(name: str) -> Tuple[int, bool]:
+        """(evdev Keycode, Shift nötig) für einen PyAutoGUI Tastennamen"""
+        shift = False
+        if len(name) == 1 and (name.isupper() or name in _UINPUT_SHIFTED):
+            shift = True
+            name = _UINPUT_SHIFTED.get(name, name.lower())
+        code_name = _UINPUT_KEY_NAMES.get(name.lower() if len(name) > 1 else name, f"KEY_{name.upper()}")
+        code = ecodes.ecodes.get(code_name)
+        if code is None:
+            raise ValueError(f"Unbekannte Taste: {name}")
+        return code, shift
+
+    def can_type(self, text: str) -> bool:
+        try:
+            for char in set(text):
+                self._key(char)
+        except ValueError:
+            return False
+        return True
+
+    def move(self, x: int, y: int, duration: float = 0.0):
+        if duration > 0:
+            start_x, start_y = self._position
+            steps = max(int(duration * 60), 1)
+            for step in range(1, steps):
+                self._move(round(start_x + (x - start_x) * step / steps),
+                           round(start_y + (y - start_y) * step / steps))
+                time.sleep(duration / steps)
+        self._move(int(x), int(y))
+
+    def _move(self, x: int, y: int):
+        self.pointer.write(ecodes.EV_ABS, ecodes.ABS_X, x)
+        self.pointer.write(ecodes.EV_ABS, ecodes.ABS_Y, y)
+        self.pointer.syn()
+        self._position = (x, y)
+
+    def click(self, x: int, y: int, button: str = "left", clicks: int = 1,
+              interval: float = 0.0, duration: float = 0.0):
+        self.move(x, y, duration)
+        code = (ecodes.BTN_LEFT, ecodes.BTN_MIDDLE, ecodes.BTN_RIGHT)[_BUTTONS.index(button)]
+        for index in range(clicks):
+            self.pointer.write(ecodes.EV_KEY, code, 1)
+            self.pointer.syn()
+            self.pointer.write(ecodes.EV_KEY, code, 0)
+            self.pointer.syn()
+            if interval > 0 and index < clicks - 1:
+                time.sleep(interval)
+
+    def scroll(self, clicks: int):
+        self.pointer.write(ecodes.EV_REL, ecodes.REL_WHEEL, int(clicks))  # positiv = hoch
+        self.pointer.syn()
+
+    def hotkey(self, *keys: str):
+        pressed: List[int] = []
+        for key in keys:
+            code, shift = self._key(key)
+            if shift and ecodes.KEY_LEFTSHIFT not in pressed:
+                self.keyboard.write(ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT, 1)
+                pressed.append(ecodes.KEY_LEFTSHIFT)
+            self.keyboard.write(ecodes.EV_KEY, code, 1)
+            pressed.append(code)
+        self.keyboard.syn()
+        for code in reversed(pressed):
+            self.keyboard.write(ecodes.EV_KEY, code, 0)
+        self.keyboard.syn()
+
+    def position(self) -> Tuple[int, int]:
+        if self._display is not None:
+            try:
+                pointer = self._display.screen().root.query_pointer()
+                return pointer.root_x, pointer.root_y
+            except Exception as e:
+                logger.debug(f"uinput: Mausposition nicht abfragbar ({e})")
+        return self._position  # Ohne X11/XWayland: zuletzt gesetzte Position
+
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+    def close(self):
+        self.keyboard.close()
+        self.pointer.close()
+        if self._display is not None:
+            self._display.close()
+
+
+INPUT_BACKENDS = {
+    XTestBackend.name: XTestBackend,
+    UInputBackend.name: UInputBackend,
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+}
+
+
+def create_input_backend(name: str = None, screen_size: Tuple[int, int] = None) -> InputBackend:
+    """
+    Erstellt das konfigurierte Input-Backend
+
+    Bei "auto" wird XTest bevorzugt und auf PyAutoGUI zurückgefallen.
+    uinput wird nur explizit verwendet (braucht Rechte auf /dev/uinput).
+
+    Args:
+        name: "auto", "xtest", "uinput" oder "pyautogui" (Standard: config.INPUT_BACKEND)
+        screen_size: Bekannte Bildschirmgröße (uinput, sonst vom Capture-Backend)
+
+    Returns:
+        InputBackend Instanz
+    """
+    if name is None:
+        name = config.INPUT_BACKEND
+
+    candidates = [XTestBackend.name, PyAutoGUIBackend.name] if name == "auto" else [name]
+
+    for candidate in candidates:
+        backend_class = INPUT_BACKENDS.get(candidate)
+        if backend_class is None:
+            raise ValueError(f"Unbekanntes Input-Backend: {candidate}")
+        try:
+            if backend_class is UInputBackend:
+                backend = UInputBackend(screen_size)
+            else:
+                backend = backend_class()
+            logger.info(f"Input-Backend: {backend.name}")
+            return backend
+        except Exception as e:
+            logger.warning(f"Input-Backend {candidate} nicht verfügbar: {e}")
+
+    # Letzter Ausweg, auch wenn explizit ein anderes Backend gewünscht war
+    logger.warning("Falle auf PyAutoGUI zurück")
+    return PyAutoGUIBackend()
+
+
+def timing_policy(action_type: str, settle: bool = False) -> Dict:
+    """
+    Wartezeiten für eine Action aus INPUT_TIMING_POLICIES
+
+    Args:
+        action_type: Action Type (z.B. "click", "hotkey")
+        settle: Settle-Erkennung aktiv (kürzere Standardpause)
+
+    Returns:
+        Dict mit move_duration, click_interval, key_interval und pause (Sekunden)
+    """
+    policy = {
+        "move_duration": 0.0,
+        "click_interval": 0.0,
+        "key_interval": config.TYPING_KEY_INTERVAL,
+        "pause": config.SETTLE_PYAUTOGUI_PAUSE if settle else config.PYAUTOGUI_PAUSE,
+    }
+    policy.update(config.INPUT_TIMING_POLICIES.get("default", {}))
+    policy.update(config.INPUT_TIMING_POLICIES.get(action_type, {}))
+    return policy
+
+
+def benchmark(backend: InputBackend, count: int = 200) -> Dict[str, float]:
+    """
+    Misst Actions pro Sekunde ohne Pausen (Mausbewegungen und Shift-Tastendrücke)
+
+    Args:
+        backend: Zu messendes Backend
+        count: Anzahl Actions pro Art
+
+    Returns:
+        Dict Art -> Actions pro Sekunde
+    """
+    width, height = backend.size()
+    results = {}
+    start = time.perf_counter()
+    for index in range(count):
+        backend.move(width // 4 + index % (width // 2), height // 4 + index % (height // 2))
+    results["move"] = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        backend.press("shift")
+    results["press"] = count / (time.perf_counter() - start)
+    backend.move(width // 2, height // 2)
+    return results
+
+
+def main():
+    """Test-Funktion für Input Backends (misst Actions pro Sekunde)"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Input Backends Test")
+    print("=" * 50)
+
+    for name in INPUT_BACKENDS:
+        try:
+            backend = INPUT_BACKENDS[name]()
+        except Exception as e:
+            print(f"✗ {name}: nicht verfügbar ({e})")
+            continue
+
+        try:
+            backend.check_failsafe()
+            results = benchmark(backend)
+            print(f"✓ {name}: " + ", ".join(f"{kind} {rate:.0f}/s" for kind, rate in results.items()))
+        except FAILSAFE_ERRORS as e:
+            print(f"✗ {name}: {e}")
+        finally:
+            backend.close()
+
+    # Obergrenze durch die Wartezeiten der Policy (unabhängig vom Backend)
+    policy = timing_policy("click")
+    print(f"\nPolicy für click: {policy} -> höchstens "
+          f"{1 / max(policy['move_duration'] + policy['pause'], 1e-3):.0f} Klicks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,21 @@ Hauptprogramm für autonome Desktop-Steuerung
 import logging
 import sys
 import time
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import argparse
 from datetime import datetime
 
 import config
-from screenshot_handler import ScreenshotHandler
+from screenshot_handler import ScreenshotHandler, CapturedFrame, CHANGE_MINOR
+from capture_worker import CaptureWorker
+from settle_detector import SettleDetector
+from debug_recorder import DebugRecorder
 from groq_handler import GroqHandler
 from action_executor import ActionExecutor
+from element_locator import ElementLocator
+from input_backends import FAILSAFE_ERRORS
+from metrics import MetricsServer, get_registry
+from tracing import get_tracer
 
 # Logging Setup
 logger = logging.getLogger(__name__)
@@ -26,13 +33,62 @@ class DesktopController:
     def __init__(self):
         self.screenshot_handler = ScreenshotHandler()
         self.groq_handler = GroqHandler()
-        self.action_executor = ActionExecutor()
+        self.settle_detector = None
+        if config.SETTLE_ENABLED:
+            self.settle_detector = SettleDetector(self.screenshot_handler.backend)
+        # Prüft die Checkpoints von Plan-Schritten (erwartete Bildschirmänderung)
+        self.checkpoint_detector = None
+        if config.PLAN_MODE_ENABLED:
+            self.checkpoint_detector = self.settle_detector or SettleDetector(self.screenshot_handler.backend)
+        self.action_executor = ActionExecutor(
+            screen_size=self.screenshot_handler.get_screen_size(),
+            settle_detector=self.settle_detector
+        )
+
+        # Lokale Wiedererkennung bekannter Klickziele (Template Matching)
+        self.element_locator = None
+        if config.LOCATOR_ENABLED:
+            self.element_locator = ElementLocator(self.screenshot_handler.get_screen_size())
 
         self.current_task = None
         self.task_steps = 0
         self.task_start_time = None
         self.is_running = False
 
+        # Debug-Aufzeichnung der gesendeten Screenshots (asynchron, begrenzt)
+        self.debug_recorder = None
+        if config.DEBUG_RECORDER_ENABLED or logger.isEnabledFor(logging.DEBUG):
+            self.debug_recorder = DebugRecorder()
+
+        # Optionaler Hintergrund-Capture (wird pro Task gestartet)
+        self.capture_worker = None
+        self.current_frame = None
+        self.step_viewport = None
+
+        # Wiederverwendung der letzten Entscheidung bei unverändertem Bildschirm
+        self.last_action = None
+        self.last_action_context = None
+        self.last_action_image = None
+        self.decision_reuse_count = 0
+        self.reused_decisions = 0
+
+        # Plan-Modus: noch auszuführende Actions der letzten Antwort
+        self.pending_plan = []
+        self.plan_length = 0
+        self.planned_actions = 0
+        self.failed_checkpoints = 0
+
+        # Metriken (Histogramme pro Abschnitt), optional per HTTP für Prometheus
+        self.metrics = get_registry()
+        # Zeitleiste jeder Aufgabe (die Timer der Metriken erzeugen die Spans)
+        self.tracer = get_tracer()
+        self.metrics_server = None
+        if config.METRICS_HTTP_PORT:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, config.METRICS_HTTP_PORT).start()
+            except OSError as e:
+                logger.warning(f"Metrics Server konnte nicht gestartet werden: {e}")
+
         logger.info("Desktop Controller initialisiert")
 
     def execute_task(self, task: str) -> bool:
@@ -49,6 +105,23 @@ class DesktopController:
         self.task_steps = 0
         self.task_start_time = time.time()
         self.is_running = True
+        self.last_action = None
+        self.last_action_context = None
+        self.last_action_image = None
+        self.decision_reuse_count = 0
+        self.reused_decisions = 0
+        self.pending_plan = []
+        self.plan_length = 0
+        self.planned_actions = 0
+        self.failed_checkpoints = 0
+        self.screenshot_handler.reset_change_detection()
+        self.groq_handler.reset_history()
+        self.tracer.begin_task(task, model=self.groq_handler.model)
+        task_timer = self.metrics.time("task_seconds").start()
+
+        if config.BACKGROUND_CAPTURE_ENABLED:
+            self.capture_worker = CaptureWorker(self.screenshot_handler)
+            self.capture_worker.start()
 
         logger.info(f"Starte Task: {task}")
         print("\n" + "=" * 70)
@@ -56,9 +129,16 @@ class DesktopController:
         print("=" * 70)
 
         context = f"Schritt 1 - Initialisierung"
+        task_result = "failed"
+        step_timer = None
 
         try:
             while self.is_running and self.task_steps < config.MAX_TASK_STEPS:
+                # Vorigen Schritt abschließen (auch bei continue)
+                if step_timer is not None:
+                    step_timer.stop()
+                step_timer = self.metrics.time("step_seconds").start()
+
                 # Prüfe Timeout
                 elapsed_time = time.time() - self.task_start_time
                 if elapsed_time > config.TASK_TIMEOUT:
@@ -68,73 +148,213 @@ class DesktopController:
 
                 # Schritt Nummer
                 self.task_steps += 1
+                step_timer.set(step=self.task_steps)
                 print(f"\n{'─' * 70}")
                 print(f"🔄 Schritt {self.task_steps}/{config.MAX_TASK_STEPS}")
                 print(f"{'─' * 70}")
 
-                # 1. Screenshot erstellen
-                print("📸 Erstelle Screenshot...")
-                base64_image = self.screenshot_handler.capture_and_encode()
-
-                if not base64_image:
-                    logger.error("Screenshot fehlgeschlagen")
-                    print("❌ Screenshot Fehler")
-                    return False
-
-                screenshot_size = len(base64_image)
-                print(f"✓ Screenshot: {screenshot_size} bytes")
-
-                # Optional: Screenshot speichern für Debugging
-                if logger.level == logging.DEBUG:
-                    filename = f"debug_step_{self.task_steps}.jpg"
-                    self.screenshot_handler.save_screenshot(filename)
-                    logger.debug(f"Screenshot gespeichert: {filename}")
-
-                # 2. Groq nach nächster Aktion fragen
-                print("🤖 Frage Groq AI...")
-                action = self.groq_handler.get_next_action(
-                    base64_image=base64_image,
-                    user_task=task,
-                    context=context
-                )
-
-                if not action:
-                    logger.error("Keine Action von Groq erhalten")
-                    print("❌ AI Antwort fehlgeschlagen")
-                    return False
+                step_context = context
+                from_cache = False
+                located = False
+                reused = False
+                frame = None
+
+                if self.pending_plan:
+                    # Nächste Action aus dem Plan: kein Screenshot und kein API Request
+                    action = self.pending_plan.pop(0)
+                    self.planned_actions += 1
+                    self.last_action = None
+                    position = self.plan_length - len(self.pending_plan)
+                    print(f"📋 Plan-Schritt {position}/{self.plan_length}")
+                else:
+                    # 1. Screenshot erstellen (oder aktuellen Frame aus dem Hintergrund-Capture holen)
+                    print("📸 Erstelle Screenshot...")
+                    with self.metrics.time("stage_seconds", stage="frame") as frame_timer:
+                        frame = self._next_frame()
+                        if frame is not None:
+                            frame_timer.set(bytes=len(frame.base64_image), change=frame.change)
+
+                    if frame is None:
+                        logger.error("Screenshot fehlgeschlagen")
+                        print("❌ Screenshot Fehler")
+                        return False
+
+                    self.current_frame = frame
+                    self.step_viewport = frame.viewport
+                    base64_image = frame.base64_image
+                    screenshot_size = len(base64_image)
+                    print(f"✓ Screenshot: {screenshot_size} bytes")
+
+                    # Optional: Screenshot für Debugging aufzeichnen (ohne Festplattenzugriff im Loop)
+                    if self.debug_recorder is not None:
+                        self.debug_recorder.record(self.task_steps, frame, {"task": task, "context": context})
+
+                    # 2. Groq nach nächster Aktion fragen (oder letzte/gespeicherte Entscheidung wiederverwenden)
+                    decide_timer = self.metrics.time("stage_seconds", stage="decide").start()
+                    if self._can_reuse_decision(context, frame):
+                        reused = True
+                        self.decision_reuse_count += 1
+                        self.reused_decisions += 1
+                        action = dict(self.last_action)
+                        logger.info("Bildschirm unverändert, verwende letzte Entscheidung")
+                        print("♻️  Bildschirm unverändert, verwende letzte Entscheidung")
+                    else:
+                        self.decision_reuse_count = 0
+                        action = self.groq_handler.get_cached_action(task, context, frame.image_hash)
+                        from_cache = action is not None
+
+                        if not from_cache and self.element_locator is not None:
+                            action = self.element_locator.find(task, self.task_steps, context, frame.source)
+                            located = action is not None
+
+                        if from_cache:
+                            print("💾 Bekannter Bildschirm, verwende gespeicherte Entscheidung")
+                        elif located:
+                            print("🔎 Bekanntes Element lokal gefunden, kein API Request")
+                        else:
+                            print("🤖 Frage Groq AI...")
+                            if config.ZOOM_MODE_ENABLED:
+                                action = self.groq_handler.get_next_action_zoomed(
+                                    base64_image=base64_image,
+                                    user_task=task,
+                                    context=context,
+                                    zoom_provider=self._zoom_into_frame,
+                                    mime_type=frame.mime_type
+                                )
+                            else:
+                                action = self.groq_handler.get_next_action(
+                                    base64_image=base64_image,
+                                    user_task=task,
+                                    context=context,
+                                    mime_type=frame.mime_type
+                                )
+
+                            # Koordinaten vom gesendeten Bild (Übersicht/Ausschnitt) auf den Bildschirm umrechnen
+                            if action and self.step_viewport is not None:
+                                action = self.step_viewport.map_action(action)
+                    decide_timer.stop()
+
+                    if not action:
+                        logger.error("Keine Action von Groq erhalten")
+                        print("❌ AI Antwort fehlgeschlagen")
+                        return False
+
+                    self.last_action = action
+                    self.last_action_context = context
+                    self.last_action_image = base64_image
+
+                    # Plan-Modus: weitere Actions für die folgenden Schritte vormerken
+                    self.pending_plan = list(action.get("plan") or [])
+                    self.plan_length = len(self.pending_plan) + 1
+                    if self.pending_plan:
+                        print(f"📋 Plan mit {self.plan_length} Actions erhalten")
+
+                image_hash = frame.image_hash if frame is not None else None
 
                 # 3. Action anzeigen
-                print(f"\n💭 AI Reasoning: {action['reasoning']}")
+                reasoning = action['reasoning'] or ('(wird noch gestreamt)' if config.STREAMING_ENABLED else '-')
+                print(f"\n💭 AI Reasoning: {reasoning}")
                 print(f"🎯 Action: {action['action']}")
                 print(f"📊 Konfidenz: {action['confidence']:.2%}")
+                source = ("plan" if frame is None else "reuse" if reused else "cache" if from_cache
+                          else "locator" if located else "api")
+                step_timer.set(action=action['action'], confidence=action['confidence'],
+                               model=action.get('_model'), source=source)
 
                 # 4. Prüfe ob Task abgeschlossen
                 if action['action'] == 'done':
+                    task_result = "success"
                     success_message = action['parameters'].get('message', 'Task abgeschlossen')
                     print(f"\n✅ {success_message}")
                     self._print_summary(success=True)
                     return True
 
                 # 5. Validiere Action
-                if not self.groq_handler.validate_action(action):
+                with self.metrics.time("stage_seconds", stage="validate"):
+                    valid = self.groq_handler.validate_action(action)
+                if not valid:
                     logger.warning("Action Validierung fehlgeschlagen")
                     print("⚠️  Action ungültig, überspringe...")
                     context = f"Letzte Action war ungültig. Versuche es anders."
+                    self.last_action = None
+                    self.pending_plan = []
+                    self.groq_handler.record_step(self.task_steps, action, "ungültig")
+                    step_timer.set(outcome="ungültig")
+                    if source == "api":
+                        self.groq_handler.record_outcome(action, False)
+                    if from_cache:
+                        self.groq_handler.invalidate_cached_action(task, step_context, image_hash)
+                    if located:
+                        self.element_locator.invalidate(task, self.task_steps, step_context)
                     continue
 
-                # 6. Führe Action aus
+                # 6. Führe Action aus (bei Checkpoint vorher den Bildschirm merken)
+                checkpoint_reference = None
+                if action.get("expect_change") and self.checkpoint_detector is not None:
+                    checkpoint_reference = self.checkpoint_detector.sample()
+
                 print(f"⚙️  Führe aus: {action['action']} {action['parameters']}")
-                success = self.action_executor.execute_action(action)
+                with self.metrics.time("stage_seconds", stage="execute") as execute_timer:
+                    execute_timer.set(action=action['action'])
+                    success = self.action_executor.execute_action(action)
 
+                outcome = "erfolgreich" if success else "fehlgeschlagen"
                 if success:
                     print("✓ Action erfolgreich")
                     context = f"Letzte Action ({action['action']}) war erfolgreich"
                 else:
                     print("✗ Action fehlgeschlagen")
                     context = f"Letzte Action ({action['action']}) ist fehlgeschlagen"
-
-                # Kurze Pause zwischen Schritten
-                time.sleep(0.5)
+                    if from_cache:
+                        self.groq_handler.invalidate_cached_action(task, step_context, image_hash)
+                    self.pending_plan = []
+
+                # Keine erwartete Bildschirmänderung (Warte-Action im Timeout oder Checkpoint):
+                # die Eingabe selbst war erfolgreich, nur der Rest des Plans wird verworfen
+                changed = not self.action_executor.last_wait_timed_out
+                if success and changed and checkpoint_reference is not None:
+                    with self.metrics.time("stage_seconds", stage="checkpoint"):
+                        changed = self.checkpoint_detector.wait_until_changed(
+                            timeout=config.PLAN_CHECKPOINT_TIMEOUT, reference=checkpoint_reference)
+                    if not changed:
+                        self.failed_checkpoints += 1
+                        print("⚠️  Checkpoint fehlgeschlagen: keine Bildschirmänderung, plane neu")
+                if success and not changed:
+                    context = (f"Nach der Action ({action['action']}) hat sich der Bildschirm "
+                               f"nicht wie erwartet geändert")
+                    outcome = "ausgeführt, aber keine erwartete Bildschirmänderung"
+                    self.pending_plan = []
+
+                # Nur vollständig erfolgreiche Entscheidungen speichern
+                if outcome == "erfolgreich" and not from_cache:
+                    self.groq_handler.cache_action(task, step_context, image_hash, action)
+
+                # Element Locator: Ziel erfolgreicher Klicks merken, lokal aufgelöste Fehlklicks vergessen
+                if self.element_locator is not None:
+                    if outcome == "erfolgreich" and frame is not None and not located:
+                        self.element_locator.remember(task, self.task_steps, step_context, action, frame.source)
+                    elif not success and located:
+                        self.element_locator.invalidate(task, self.task_steps, step_context)
+
+                step_timer.set(outcome=outcome)
+                # Nur vom Router entschiedene Schritte zählen für die Modell-Kaskade (Ausführung, nicht Wirkung)
+                if source == "api":
+                    self.groq_handler.record_outcome(action, success)
+
+                # Verlauf für die folgenden Requests (Screenshot nur bei eigener Entscheidung)
+                self.groq_handler.record_step(self.task_steps, action, outcome,
+                                              frame.source if frame is not None else None)
+
+                # Warten bis der Bildschirm nach der Action stabil ist
+                with self.metrics.time("stage_seconds", stage="settle"):
+                    if self.settle_detector is not None:
+                        self.settle_detector.wait_until_stable()
+                    else:
+                        time.sleep(0.5)
+
+                # Ab jetzt nur noch Frames verwenden, die nach dem Übergang aufgenommen wurden
+                if self.capture_worker is not None:
+                    self.capture_worker.mark_action()
 
             # Max Steps erreicht
             if self.task_steps >= config.MAX_TASK_STEPS:
@@ -144,18 +364,106 @@ class DesktopController:
                 return False
 
         except KeyboardInterrupt:
+            task_result = "aborted"
             print("\n\n⏸️  Task vom Benutzer abgebrochen")
             self._print_summary(success=False)
             return False
 
+        except FAILSAFE_ERRORS as e:
+            task_result = "aborted"
+            logger.warning(str(e))
+            print("\n\n🛑 Notfall-Stop: Maus in Bildschirmecke, Task abgebrochen")
+            self._print_summary(success=False)
+            return False
+
         except Exception as e:
+            task_result = "error"
             logger.error(f"Fehler bei Task Ausführung: {e}", exc_info=True)
             print(f"\n❌ Fehler: {e}")
             self._print_summary(success=False)
             return False
 
+        finally:
+            self._stop_capture_worker()
+            if self.groq_handler.decision_cache is not None:
+                self.groq_handler.decision_cache.save()
+            if self.element_locator is not None:
+                self.element_locator.save()
+            if step_timer is not None:
+                step_timer.stop()
+            task_timer.stop()
+            self.metrics.inc("tasks_total", result=task_result)
+            self.metrics.export(config.METRICS_FILE, config.METRICS_PROMETHEUS_FILE)
+            trace_file = self.tracer.end_task(result=task_result, steps=self.task_steps)
+            if trace_file:
+                logger.info(f"Trace der Aufgabe: {trace_file}")
+
         return False
 
+    def _next_frame(self) -> Optional[CapturedFrame]:
+        """Holt den Frame für den nächsten Schritt (Hintergrund-Capture oder direkt)"""
+        if self.capture_worker is not None:
+            return self.capture_worker.get_frame()
+        return self.screenshot_handler.capture_frame()
+
+    def _stop_capture_worker(self):
+        """Beendet den Hintergrund-Capture des laufenden Tasks"""
+        if self.capture_worker is not None:
+            self.capture_worker.stop()
+            self.capture_worker = None
+
+    def _zoom_into_frame(self, region: Dict) -> Optional[Tuple[bytes, str]]:
+        """
+        Zoom-Provider für GroqHandler: Ausschnitt aus dem Frame des aktuellen Schritts
+
+        Args:
+            region: Bereich in Koordinaten der Übersicht
+
+        Returns:
+            (Base64 Bytes, MIME-Type) oder None bei Fehler
+        """
+        zoomed = self.screenshot_handler.encode_zoom_region(
+            region, self.current_frame.source, self.current_frame.viewport
+        )
+        if zoomed is None:
+            return None
+
+        base64_crop, mime_type, self.step_viewport = zoomed
+        return base64_crop, mime_type
+
+    def _can_reuse_decision(self, context: str, frame: CapturedFrame) -> bool:
+        """
+        Prüft ob die letzte Entscheidung ohne neuen API Request wiederverwendet werden kann
+
+        Das ist nur der Fall, wenn die KI exakt dieselbe Eingabe sehen würde:
+        gleicher Kontext und (nahezu) unveränderter Bildschirm.
+
+        Args:
+            context: Kontext für den aktuellen Schritt
+            frame: Frame des aktuellen Schritts
+
+        Returns:
+            True wenn die letzte Action wiederverwendet werden kann
+        """
+        if not config.CHANGE_DETECTION_ENABLED or self.last_action is None:
+            return False
+
+        if context != self.last_action_context:
+            return False
+
+        if self.decision_reuse_count >= config.CHANGE_MAX_DECISION_REUSE:
+            return False
+
+        # Unveränderte Frames liefern exakt das zuletzt gesendete Encoding
+        if frame.base64_image == self.last_action_image:
+            return True
+
+        # Im Hintergrund-Capture bezieht sich frame.change auf den vorigen
+        # Hintergrund-Frame, nicht auf den Frame der letzten Entscheidung
+        if self.capture_worker is not None:
+            return False
+        return frame.change == CHANGE_MINOR and config.CHANGE_REUSE_ON_MINOR
+
     def _print_summary(self, success: bool):
         """Druckt Zusammenfassung nach Task"""
         elapsed_time = time.time() - self.task_start_time
@@ -177,6 +485,36 @@ class DesktopController:
         # Groq Stats
         groq_stats = self.groq_handler.get_stats()
         print(f"API Requests: {groq_stats['request_count']}")
+        if self.reused_decisions:
+            print(f"Wiederverwendete Entscheidungen: {self.reused_decisions}")
+        if self.planned_actions:
+            print(f"Actions aus Plänen: {self.planned_actions} "
+                  f"(fehlgeschlagene Checkpoints: {self.failed_checkpoints})")
+        if "decision_cache" in groq_stats:
+            cache_stats = groq_stats["decision_cache"]
+            print(f"Decision Cache: {cache_stats['hits']} Treffer ({cache_stats['hit_rate']:.0%})")
+        if self.element_locator is not None:
+            locator_stats = self.element_locator.get_stats()
+            print(f"Element Locator: {locator_stats['hits']} lokal gefunden, "
+                  f"{locator_stats['invalidations']} verworfen")
+        if "router" in groq_stats:
+            for model, model_stats in groq_stats["router"]["models"].items():
+                if model_stats["requests"]:
+                    print(f"Modell {model}: {model_stats['requests']} Requests, "
+                          f"Median {model_stats['median_latency'] * 1000:.0f} ms")
+            print(f"Eskalationen: {groq_stats['escalation_count']}")
+
+        # Latenz pro Abschnitt (letzte METRICS_WINDOW Werte)
+        stages = self.metrics.series("stage_seconds")
+        if stages:
+            print("Abschnitte (p50 / p95 / p99):")
+            for labels, stage in stages:
+                print(f"  {labels['stage']:10} {stage['p50'] * 1000:8.0f} / {stage['p95'] * 1000:6.0f} / "
+                      f"{stage['p99'] * 1000:6.0f} ms  ({stage['count']}x)")
+        request_latency = self.metrics.series("api_request_seconds")
+        for labels, request in request_latency:
+            print(f"  API {labels['model']}: {request['p50'] * 1000:.0f} / {request['p95'] * 1000:.0f} / "
+                  f"{request['p99'] * 1000:.0f} ms ({request['count']}x)")
 
         print("=" * 70 + "\n")
 
@@ -0,0 +1,385 @@
+"""
+Metrics
+Leichtgewichtige Metriken (Counter, Histogramme mit p50/p95/p99) mit Export als Prometheus-Text und JSON
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+
+import config
+from tracing import ATTRIBUTES, Tracer, get_tracer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "desktopcontroller_"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Name -> (Typ, Beschreibung, Buckets); alle Metriken des Projekts an einer Stelle
+FAMILIES = {
+    "stage_seconds": ("histogram", "Dauer der Abschnitte eines Schritts", SECONDS_BUCKETS),
+    "step_seconds": ("histogram", "Dauer eines kompletten Schritts", SECONDS_BUCKETS),
+    "task_seconds": ("histogram", "Dauer einer Aufgabe", SECONDS_BUCKETS),
+    "tasks_total": ("counter", "Ausgeführte Aufgaben nach Ergebnis", None),
+    "api_request_seconds": ("histogram", "Dauer eines API Versuchs (inklusive Parsen)", SECONDS_BUCKETS),
+    "api_requests_total": ("counter", "API Versuche nach Ergebnis", None),
+    "api_retries_total": ("counter", "Wiederholte API Versuche", None),
+    "payload_bytes": ("histogram", "Größe des Request Bodys", BYTES_BUCKETS),
+    "tokens_total": ("counter", "Verbrauchte Tokens laut usage", None),
+    "actions_total": ("counter", "Ausgeführte Actions nach Typ und Ergebnis", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Kumulatives Histogramm plus Fenster der letzten Werte für Quantile
+
+    Die Buckets (Prometheus) bleiben über alle Läufe additiv; p50/p95/p99
+    stammen aus den letzten METRICS_WINDOW Werten.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...], window: int):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # letzter Eintrag: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.window: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.window.append(value)
+
+    def quantiles(self) -> Dict[str, float]:
+        """p50/p95/p99 über das Fenster (Nearest Rank)"""
+        values = sorted(self.window)
+        if not values:
+            return {f"p{int(q * 100)}": 0.0 for q in QUANTILES}
+        return {f"p{int(q * 100)}": values[min(int(q * len(values)), len(values) - 1)] for q in QUANTILES}
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+            **self.quantiles(),
+            "window": list(self.window),
+        }
+
+    def merge(self, data: Dict):
+        """Übernimmt einen gespeicherten Stand (to_dict) additiv"""
+        if list(data.get("buckets", {})) != [str(b) for b in self.buckets] + ["+Inf"]:
+            return  # Buckets geändert: alter Stand passt nicht mehr
+        self.counts = [a + b for a, b in zip(self.counts, data["buckets"].values())]
+        self.sum += data.get("sum", 0.0)
+        self.count += data.get("count", 0)
+        self.window.extendleft(reversed(data.get("window", [])[-self.window.maxlen:]))
+
+
+class _Timer:
+    """
+    Misst einen Abschnitt mit der monotonen Uhr und beobachtet beim Verlassen
+
+    Läuft gerade eine Trace-Aufzeichnung, wird der Abschnitt zusätzlich als
+    Span erfasst (Name: Label "stage" oder Metrikname ohne "_seconds").
+    """
+    __slots__ = ("registry", "name", "labels", "started", "elapsed", "span")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.elapsed = 0.0
+        self.span = None
+
+    def start(self) -> "_Timer":
+        tracer = self.registry.tracer
+        if tracer is not None and tracer.recording:
+            attributes = {key: value for key, value in self.labels.items() if key != "stage"}
+            self.span = tracer.start(self.labels.get("stage") or self.name.replace("_seconds", ""), **attributes)
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self) -> float:
+        self.elapsed = time.perf_counter() - self.started
+        self.registry.observe(self.name, self.elapsed, **self.labels)
+        if self.span is not None:
+            self.registry.tracer.end(self.span)
+        return self.elapsed
+
+    def set(self, **attributes):
+        """Attribute für den Span (z.B. bytes, action); ohne Aufzeichnung wirkungslos"""
+        if self.span is not None:
+            self.span[ATTRIBUTES].update(attributes)
+
+    def __enter__(self) -> "_Timer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MetricsRegistry:
+    """
+    Sammelt Counter und Histogramme mit Labels
+
+    Alle Methoden sind thread-sicher. Mit enabled=False werden Beobachtungen
+    ignoriert, die Aufrufe im Code bleiben trotzdem gleich.
+    """
+
+    def __init__(self, enabled: bool = None, window: int = None, tracer: Tracer = None):
+        self.enabled = config.METRICS_ENABLED if enabled is None else enabled
+        self.window = window or config.METRICS_WINDOW
+        self.tracer = tracer  # Timer erzeugen zusätzlich Spans (siehe tracing.py)
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple[str, Labels]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name: str, value: float, **labels):
+        """Trägt einen Wert in ein Histogramm ein"""
+        if not self.enabled or value is None:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                buckets = FAMILIES.get(name, (None, None, SECONDS_BUCKETS))[2]
+                histogram = self.histograms[key] = Histogram(buckets, self.window)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Erhöht einen Counter"""
+        if not self.enabled or not amount:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def time(self, name: str, **labels) -> _Timer:
+        """
+        Misst einen Block: with metrics.time("stage_seconds", stage="capture"): ...
+
+        Ohne with: timer = metrics.time(...).start() und später timer.stop().
+        Die gemessene Dauer steht danach in timer.elapsed.
+        """
+        return _Timer(self, name, labels)
+
+    def quantiles(self, name: str, **labels) -> Optional[Dict[str, float]]:
+        """p50/p95/p99 eines Histogramms oder None"""
+        with self._lock:
+            histogram = self.histograms.get(self._key(name, labels))
+            return histogram.quantiles() if histogram is not None else None
+
+    def series(self, name: str) -> List[Tuple[Dict[str, str], Dict]]:
+        """Alle Histogramme einer Metrik mit ihren Labels (für Zusammenfassungen)"""
+        with self._lock:
+            return [(dict(labels), histogram.to_dict()) for (metric, labels), histogram
+                    in sorted(self.histograms.items()) if metric == name]
+
+    def to_dict(self) -> Dict:
+        """Kompletter Stand als JSON-fähiges Dictionary"""
+        with self._lock:
+            histograms = [{"name": name, "labels": dict(labels), **histogram.to_dict()}
+                          for (name, labels), histogram in sorted(self.histograms.items())]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {"histograms": histograms, "counters": counters, "exported_at": time.time()}
+
+    def to_json(self) -> str:
+        """Stand als JSON Text"""
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Stand im Prometheus Text-Format (Version 0.0.4)"""
+        lines = []
+        with self._lock:
+            histogram_names = {name for name, _ in self.histograms}
+            for name in sorted(histogram_names | {name for name, _ in self.counters}):
+                default_kind = "histogram" if name in histogram_names else "counter"
+                kind, description, _ = FAMILIES.get(name, (default_kind, "", None))
+                metric = PREFIX + name
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for (series, labels), histogram in sorted(self.histograms.items()):
+                    if series != name:
+                        continue
+                    cumulative = 0
+                    bounds = [str(b) for b in histogram.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+                for (series, labels), value in sorted(self.counters.items()):
+                    if series == name:
+                        lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def load(self, path: str):
+        """Übernimmt einen gespeicherten Stand (frühere Läufe) additiv"""
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for item in data.get("histograms", []):
+                    key = self._key(item["name"], item["labels"])
+                    histogram = self.histograms.get(key)
+                    if histogram is None:
+                        buckets = FAMILIES.get(item["name"], (None, None, SECONDS_BUCKETS))[2]
+                        histogram = self.histograms[key] = Histogram(buckets, self.window)
+                    histogram.merge(item)
+                for item in data.get("counters", []):
+                    key = self._key(item["name"], item["labels"])
+                    self.counters[key] = self.counters.get(key, 0) + item["value"]
+            logger.info(f"Metriken geladen: {path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Metriken konnten nicht geladen werden: {e}")
+
+    def export(self, json_path: str = None, prometheus_path: str = None):
+        """
+        Schreibt den Stand atomar als JSON und/oder Prometheus-Textdatei
+
+        Args:
+            json_path: Ziel für JSON (wird beim Start mit load wieder eingelesen)
+            prometheus_path: Ziel für das Text-Format (z.B. node_exporter Textfile Collector)
+        """
+        for path, content in ((json_path, self.to_json), (prometheus_path, self.to_prometheus)):
+            if not path:
+                continue
+            try:
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(content())
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.warning(f"Metriken konnten nicht geschrieben werden ({path}): {e}")
+
+    def reset(self):
+        """Verwirft alle Werte"""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _format_labels(labels: Labels) -> str:
+    """Labels im Prometheus-Format: {key="value",...} mit escapten Werten"""
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsServer:
+    """HTTP Endpoint für Prometheus (/metrics) und JSON (/metrics.json)"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics Server: {format % args}")
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        logger.info(f"Metriken unter http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# Gemeinsame Registry aller Komponenten im Prozess
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Gemeinsame Metrics Registry des Prozesses (mit dem Stand aus METRICS_FILE)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(tracer=get_tracer())
+            if _registry.enabled and config.METRICS_FILE:
+                _registry.load(config.METRICS_FILE)
+        return _registry
+
+
+def main():
+    """Test-Funktion für die Metriken"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    import random
+
+    print("Metrics Test")
+    print("=" * 50)
+
+    registry = MetricsRegistry(enabled=True)
+    for _ in range(500):
+        registry.observe("stage_seconds", random.lognormvariate(-3, 0.5), stage="capture")
+        registry.observe("stage_seconds", random.lognormvariate(-0.5, 0.3), stage="request")
+        registry.observe("payload_bytes", random.randint(50_000, 300_000))
+    registry.inc("tokens_total", 1234, kind="prompt")
+    registry.inc("api_retries_total")
+    with registry.time("stage_seconds", stage="execute") as timer:
+        time.sleep(0.01)
+    print(f"Gemessen: {timer.elapsed * 1000:.1f} ms")
+
+    for labels, data in registry.series("stage_seconds"):
+        print(f"{labels['stage']:10} n={data['count']:4d} p50={data['p50'] * 1000:7.1f} ms "
+              f"p95={data['p95'] * 1000:7.1f} ms p99={data['p99'] * 1000:7.1f} ms")
+    print()
+    print("\n".join(registry.to_prometheus().splitlines()[:8]))
+
+
+if __name__ == "__main__":
+    main()
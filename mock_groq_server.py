@@ -0,0 +1,290 @@
+"""
+Mock Groq Server
+Lokaler Ersatz für die Groq Chat Completions API (JSON und Server-Sent Events) zum Testen
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+from traffic_recorder import ReplayStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACTION = {
+    "action": "done",
+    "parameters": {"message": "Mock: Task abgeschlossen"},
+    "confidence": 1.0,
+    "is_critical": False,
+    "reasoning": "Antwort des lokalen Mock Servers",
+}
+
+
+def parse_latency(spec: str, seed: int = None) -> Callable[[], float]:
+    """
+    Erstellt eine Latenzverteilung aus einer Kurzbeschreibung
+
+    Formate (Sekunden): "fixed:0.8", "uniform:0.4,1.2", "normal:0.8,0.2",
+    "lognormal:0.8,0.5" (Median, Sigma), "exponential:0.8" (Mittelwert).
+    Mit "+tail:P,S" wird zusätzlich mit Wahrscheinlichkeit P eine Latenz
+    von S Sekunden gezogen (z.B. "lognormal:0.8,0.3+tail:0.05,6").
+
+    Args:
+        spec: Beschreibung der Verteilung
+        seed: Startwert für reproduzierbare Folgen
+
+    Returns:
+        Funktion, die bei jedem Aufruf eine Latenz liefert
+    """
+    rng = random.Random(seed)
+    spec, _, tail = spec.partition("+tail:")
+    kind, _, raw = spec.partition(":")
+    try:
+        values = [float(value) for value in raw.split(",") if value.strip()]
+        tail_probability, tail_latency = [float(value) for value in tail.split(",")] if tail else (0.0, 0.0)
+    except ValueError:
+        raise ValueError(f"Ungültige Latenzangabe: {spec}")
+
+    distributions = {
+        "fixed": (1, lambda: values[0]),
+        "uniform": (2, lambda: rng.uniform(values[0], values[1])),
+        "normal": (2, lambda: rng.gauss(values[0], values[1])),
+        "lognormal": (2, lambda: values[0] * rng.lognormvariate(0.0, values[1])),
+        "exponential": (1, lambda: rng.expovariate(1.0 / values[0])),
+    }
+    if kind not in distributions or len(values) != distributions[kind][0]:
+        raise ValueError(f"Ungültige Latenzangabe: {spec} (erlaubt: {', '.join(distributions)})")
+    sample = distributions[kind][1]
+
+    def latency() -> float:
+        if tail_probability and rng.random() < tail_probability:
+            return tail_latency
+        return max(sample(), 0.0)
+
+    return latency
+
+
+class MockGroqServer:
+    """
+    Beantwortet Chat Completion Requests mit vorgegebenen Actions
+
+    Die Actions werden der Reihe nach ausgeliefert (danach immer die letzte).
+    Ein Feld "_latency" in einer Action legt die Antwortzeit dieses Schritts
+    fest. Mit replay werden stattdessen aufgezeichnete Antworten (siehe
+    TrafficRecorder) mit ihren gemessenen Latenzen abgespielt.
+
+    Die Antwortzeit stammt aus der Action, der Aufzeichnung, der
+    Latenzverteilung latency oder ergibt sich aus first_token_delay plus
+    token_delay pro Stück. Bei "stream": true wird die Antwort als SSE in
+    Stücken von chunk_size Zeichen gesendet und endet zur selben Zeit.
+    """
+
+    def __init__(self, actions: List[Dict] = None, host: str = "127.0.0.1", port: int = 0,
+                 token_delay: float = 0.02, chunk_size: int = 4, first_token_delay: float = 0.1,
+                 latency: Callable[[], float] = None, replay: ReplayStore = None):
+        self.actions = list(actions or [DEFAULT_ACTION])
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+        self.first_token_delay = first_token_delay
+        self.latency = latency
+        self.replay = replay
+
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Endpoint für GROQ_API_ENDPOINT"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def next_response(self, request: Dict) -> Tuple[Optional[str], Optional[float], Optional[Dict]]:
+        """
+        Nächste Antwort (Feldreihenfolge wie im Streaming-Prompt)
+
+        Returns:
+            (Text oder None wenn die Aufzeichnung erschöpft ist, vorgegebene Latenz, usage)
+        """
+        with self._lock:
+            index = len(self.requests)
+            self.requests.append(request)
+            action = self.actions[min(index, len(self.actions) - 1)]
+
+        if self.replay is not None:
+            record = self.replay.match(request)
+            if record is None:
+                return None, None, None
+            latency = None if self.latency is not None else record.get("latency")
+            return record["content"], latency, record.get("usage")
+
+        action = dict(action)
+        latency = action.pop("_latency", None)
+        return json.dumps(action, ensure_ascii=False), latency, None
+
+    def generation_time(self, content: str, latency: float = None) -> float:
+        """Simulierte Zeit bis zum vollständigen Text"""
+        if latency is not None:
+            return latency
+        if self.latency is not None:
+            return self.latency()
+        chunks = -(-len(content) // self.chunk_size)
+        return self.first_token_delay + chunks * self.token_delay
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(f"Mock Server: {format % args}")
+
+            def do_HEAD(self):
+                self.send_response(405)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Ungültiges JSON"}})
+                    return
+
+                content, latency, usage = server.next_response(request)
+                if content is None:
+                    self._send_json(404, {"error": {"message": "Keine passende Aufzeichnung"}})
+                    return
+
+                total = server.generation_time(content, latency)
+                if request.get("stream"):
+                    self._send_stream(request, content, total)
+                else:
+                    time.sleep(total)
+                    response = {
+                        "object": "chat.completion",
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                    }
+                    if usage:
+                        response["usage"] = usage
+                    self._send_json(200, response)
+
+            def _send_json(self, status: int, data: Dict):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, request: Dict, content: str, total: float):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                # Gleiche Gesamtzeit wie ohne Streaming, die Stücke kommen am Ende
+                chunks = max(-(-len(content) // server.chunk_size), 1)
+                token_delay = min(server.token_delay, total / chunks)
+                time.sleep(total - chunks * token_delay)
+                for start in range(0, len(content), server.chunk_size):
+                    self._send_event({
+                        "object": "chat.completion.chunk",
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "finish_reason": None,
+                                     "delta": {"content": content[start:start + server.chunk_size]}}],
+                    })
+                    time.sleep(token_delay)
+                self._send_event({"object": "chat.completion.chunk",
+                                  "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+
+            def _send_event(self, data: Dict):
+                self._send_chunk(b"data: " + json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+            def _send_chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "MockGroqServer":
+        """Startet den Server in einem Hintergrund-Thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MockGroqServer", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock Groq Server läuft auf {self.url}")
+        return self
+
+    def reset(self):
+        """Beginnt wieder bei der ersten Action (z.B. für den nächsten Benchmark-Durchlauf)"""
+        with self._lock:
+            self.requests.clear()
+
+    def stop(self):
+        """Beendet den Server"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        stats = {"requests": len(self.requests)}
+        if self.replay is not None:
+            stats["replay"] = self.replay.get_stats()
+        return stats
+
+
+def main():
+    """Startet den Mock Server im Vordergrund"""
+    parser = argparse.ArgumentParser(description="Lokaler Mock der Groq API")
+    parser.add_argument("--port", type=int, default=8765, help="Port (Standard: 8765)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Pause zwischen Stream-Chunks")
+    parser.add_argument("--actions", help="JSON-Datei mit einer Liste von Actions (optional mit _latency)")
+    parser.add_argument("--replay", help="Aufzeichnung (TRAFFIC_RECORD_FILE) abspielen")
+    parser.add_argument("--latency", help='Latenzverteilung, z.B. "lognormal:0.8,0.4+tail:0.05,5"')
+    parser.add_argument("--seed", type=int, help="Startwert für die Latenzverteilung")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    actions = None
+    if args.actions:
+        with open(args.actions, "r", encoding="utf-8") as f:
+            actions = json.load(f)
+    replay = ReplayStore.from_file(args.replay) if args.replay else None
+    latency = parse_latency(args.latency, args.seed) if args.latency else None
+
+    print("Mock Groq Server")
+    print("=" * 50)
+
+    server = MockGroqServer(actions, port=args.port, token_delay=args.token_delay,
+                            latency=latency, replay=replay).start()
+    print(f"Endpoint: {server.url}")
+    if replay is not None:
+        print(f"Replay: {len(replay.records)} aufgezeichnete Antworten")
+    print("Beenden mit Ctrl+C")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\nStatistiken: {server.get_stats()}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
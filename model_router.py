@@ -0,0 +1,225 @@
+"""
+Model Router
+Kaskade aus schnellem kleinem und großem Vision-Modell, gesteuert durch Latenz- und Trefferstatistik
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStats:
+    """Latenz und Trefferquote eines Modells über ein gleitendes Fenster"""
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)  # Ausgeführte Actions erfolgreich?
+        self.escalations: Deque[bool] = deque(maxlen=window)  # Antwort an großes Modell weitergereicht?
+        self.request_count = 0
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    @property
+    def median_latency(self) -> Optional[float]:
+        return self._percentile(self.latencies, 0.5)
+
+    @property
+    def p90_latency(self) -> Optional[float]:
+        return self._percentile(self.latencies, 0.9)
+
+    @property
+    def accuracy(self) -> Optional[float]:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else None
+
+    @property
+    def escalation_rate(self) -> Optional[float]:
+        return sum(self.escalations) / len(self.escalations) if self.escalations else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.request_count,
+            "median_latency": self.median_latency,
+            "p90_latency": self.p90_latency,
+            "accuracy": self.accuracy,
+            "escalation_rate": self.escalation_rate,
+        }
+
+
+class ModelRouter:
+    """
+    Wählt pro Schritt das Modell und entscheidet über die Eskalation
+
+    Jeder Schritt geht zuerst an das schnelle Modell. Die Antwort wird an das
+    große Modell eskaliert, wenn die Konfidenz unter der Schwelle liegt oder
+    die Validierung fehlschlägt. Direkt an das große Modell gehen Schritte
+    nach mehreren Fehlschlägen in Folge und solange sich die Kaskade laut
+    Statistik nicht lohnt (Eskalationen kosten mehr als das kleine Modell
+    spart oder seine Trefferquote ist zu niedrig); alle ROUTER_PROBE_INTERVAL
+    Schritte wird das kleine Modell trotzdem erneut getestet.
+
+    Die Konfidenzschwelle des kleinen Modells steigt mit jedem Fehlschlag
+    einer akzeptierten Action und sinkt langsam mit jedem Erfolg.
+    """
+
+    def __init__(self, fast_model: str = None, strong_model: str = None):
+        self.fast_model = fast_model or config.GROQ_FAST_MODEL
+        self.strong_model = strong_model or config.GROQ_MODEL
+        self.stats: Dict[str, ModelStats] = {
+            model: ModelStats(config.ROUTER_STATS_WINDOW) for model in (self.fast_model, self.strong_model)
+        }
+        self.fast_threshold = config.CONFIDENCE_THRESHOLD
+        self.consecutive_failures = 0
+        self.steps_since_probe = 0
+        self._lock = threading.Lock()
+
+    @property
+    def models(self) -> List[str]:
+        return [self.fast_model, self.strong_model]
+
+    def choose(self) -> str:
+        """
+        Modell für die erste Anfrage eines Schritts
+
+        Returns:
+            Modellname
+        """
+        with self._lock:
+            if self.consecutive_failures >= config.ROUTER_ESCALATE_AFTER_FAILURES:
+                logger.info(f"{self.consecutive_failures} Fehlschläge in Folge, verwende {self.strong_model}")
+                return self.strong_model
+
+            reason = self._cascade_unprofitable()
+            if reason is None:
+                return self.fast_model
+
+            self.steps_since_probe += 1
+            if self.steps_since_probe >= config.ROUTER_PROBE_INTERVAL:
+                self.steps_since_probe = 0
+                logger.debug(f"Teste {self.fast_model} erneut")
+                return self.fast_model
+
+            logger.debug(f"Überspringe {self.fast_model}: {reason}")
+            return self.strong_model
+
+    def _cascade_unprofitable(self) -> Optional[str]:
+        """Grund, das kleine Modell auszulassen, oder None (Lock gehalten)"""
+        fast, strong = self.stats[self.fast_model], self.stats[self.strong_model]
+        if len(fast.escalations) < config.ROUTER_MIN_SAMPLES:
+            return None
+
+        if fast.accuracy is not None and len(fast.outcomes) >= config.ROUTER_MIN_SAMPLES:
+            if fast.accuracy < config.ROUTER_MIN_ACCURACY:
+                return f"Trefferquote {fast.accuracy:.0%}"
+
+        # Erwartete Latenz der Kaskade: klein + Eskalationsrate * groß
+        if fast.median_latency is not None and strong.median_latency is not None:
+            cascade = fast.median_latency + fast.escalation_rate * strong.median_latency
+            if cascade >= strong.median_latency:
+                return (f"Kaskade {cascade * 1000:.0f} ms >= "
+                        f"{strong.median_latency * 1000:.0f} ms (Eskalationsrate {fast.escalation_rate:.0%})")
+        return None
+
+    def threshold_for(self, model: str) -> float:
+        """Konfidenzschwelle, unter der die Antwort des Modells eskaliert wird"""
+        return self.fast_threshold if model == self.fast_model else config.CONFIDENCE_THRESHOLD
+
+    def should_escalate(self, model: str, action: Optional[Dict], valid: bool) -> bool:
+        """
+        Entscheidet ob die Antwort an das große Modell weitergereicht wird
+
+        Args:
+            model: Modell, das geantwortet hat
+            action: Antwort (None bei Fehler)
+            valid: Ergebnis der Validierung
+
+        Returns:
+            True wenn das große Modell gefragt werden soll
+        """
+        if model == self.strong_model:
+            return False
+
+        escalate = (action is None or not valid or
+                    action.get("confidence", 0.0) < self.threshold_for(model))
+        with self._lock:
+            self.stats[model].escalations.append(escalate)
+        if escalate:
+            logger.info(f"Eskaliere an {self.strong_model} "
+                        f"(Konfidenz: {action.get('confidence') if action else None}, gültig: {valid})")
+        return escalate
+
+    def record_latency(self, model: str, latency: float):
+        """Speichert die Antwortzeit eines erfolgreichen Requests"""
+        with self._lock:
+            stats = self.stats.setdefault(model, ModelStats(config.ROUTER_STATS_WINDOW))
+            stats.request_count += 1
+            stats.latencies.append(latency)
+
+    def record_outcome(self, model: Optional[str], success: bool):
+        """
+        Speichert das Ergebnis einer ausgeführten Action
+
+        Args:
+            model: Modell, das die Action geliefert hat (None = unbekannt)
+            success: Action erfolgreich ausgeführt
+        """
+        with self._lock:
+            self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+            if model not in self.stats:
+                return
+            self.stats[model].outcomes.append(success)
+            if model == self.fast_model:
+                step = config.ROUTER_THRESHOLD_STEP
+                if success:
+                    self.fast_threshold = max(config.CONFIDENCE_THRESHOLD, self.fast_threshold - step / 4)
+                else:
+                    self.fast_threshold = min(config.ROUTER_MAX_THRESHOLD, self.fast_threshold + step)
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        with self._lock:
+            return {
+                "fast_threshold": round(self.fast_threshold, 3),
+                "consecutive_failures": self.consecutive_failures,
+                "models": {model: stats.to_dict() for model, stats in self.stats.items()},
+            }
+
+
+def main():
+    """Test-Funktion für den Model Router"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    import random
+
+    print("Model Router Test")
+    print("=" * 50)
+
+    router = ModelRouter()
+    random.seed(1)
+    for step in range(40):
+        model = router.choose()
+        router.record_latency(model, 0.4 if model == router.fast_model else 1.2)
+        confidence = random.uniform(0.5, 1.0)
+        if router.should_escalate(model, {"confidence": confidence}, valid=True):
+            model = router.strong_model
+            router.record_latency(model, 1.2)
+        router.record_outcome(model, random.random() < 0.9)
+
+    for model, stats in router.get_stats()["models"].items():
+        print(f"{model}: {stats}")
+    print(f"Schwelle kleines Modell: {router.fast_threshold:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Payload Builder
+Baut den JSON-Request einmal als Bytes und setzt die Base64-Bilder ohne erneute Serialisierung ein
+"""
+
+import json
+import logging
+import uuid
+from typing import Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# (Base64 Daten, MIME-Type)
+ImagePart = Tuple[Union[bytes, str], str]
+
+
+class PayloadBuilder:
+    """
+    Erstellt Request-Bodies für die Vision API
+
+    Der Request wird mit Platzhaltern statt Bilddaten serialisiert (klein und
+    schnell), danach werden die Base64-Bytes der Bilder direkt zwischen die
+    JSON-Fragmente gesetzt. Base64 enthält nur JSON-sichere Zeichen, ein
+    Escaping ist daher nicht nötig. Das Ergebnis kann bei Wiederholungen
+    unverändert erneut gesendet werden.
+    """
+
+    def __init__(self):
+        # Zufälliger Token, damit Platzhalter nicht mit Benutzertext kollidieren
+        self._token = uuid.uuid4().hex
+
+    def placeholder(self, index: int = 0) -> str:
+        """Platzhalter für die Bild-URL an Position index"""
+        return f"__image_{self._token}_{index}__"
+
+    def build(self, payload: Dict, images: List[ImagePart]) -> bytes:
+        """
+        Serialisiert den Request und setzt die Bilder ein
+
+        Args:
+            payload: Request Dictionary, Bild-URLs als placeholder(i)
+            images: Liste von (Base64 Daten, MIME-Type) in Platzhalter-Reihenfolge
+
+        Returns:
+            Fertiger Request Body (UTF-8 JSON)
+        """
+        template = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        parts = []
+        position = 0
+        for index, (data, mime_type) in enumerate(images):
+            marker = self.placeholder(index).encode("ascii")
+            marker_start = template.index(marker, position)
+            if isinstance(data, str):
+                data = data.encode("ascii")
+            parts.extend((
+                template[position:marker_start],
+                b"data:", mime_type.encode("ascii"), b";base64,",
+                data,
+            ))
+            position = marker_start + len(marker)
+        parts.append(template[position:])
+
+        body = b"".join(parts)
+        logger.debug(f"Request Body: {len(body)} Bytes ({len(images)} Bild(er))")
+        return body
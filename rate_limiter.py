@@ -0,0 +1,323 @@
+"""
+Rate Limiter
+Token Bucket für Requests und Tokens, gespeist aus den Rate-Limit-Headern der Groq API
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Prioritäten (kleiner = früher an der Reihe)
+PRIORITY_HIGH = 0     # Folge-Request eines laufenden Schritts (z.B. Zoom)
+PRIORITY_NORMAL = 1   # Normaler Schritt
+PRIORITY_LOW = 2      # Spekulative Requests
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parst Zeitangaben der Rate-Limit-Header ("7.66s", "2m59.56s", "120ms", "30")
+
+    Returns:
+        Sekunden oder None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Klassischer Token Bucket mit kontinuierlicher Auffüllung"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # pro Sekunde
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Sekunden bis amount verfügbar ist (0 wenn sofort)"""
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_rate if self.refill_rate > 0 else float("inf")
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def sync(self, remaining: Optional[int], limit: Optional[int], now: float, authoritative: bool = False):
+        """
+        Gleicht den Bucket mit dem Stand des Servers ab
+
+        Args:
+            remaining: Verbleibendes Budget laut Server
+            limit: Kapazität laut Server
+            now: Aktuelle Zeit (monotonic)
+            authoritative: Serverwert übernehmen, sonst nur nach unten korrigieren
+        """
+        self.refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(remaining, self.capacity) if authoritative else min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """
+    Plant API Requests innerhalb der Rate Limits
+
+    Vor jedem Request wartet acquire(), bis Request- und Token-Budget reichen
+    und kein Request höherer Priorität wartet. Die Budgets werden lokal
+    geschätzt und mit den x-ratelimit-* Headern jeder Antwort abgeglichen;
+    nach einem 429 pausieren alle Requests bis retry-after. Mehrere
+    Controller mit demselben API Key teilen sich eine Instanz
+    (siehe get_rate_limiter).
+    """
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None):
+        requests_per_minute = requests_per_minute or config.RATE_LIMIT_REQUESTS_PER_MINUTE
+        tokens_per_minute = tokens_per_minute or config.RATE_LIMIT_TOKENS_PER_MINUTE
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.tokens_per_request = float(config.RATE_LIMIT_ESTIMATED_TOKENS)
+        self.blocked_until = 0.0
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+        self.granted_count = 0
+        self.queued_count = 0
+        self.rate_limited_count = 0
+        self.total_wait_time = 0.0
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, timeout: float = None) -> bool:
+        """
+        Wartet auf einen freien Slot für einen Request
+
+        Args:
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL oder PRIORITY_LOW
+            timeout: Maximale Wartezeit in Sekunden (None = RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            True wenn der Request gesendet werden darf, False bei Timeout
+        """
+        timeout = config.RATE_LIMIT_MAX_WAIT if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        entry = (priority, next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None  # Nicht an der Reihe: auf Benachrichtigung warten
+                    if self._waiters[0] == entry:
+                        cost = self.tokens_per_request
+                        wait = max(self.blocked_until - now,
+                                   self.requests.time_until(1, now),
+                                   self.tokens.time_until(cost, now))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(cost)
+                            self._record_grant(start, now)
+                            return True
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        logger.warning(f"Rate Limit: kein Slot innerhalb von {timeout:.0f}s")
+                        return False
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _record_grant(self, start: float, now: float):
+        waited = now - start
+        self.granted_count += 1
+        self.total_wait_time += waited
+        if waited > 0.01:
+            self.queued_count += 1
+            logger.info(f"Rate Limit: Request nach {waited:.2f}s Wartezeit freigegeben")
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Übernimmt den Stand aus den Rate-Limit-Headern einer Antwort
+
+        Args:
+            headers: Response Header (Groq: x-ratelimit-limit/remaining/reset-requests/tokens)
+        """
+        now = time.monotonic()
+        with self._cond:
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = _parse_int(headers.get(f"x-ratelimit-remaining-{kind}"))
+                if remaining is None:
+                    continue
+                # limit-requests ist ein Tageslimit: der Request-Bucket bleibt das lokale
+                # Minutenlimit und wird nur nach unten korrigiert. Das Token-Limit gilt pro
+                # Minute, dort ist der Serverstand maßgeblich (statt der lokalen Schätzung).
+                tokens = kind == "tokens"
+                limit = _parse_int(headers.get(f"x-ratelimit-limit-{kind}")) if tokens else None
+                if limit:
+                    bucket.refill_rate = limit / 60.0
+                bucket.sync(remaining, limit, now, authoritative=tokens)
+
+                needed = self.tokens_per_request if tokens else 1
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if remaining < needed and reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+                    logger.info(f"Rate Limit: {kind}-Budget erschöpft, Pause {reset:.1f}s")
+            self._cond.notify_all()
+
+    def on_rate_limited(self, headers: Mapping[str, str] = None, attempt: int = 0) -> float:
+        """
+        Verarbeitet eine 429-Antwort und pausiert alle Requests
+
+        Args:
+            headers: Response Header (retry-after wird beachtet)
+            attempt: Anzahl der bisherigen 429 für diesen Request
+
+        Returns:
+            Pause in Sekunden
+        """
+        headers = headers or {}
+        retry_after = parse_duration(headers.get("retry-after"))
+        delay = self.backoff_delay(attempt, retry_after)
+        with self._cond:
+            self.rate_limited_count += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        self.update_from_headers(headers)
+        logger.warning(f"Rate Limit erreicht (429), pausiere {delay:.1f}s")
+        return delay
+
+    def record_usage(self, total_tokens: Optional[int]):
+        """Verfeinert die Kostenschätzung pro Request aus usage.total_tokens"""
+        if not total_tokens:
+            return
+        with self._cond:
+            self.tokens_per_request += 0.2 * (total_tokens - self.tokens_per_request)
+
+    @staticmethod
+    def backoff_delay(attempt: int, retry_after: float = None) -> float:
+        """
+        Exponentielles Backoff mit Jitter
+
+        Mit retry-after wird mindestens so lange gewartet (plus etwas Jitter,
+        damit nicht alle Clients gleichzeitig neu starten), sonst "full jitter"
+        zwischen 0 und BASE * 2^attempt (gedeckelt).
+
+        Args:
+            attempt: Anzahl der bisherigen Fehlversuche (ab 0)
+            retry_after: Vom Server verlangte Pause in Sekunden
+
+        Returns:
+            Pause in Sekunden
+        """
+        cap = min(config.RATE_LIMIT_BACKOFF_MAX, config.RATE_LIMIT_BACKOFF_BASE * (2 ** attempt))
+        if retry_after is not None:
+            return retry_after + random.uniform(0, config.RATE_LIMIT_BACKOFF_BASE)
+        return random.uniform(config.RATE_LIMIT_BACKOFF_BASE / 2, cap)
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "granted": self.granted_count,
+                "queued": self.queued_count,
+                "rate_limited": self.rate_limited_count,
+                "average_wait": self.total_wait_time / max(self.granted_count, 1),
+                "requests_available": round(self.requests.tokens, 1),
+                "tokens_available": round(self.tokens.tokens),
+                "tokens_per_request": round(self.tokens_per_request),
+                "waiting": len(self._waiters),
+            }
+
+
+# API Key -> gemeinsamer Rate Limiter aller Handler im Prozess
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str) -> RateLimiter:
+    """Gemeinsamer Rate Limiter für einen API Key"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(api_key)
+        if limiter is None:
+            limiter = _rate_limiters[api_key] = RateLimiter()
+        return limiter
+
+
+def main():
+    """Test-Funktion für den Rate Limiter"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Rate Limiter Test")
+    print("=" * 50)
+
+    limiter = RateLimiter(requests_per_minute=120, tokens_per_minute=60000)
+    order = []
+
+    def worker(name: str, priority: int):
+        limiter.acquire(priority)
+        order.append(name)
+
+    # Budget leeren, dann warten Requests mit unterschiedlicher Priorität
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "0",
+                                 "x-ratelimit-reset-requests": "1s"})
+    threads = [threading.Thread(target=worker, args=(f"{label}-{i}", priority))
+               for i in range(2) for label, priority in (("niedrig", PRIORITY_LOW),
+                                                         ("normal", PRIORITY_NORMAL),
+                                                         ("hoch", PRIORITY_HIGH))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Reihenfolge: {order}")
+    print(f"Backoff-Beispiele: {[round(limiter.backoff_delay(a), 2) for a in range(5)]}")
+    print(f"Mit retry-after=3: {limiter.backoff_delay(0, 3.0):.2f}s")
+    print(f"\nStatistiken: {limiter.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Request Hedger
+Doppelte Requests gegen langsame Antworten: nach dem p90 der letzten Latenzen wird ein zweiter gestartet
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RequestHedger:
+    """
+    Führt Requests aus und startet bei Verzögerung ein Duplikat
+
+    Antwortet ein Request nicht innerhalb des HEDGE_PERCENTILE der zuletzt
+    gemessenen Latenzen (pro Schlüssel, z.B. Modell), wird derselbe Request
+    ein zweites Mal gesendet und die erste brauchbare Antwort verwendet. Die
+    Antwort des Verlierers wird verworfen (on_discard, z.B. Verbindung
+    schließen). Die Zahl der Duplikate ist auf HEDGE_MAX_RATE der Requests
+    begrenzt, damit die Last nicht verdoppelt wird.
+
+    Verlierer laufen bis zu ihrer Antwort weiter. Der Thread Pool ist daher
+    doppelt so groß wie HTTP_POOL_SIZE, und Duplikate gibt es nur, solange
+    weniger als HTTP_POOL_SIZE Requests laufen: für neue Requests bleibt
+    immer ein freier Worker, statt hinter langsamen Verlierern zu warten.
+    """
+
+    def __init__(self, percentile: float = None, max_rate: float = None):
+        self.percentile = config.HEDGE_PERCENTILE if percentile is None else percentile
+        self.max_rate = config.HEDGE_MAX_RATE if max_rate is None else max_rate
+        self.latencies: Dict[Optional[str], Deque[float]] = {}
+
+        self.max_in_flight = config.HTTP_POOL_SIZE
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.max_in_flight, thread_name_prefix="GroqHedge")
+        self._lock = threading.Lock()
+        self.in_flight = 0  # Laufende Requests inklusive Verlierer
+
+        self.request_count = 0
+        self.hedged_count = 0
+        self.hedge_wins = 0
+        self.saturated_count = 0
+
+    def hedge_delay(self, key: str = None) -> Optional[float]:
+        """
+        Wartezeit bis zum Duplikat
+
+        Returns:
+            Sekunden oder None (zu wenige Messwerte)
+        """
+        with self._lock:
+            samples = self.latencies.get(key)
+            if not samples or len(samples) < config.HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        index = min(int(len(ordered) * self.percentile), len(ordered) - 1)
+        return max(ordered[index], config.HEDGE_MIN_DELAY)
+
+    def _record_latency(self, key: Optional[str], latency: float):
+        with self._lock:
+            samples = self.latencies.get(key)
+            if samples is None:
+                samples = self.latencies[key] = deque(maxlen=config.HEDGE_WINDOW)
+            samples.append(latency)
+
+    def _take_hedge_budget(self) -> bool:
+        with self._lock:
+            if self.hedged_count + 1 > self.max_rate * self.request_count:
+                return False
+            if self.in_flight >= self.max_in_flight:
+                # Zu viele laufende Requests (z.B. langsame Verlierer): kein weiteres Duplikat
+                self.saturated_count += 1
+                return False
+            self.hedged_count += 1
+            return True
+
+    def _submit(self, call: Callable[[], T], key: Optional[str]) -> Future:
+        start = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+        def timed():
+            try:
+                result = call()
+                self._record_latency(key, time.perf_counter() - start)
+                return result
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+        future = self._executor.submit(timed)
+        future.add_done_callback(self._on_cancelled)
+        return future
+
+    def _on_cancelled(self, future: Future):
+        """Abgebrochene (nie gestartete) Requests zählen nicht mehr als laufend"""
+        if future.cancelled():
+            with self._lock:
+                self.in_flight -= 1
+
+    def run(self, call: Callable[[], T], key: str = None,
+            accept: Callable[[T], bool] = None,
+            before_hedge: Callable[[], bool] = None,
+            on_discard: Callable[[T], None] = None) -> T:
+        """
+        Führt call aus, bei Verzögerung zusätzlich ein Duplikat
+
+        Args:
+            call: Sendet den Request und gibt die Antwort zurück
+            key: Schlüssel für die Latenzstatistik (z.B. Modell)
+            accept: Prüft ob eine Antwort brauchbar ist (sonst wird auf die andere gewartet)
+            before_hedge: Wird vor dem Duplikat aufgerufen, False verhindert es (z.B. Rate Limit)
+            on_discard: Erhält die Antwort des Verlierers
+
+        Returns:
+            Antwort des schnelleren Requests (Exceptions werden weitergereicht)
+        """
+        with self._lock:
+            self.request_count += 1
+
+        primary = self._submit(call, key)
+        delay = self.hedge_delay(key)
+        if delay is None or wait([primary], timeout=delay).done:
+            return primary.result()
+
+        if not self._take_hedge_budget():
+            return primary.result()
+        if before_hedge is not None and not before_hedge():
+            with self._lock:
+                self.hedged_count -= 1
+            return primary.result()
+
+        logger.info(f"Keine Antwort nach {delay * 1000:.0f} ms, sende Duplikat")
+        hedge = self._submit(call, key)
+        pending = {primary, hedge}
+        fallback: Optional[Future] = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and (accept is None or accept(future.result())):
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                        logger.info("Duplikat war schneller")
+                    for loser in pending | ({fallback} if fallback else set()):
+                        self._discard(loser, on_discard)
+                    return future.result()
+                if fallback is None:
+                    fallback = future
+                else:
+                    self._discard(future, on_discard)
+
+        # Keine brauchbare Antwort: die des ursprünglichen Requests zählt
+        return fallback.result()
+
+    @staticmethod
+    def _discard(future: Future, on_discard: Optional[Callable]):
+        """Verwirft die Antwort eines Verlierers (noch laufend: bei Eintreffen)"""
+        if future.cancel() or on_discard is None:
+            return
+
+        def discard(finished: Future):
+            if finished.exception() is None:
+                try:
+                    on_discard(finished.result())
+                except Exception as e:
+                    logger.debug(f"Verwerfen der Antwort fehlgeschlagen: {e}")
+
+        future.add_done_callback(discard)
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        with self._lock:
+            request_count, hedged_count, hedge_wins = self.request_count, self.hedged_count, self.hedge_wins
+        return {
+            "requests": request_count,
+            "hedged": hedged_count,
+            "hedge_wins": hedge_wins,
+            "hedge_rate": hedged_count / max(request_count, 1),
+            "in_flight": self.in_flight,
+            "skipped_saturated": self.saturated_count,
+            "hedge_delays": {key: self.hedge_delay(key) for key in list(self.latencies)},
+        }
+
+
+def main():
+    """Test-Funktion für den Request Hedger"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    import random
+
+    print("Request Hedger Test")
+    print("=" * 50)
+
+    def slow_call() -> float:
+        # 95% schnell, 5% sehr langsam
+        latency = 2.0 if random.random() < 0.05 else random.uniform(0.05, 0.1)
+        time.sleep(latency)
+        return latency
+
+    hedger = RequestHedger()
+    random.seed(3)
+    durations = []
+    for _ in range(60):
+        start = time.perf_counter()
+        hedger.run(slow_call)
+        durations.append(time.perf_counter() - start)
+
+    durations.sort()
+    print(f"Median: {durations[len(durations) // 2] * 1000:.0f} ms, "
+          f"Max: {durations[-1] * 1000:.0f} ms")
+    print(f"\nStatistiken: {hedger.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,140 @@ Verwaltet Screenshot-Erstellung und Base64-Encoding für Groq Vision API
 
 import base64
 import io
+import threading
 import time
-from typing import Tuple, Optional
-from PIL import Image, ImageGrab
+from dataclasses import dataclass
+from typing import Dict, Tuple, Optional, Union
+import numpy as np
+from PIL import Image
 import logging
 
 import config
+from capture_backends import CaptureBackend, create_capture_backend
+from image_encoder import AdaptiveEncoder
+from frame import Frame, fit_size
+from metrics import get_registry
 
 logger = logging.getLogger(__name__)
 
+# Ergebnisse der Änderungserkennung
+CHANGE_UNCHANGED = "unchanged"
+CHANGE_MINOR = "minor"
+CHANGE_MAJOR = "major"
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Erstellt die orthonormale DCT-II Matrix der Größe n x n"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+class Viewport:
+    """
+    Abbildung zwischen Bildkoordinaten und Bildschirmkoordinaten
+
+    Beschreibt welchen Bildschirmbereich (left, top, right, bottom) ein an die
+    API gesendetes Bild der Größe image_size zeigt.
+    """
+
+    def __init__(self, screen_box: Tuple[int, int, int, int], image_size: Tuple[int, int]):
+        self.screen_box = screen_box
+        self.image_size = image_size
+        left, top, right, bottom = screen_box
+        self.scale_x = (right - left) / max(image_size[0], 1)
+        self.scale_y = (bottom - top) / max(image_size[1], 1)
+
+    def to_screen(self, x: float, y: float) -> Tuple[int, int]:
+        """Rechnet Bildkoordinaten in Bildschirmkoordinaten um"""
+        left, top, _, _ = self.screen_box
+        return int(round(left + x * self.scale_x)), int(round(top + y * self.scale_y))
+
+    def box_to_screen(self, x: float, y: float, width: float, height: float) -> Tuple[int, int, int, int]:
+        """Rechnet einen Bildbereich in einen Bildschirmbereich um"""
+        left, top = self.to_screen(x, y)
+        right, bottom = self.to_screen(x + width, y + height)
+        return left, top, right, bottom
+
+    def map_action(self, action: Dict) -> Dict:
+        """
+        Rechnet die Koordinaten einer Action auf den Bildschirm um
+
+        Args:
+            action: Action Dictionary mit Koordinaten im Bild
+
+        Returns:
+            Neues Action Dictionary mit Bildschirmkoordinaten
+        """
+        # Folgeschritte eines Plans beziehen sich auf dasselbe Bild
+        if isinstance(action.get("plan"), list):
+            action = dict(action, plan=[self.map_action(step) for step in action["plan"]])
+
+        if action.get("action") not in config.COORDINATE_ACTIONS:
+            return action
+
+        parameters = action.get("parameters")
+        if not isinstance(parameters, dict):
+            return action
+
+        try:
+            x, y = float(parameters["x"]), float(parameters["y"])
+        except (KeyError, TypeError, ValueError):
+            # Ungültige Koordinaten werden später vom ActionExecutor abgelehnt
+            return action
+
+        screen_x, screen_y = self.to_screen(x, y)
+        if (screen_x, screen_y) != (x, y):
+            logger.debug(f"Koordinaten umgerechnet: ({x:.0f}, {y:.0f}) -> ({screen_x}, {screen_y})")
+
+        mapped = dict(action)
+        mapped["parameters"] = dict(parameters, x=screen_x, y=screen_y)
+        return mapped
+
+
+@dataclass
+class CapturedFrame:
+    """Momentaufnahme eines encodierten Screenshots mit allen Metadaten"""
+    base64_image: bytes
+    mime_type: str
+    viewport: Viewport
+    source: Frame
+    change: Optional[str]
+    generation: int
+    captured_at: float
+    image_hash: Optional[int] = None  # pHash für den Decision Cache
+
 
 class ScreenshotHandler:
     """Verwaltet Screenshot-Erfassung und -Verarbeitung"""
 
-    def __init__(self):
+    def __init__(self, backend: CaptureBackend = None):
+        self.backend = backend or create_capture_backend()
+        # Schützt den Zustand bei Zugriff aus dem Hintergrund-Capture-Thread
+        self.lock = threading.RLock()
+        self.encoder = AdaptiveEncoder()
+        self.last_mime_type = "image/jpeg"
+        self.last_viewport = None  # Viewport des zuletzt encodierten Bildes
+        self.zoom_count = 0
         self.last_screenshot_time = 0
         self.last_screenshot = None
+        self.last_frame = None
         self.screenshot_count = 0
+        self.metrics = get_registry()
+
+        # Zustand der Änderungserkennung
+        self.last_change = None
+        self.last_change_ratio = 0.0
+        self.last_hash_distance = 0
+        self.last_base64 = None
+        self._last_base64_mime = None
+        self._last_base64_viewport = None
+        self.change_counts = {CHANGE_UNCHANGED: 0, CHANGE_MINOR: 0, CHANGE_MAJOR: 0}
+        self._previous_hash = None
+        self._previous_diff = None
+        self._dct = {}  # Kantenlänge der Stichprobe -> DCT-Matrix
 
     def capture_screenshot(self) -> Optional[Image.Image]:
         """
@@ -31,10 +148,11 @@ class ScreenshotHandler:
             PIL Image oder None bei Fehler
         """
         try:
-            screenshot = ImageGrab.grab()
+            screenshot = self.backend.grab()
             self.screenshot_count += 1
-            self.last_screenshot = screenshot
             self.last_screenshot_time = time.time()
+            self.last_frame = Frame(screenshot, self.last_screenshot_time)
+            self.last_screenshot = screenshot = self.last_frame.image
 
             logger.debug(f"Screenshot #{self.screenshot_count} erstellt: {screenshot.size}")
             return screenshot
@@ -43,12 +161,16 @@ class ScreenshotHandler:
             logger.error(f"Fehler beim Erstellen des Screenshots: {e}")
             return None
 
-    def resize_screenshot(self, image: Image.Image, max_size: Tuple[int, int] = None) -> Image.Image:
+    def resize_screenshot(self, image: Union[Image.Image, Frame],
+                          max_size: Tuple[int, int] = None) -> Image.Image:
         """
         Verkleinert das Bild wenn nötig
 
+        Für einen Frame wird die gemeinsam genutzte Pyramidenstufe verwendet,
+        das Original bleibt in jedem Fall unverändert (für Zoom-Ausschnitte).
+
         Args:
-            image: PIL Image
+            image: PIL Image oder Frame
             max_size: Maximale Größe (width, height)
 
         Returns:
@@ -57,84 +179,334 @@ class ScreenshotHandler:
         if max_size is None:
             max_size = config.SCREENSHOT_MAX_SIZE
 
-        # Berechne neues Seitenverhältnis
-        if image.width > max_size[0] or image.height > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            logger.debug(f"Screenshot verkleinert auf: {image.size}")
+        if isinstance(image, Frame):
+            resized = image.downscaled(max_size)
+        else:
+            # Berechne neues Seitenverhältnis
+            new_size = fit_size(image.size, max_size)
+            resized = image if new_size == image.size else image.resize(new_size, Image.Resampling.LANCZOS)
 
-        return image
+        if resized.size != image.size:
+            logger.debug(f"Screenshot verkleinert auf: {resized.size}")
+        return resized
 
     def image_to_base64(self, image: Image.Image, quality: int = None) -> str:
         """
         Konvertiert PIL Image zu Base64 String
 
+        Ohne explizite Qualität wählt der adaptive Encoder Format und Qualität
+        passend zum Byte-Budget (config.ENCODER_ADAPTIVE). Der MIME-Type des
+        Ergebnisses steht danach in self.last_mime_type.
+
         Args:
             image: PIL Image
-            quality: JPEG Qualität (0-100)
+            quality: JPEG Qualität (0-100), erzwingt JPEG
 
         Returns:
             Base64 encoded String
         """
         if quality is None:
-            quality = config.SCREENSHOT_QUALITY
+            return self.image_to_base64_bytes(image).decode('ascii')
 
         try:
-            # Konvertiere zu RGB falls nötig (für JPEG)
-            if image.mode in ('RGBA', 'P'):
-                rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                rgb_image.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = rgb_image
+            data = self._encode_jpeg(image, quality)
+            self.last_mime_type = "image/jpeg"
+            return base64.b64encode(data).decode('ascii')
+        except Exception as e:
+            logger.error(f"Fehler beim Base64 Encoding: {e}")
+            raise
+
+    def image_to_base64_bytes(self, image: Image.Image) -> bytes:
+        """
+        Encodiert ein Bild zu Base64 Bytes (adaptiv oder als JPEG)
 
-            # Speichere als JPEG in BytesIO
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG', quality=quality, optimize=True)
-            buffer.seek(0)
+        Im Gegensatz zu image_to_base64 entsteht kein str; die Bytes werden
+        vom PayloadBuilder unverändert in den Request eingesetzt.
 
-            # Encode zu Base64
-            base64_string = base64.b64encode(buffer.read()).decode('utf-8')
+        Args:
+            image: PIL Image
 
-            logger.debug(f"Base64 String Länge: {len(base64_string)} Zeichen")
-            return base64_string
+        Returns:
+            Base64 encoded Bytes
+        """
+        try:
+            if config.ENCODER_ADAPTIVE:
+                encoded = self.encoder.encode(image)
+                data = encoded.data
+                self.last_mime_type = encoded.mime_type
+            else:
+                data = self._encode_jpeg(image, config.SCREENSHOT_QUALITY)
+                self.last_mime_type = "image/jpeg"
+
+            base64_data = base64.b64encode(data)
+            logger.debug(f"Base64 Länge: {len(base64_data)} Bytes ({self.last_mime_type})")
+            return base64_data
 
         except Exception as e:
             logger.error(f"Fehler beim Base64 Encoding: {e}")
             raise
 
-    def capture_and_encode(self) -> Optional[str]:
+    def _encode_jpeg(self, image: Image.Image, quality: int) -> bytes:
+        """Encodiert ein Bild als JPEG mit fester Qualität"""
+        # Konvertiere zu RGB falls nötig (für JPEG)
+        if image.mode in ('RGBA', 'P'):
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            rgb_image.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+            image = rgb_image
+
+        # Speichere als JPEG in BytesIO
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    def capture_frame(self, generation: int = 0) -> Optional[CapturedFrame]:
         """
-        Erstellt Screenshot und gibt Base64 String zurück
+        Erstellt und encodiert einen Screenshot als zusammenhängende Momentaufnahme
+
+        Args:
+            generation: Generation des Aufrufers (siehe CaptureWorker)
+
+        Returns:
+            CapturedFrame oder None bei Fehler
+        """
+        with self.lock:
+            captured_at = time.time()
+            base64_string = self.capture_and_encode()
+            if base64_string is None:
+                return None
+            image_hash = None
+            if config.DECISION_CACHE_ENABLED:
+                bits = self.compute_perceptual_hash(self.last_frame, config.DECISION_CACHE_HASH_SIZE)
+                image_hash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+            return CapturedFrame(
+                base64_image=base64_string,
+                mime_type=self.last_mime_type,
+                viewport=self.last_viewport,
+                source=self.last_frame,
+                change=self.last_change,
+                generation=generation,
+                captured_at=captured_at,
+                image_hash=image_hash
+            )
+
+    def capture_and_encode(self, max_size: Tuple[int, int] = None) -> Optional[bytes]:
+        """
+        Erstellt Screenshot und gibt die Base64 Bytes zurück
+
+        Ist der Bildschirm seit dem letzten Aufruf unverändert, wird das
+        zuletzt erzeugte Encoding ohne erneutes Encoding zurückgegeben.
+        Im Zoom-Modus wird eine Übersicht mit OVERVIEW_MAX_SIZE erzeugt.
+
+        Args:
+            max_size: Maximale Größe des gesendeten Bildes
 
         Returns:
-            Base64 encoded Screenshot oder None bei Fehler
+            Base64 encoded Screenshot (Bytes) oder None bei Fehler
         """
-        screenshot = self.capture_screenshot()
+        if max_size is None:
+            max_size = config.OVERVIEW_MAX_SIZE if config.ZOOM_MODE_ENABLED else config.SCREENSHOT_MAX_SIZE
+
+        with self.lock:
+            return self._capture_and_encode(max_size)
+
+    def _capture_and_encode(self, max_size: Tuple[int, int]) -> Optional[bytes]:
+        """Ablauf von capture_and_encode (Lock wird vom Aufrufer gehalten)"""
+        with self.metrics.time("stage_seconds", stage="grab"):
+            screenshot = self.capture_screenshot()
         if screenshot is None:
             return None
+        frame = self.last_frame
+
+        # Vergleiche mit dem vorherigen Screenshot
+        if config.CHANGE_DETECTION_ENABLED:
+            change = self.detect_change(frame)
+            if change == CHANGE_UNCHANGED and self.last_base64 is not None:
+                logger.debug("Bildschirm unverändert, verwende letztes Encoding")
+                self.last_mime_type = self._last_base64_mime
+                self.last_viewport = self._last_base64_viewport
+                return self.last_base64
 
         # Verkleinere falls nötig
-        screenshot = self.resize_screenshot(screenshot)
+        with self.metrics.time("stage_seconds", stage="resize"):
+            resized = self.resize_screenshot(frame, max_size)
 
         # Encode zu Base64
         try:
-            base64_string = self.image_to_base64(screenshot)
+            with self.metrics.time("stage_seconds", stage="encode"):
+                base64_string = self.image_to_base64_bytes(resized)
+            self.last_viewport = Viewport((0, 0, frame.width, frame.height), resized.size)
+            self.last_base64 = base64_string
+            self._last_base64_mime = self.last_mime_type
+            self._last_base64_viewport = self.last_viewport
             return base64_string
         except Exception as e:
             logger.error(f"Fehler beim Encoding: {e}")
             return None
 
-    def save_screenshot(self, filename: str, image: Image.Image = None) -> bool:
+    def encode_zoom_region(self, region: Dict, source: Frame = None,
+                           viewport: Viewport = None) -> Optional[Tuple[bytes, str, Viewport]]:
+        """
+        Erstellt einen hochauflösenden Ausschnitt eines Screenshots
+
+        Die Region wird in Koordinaten des gesendeten Bildes (Übersicht)
+        angegeben. Der zurückgegebene Viewport beschreibt den Ausschnitt, sodass
+        Koordinaten der folgenden Antwort korrekt umgerechnet werden können.
+
+        Args:
+            region: Dictionary mit x, y, width, height
+            source: Frame in voller Auflösung (Standard: letzter Frame)
+            viewport: Viewport der Übersicht (Standard: letzter Viewport)
+
+        Returns:
+            (Base64 Bytes, MIME-Type, Viewport) oder None bei Fehler
+        """
+        with self.lock:
+            screen = source or self.last_frame
+            viewport = viewport or self.last_viewport
+            if screen is None or viewport is None:
+                logger.error("Kein Screenshot für Zoom vorhanden")
+                return None
+
+            try:
+                x, y = float(region["x"]), float(region["y"])
+                width, height = float(region["width"]), float(region["height"])
+            except (KeyError, TypeError, ValueError):
+                logger.error(f"Ungültiger Zoom-Bereich: {region}")
+                return None
+
+            left, top, right, bottom = viewport.box_to_screen(x, y, width, height)
+
+            # Mindestgröße um den Mittelpunkt herum erzwingen, dann auf den Bildschirm begrenzen
+            min_width = min(config.ZOOM_MIN_REGION[0], screen.width)
+            min_height = min(config.ZOOM_MIN_REGION[1], screen.height)
+            if right - left < min_width:
+                center = (left + right) // 2
+                left, right = center - min_width // 2, center + (min_width - min_width // 2)
+            if bottom - top < min_height:
+                center = (top + bottom) // 2
+                top, bottom = center - min_height // 2, center + (min_height - min_height // 2)
+
+            shift_x = max(0, -left) - max(0, right - screen.width)
+            shift_y = max(0, -top) - max(0, bottom - screen.height)
+            left, right = max(0, left + shift_x), min(screen.width, right + shift_x)
+            top, bottom = max(0, top + shift_y), min(screen.height, bottom + shift_y)
+
+            crop = self.resize_screenshot(screen.crop((left, top, right, bottom)), config.ZOOM_MAX_SIZE)
+
+            try:
+                base64_string = self.image_to_base64_bytes(crop)
+            except Exception as e:
+                logger.error(f"Fehler beim Encoding des Zoom-Ausschnitts: {e}")
+                return None
+
+            self.zoom_count += 1
+            logger.info(f"Zoom-Ausschnitt: ({left}, {top}, {right}, {bottom}) -> {crop.size}")
+            return base64_string, self.last_mime_type, Viewport((left, top, right, bottom), crop.size)
+
+    def compute_perceptual_hash(self, image: Union[Image.Image, Frame],
+                                hash_size: int = None) -> np.ndarray:
+        """
+        Berechnet einen DCT-basierten Perceptual Hash (pHash)
+
+        Args:
+            image: PIL Image oder Frame
+            hash_size: Kantenlänge des Hashes (Standard: CHANGE_HASH_SIZE)
+
+        Returns:
+            Bool-Array mit hash_size² Bits
+        """
+        frame = image if isinstance(image, Frame) else Frame(image)
+        hash_size = hash_size or config.CHANGE_HASH_SIZE
+        sample_size = hash_size * 4
+
+        pixels = frame.gray_array((sample_size, sample_size), np.float32)
+        matrix = self._dct.get(sample_size)
+        if matrix is None:
+            matrix = self._dct[sample_size] = _dct_matrix(sample_size)
+
+        # 2D-DCT, nur die niedrigen Frequenzen sind für die Struktur relevant
+        dct = matrix @ pixels @ matrix.T
+        low = dct[:hash_size, :hash_size].flatten()
+
+        # Median ohne DC-Anteil, damit die Helligkeit das Ergebnis nicht dominiert
+        median = np.median(low[1:])
+        return low > median
+
+    def detect_change(self, image: Union[Image.Image, Frame]) -> str:
+        """
+        Vergleicht einen Screenshot mit dem vorherigen
+
+        Der pHash erkennt strukturelle Änderungen (Fensterwechsel, neue Dialoge),
+        der Pixelvergleich auf einer verkleinerten Graustufen-Version erkennt
+        auch kleine Änderungen wie eingegebenen Text.
+
+        Args:
+            image: PIL Image oder Frame (volle Auflösung)
+
+        Returns:
+            CHANGE_UNCHANGED, CHANGE_MINOR oder CHANGE_MAJOR
+        """
+        frame = image if isinstance(image, Frame) else Frame(image)
+        # Erst die größere Vergleichsansicht, der pHash wird dann aus ihr abgeleitet
+        current_diff = frame.gray_array(config.CHANGE_DIFF_SIZE)
+        current_hash = self.compute_perceptual_hash(frame)
+
+        if self._previous_hash is None:
+            change = CHANGE_MAJOR
+            self.last_hash_distance = current_hash.size
+            self.last_change_ratio = 1.0
+        else:
+            self.last_hash_distance = int(np.count_nonzero(current_hash != self._previous_hash))
+            changed = np.abs(current_diff - self._previous_diff) > config.CHANGE_PIXEL_TOLERANCE
+            self.last_change_ratio = float(np.count_nonzero(changed)) / changed.size
+
+            if (self.last_hash_distance >= config.CHANGE_MAJOR_HASH_DISTANCE or
+                    self.last_change_ratio >= config.CHANGE_MAJOR_RATIO):
+                change = CHANGE_MAJOR
+            elif (self.last_hash_distance > 0 or
+                    self.last_change_ratio > config.CHANGE_UNCHANGED_RATIO):
+                change = CHANGE_MINOR
+            else:
+                change = CHANGE_UNCHANGED
+
+        self._previous_hash = current_hash
+        self._previous_diff = current_diff
+        self.last_change = change
+        self.change_counts[change] += 1
+
+        logger.debug(
+            f"Änderungserkennung: {change} (Pixel: {self.last_change_ratio:.4f}, "
+            f"Hash-Distanz: {self.last_hash_distance})"
+        )
+        return change
+
+    def reset_change_detection(self):
+        """Setzt die Änderungserkennung zurück (z.B. bei neuem Task)"""
+        with self.lock:
+            self.last_change = None
+            self.last_change_ratio = 0.0
+            self.last_hash_distance = 0
+            self.last_base64 = None
+            self._last_base64_mime = None
+            self._last_base64_viewport = None
+            self._previous_hash = None
+            self._previous_diff = None
+
+    def save_screenshot(self, filename: str, image: Union[Image.Image, Frame] = None) -> bool:
         """
         Speichert Screenshot als Datei
 
         Args:
             filename: Pfad zur Zieldatei
-            image: PIL Image (verwendet letzten Screenshot wenn None)
+            image: PIL Image oder Frame (verwendet letzten Screenshot wenn None)
 
         Returns:
             True bei Erfolg, False bei Fehler
         """
         if image is None:
             image = self.last_screenshot
+        elif isinstance(image, Frame):
+            image = image.image
 
         if image is None:
             logger.error("Kein Screenshot zum Speichern vorhanden")
@@ -150,13 +522,16 @@ class ScreenshotHandler:
 
     def get_screen_size(self) -> Tuple[int, int]:
         """
-        Gibt die aktuelle Bildschirmauflösung zurück
+        Gibt die aktuelle Bildschirmauflösung zurück (vom Backend gecacht)
 
         Returns:
             (width, height) Tupel
         """
-        screenshot = ImageGrab.grab()
-        return screenshot.size
+        return self.backend.get_screen_size()
+
+    def close(self):
+        """Gibt das Capture-Backend frei"""
+        self.backend.close()
 
     def should_capture(self) -> bool:
         """
@@ -168,22 +543,31 @@ class ScreenshotHandler:
         time_since_last = time.time() - self.last_screenshot_time
         return time_since_last >= config.SCREENSHOT_INTERVAL
 
-    def annotate_screenshot(self, image: Image.Image, x: int, y: int,
-                           color: str = 'red', radius: int = 10) -> Image.Image:
+    def annotate_screenshot(self, image: Union[Image.Image, Frame], x: int, y: int,
+                           color: str = 'red', radius: int = 10,
+                           max_size: Tuple[int, int] = None) -> Image.Image:
         """
         Markiert eine Position auf dem Screenshot (für Debugging)
 
         Args:
-            image: PIL Image
-            x, y: Koordinaten
+            image: PIL Image oder Frame
+            x, y: Koordinaten (Bildschirm)
             color: Farbe der Markierung
             radius: Radius des Markers
+            max_size: Bei einem Frame auf dieser Pyramidenstufe zeichnen statt
+                die volle Auflösung zu kopieren
 
         Returns:
             Annotiertes PIL Image
         """
         from PIL import ImageDraw
 
+        if isinstance(image, Frame):
+            base = image.downscaled(max_size) if max_size else image.image
+            scale = base.width / image.width
+            x, y = int(x * scale), int(y * scale)
+            image = base
+
         annotated = image.copy()
         draw = ImageDraw.Draw(annotated)
 
@@ -0,0 +1,155 @@
+"""
+Settle Detector
+Erkennt wann sich der Bildschirm nach einer Aktion beruhigt hat (ersetzt feste Pausen)
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+import numpy as np
+
+import config
+from capture_backends import CaptureBackend
+from frame import Frame
+
+logger = logging.getLogger(__name__)
+
+
+class SettleDetector:
+    """
+    Pollt stark verkleinerte Screenshots und vergleicht aufeinanderfolgende Frames
+
+    wait_until_stable kehrt zurück, sobald der Bildschirm für SETTLE_STABLE_POLLS
+    Abfragen in Folge unverändert war, spätestens nach dem Timeout.
+    wait_until_changed kehrt bei der ersten Änderung zurück.
+    """
+
+    def __init__(self, backend: CaptureBackend):
+        self.backend = backend
+
+        self.settle_count = 0
+        self.settle_timeouts = 0
+        self.total_settle_time = 0.0
+
+    def sample(self) -> np.ndarray:
+        """
+        Erstellt einen verkleinerten Graustufen-Frame
+
+        Returns:
+            Array (int16) in SETTLE_SAMPLE_SIZE
+        """
+        return Frame(self.backend.grab()).gray_array(config.SETTLE_SAMPLE_SIZE)
+
+    @staticmethod
+    def frames_differ(previous: np.ndarray, current: np.ndarray) -> bool:
+        """Prüft ob sich zwei Frames mehr als die Toleranz unterscheiden"""
+        changed = np.abs(current - previous) > config.SETTLE_PIXEL_TOLERANCE
+        return np.count_nonzero(changed) > changed.size * config.SETTLE_CHANGE_RATIO
+
+    def wait_until_stable(self, timeout: float = None, stable_polls: int = None,
+                          poll_interval: float = None) -> bool:
+        """
+        Wartet bis der Bildschirm stabil ist
+
+        Args:
+            timeout: Maximale Wartezeit in Sekunden
+            stable_polls: Anzahl unveränderter Abfragen in Folge
+            poll_interval: Abstand zwischen den Abfragen in Sekunden
+
+        Returns:
+            True wenn stabil, False bei Timeout
+        """
+        timeout = config.SETTLE_TIMEOUT if timeout is None else timeout
+        stable_polls = stable_polls or config.SETTLE_STABLE_POLLS
+        poll_interval = config.SETTLE_POLL_INTERVAL if poll_interval is None else poll_interval
+
+        start = time.monotonic()
+        deadline = start + timeout
+        stable = 0
+        previous = self.sample()
+
+        while stable < stable_polls:
+            if time.monotonic() + poll_interval > deadline:
+                self._record(start, settled=False)
+                logger.debug(f"Bildschirm nach {timeout:.1f}s nicht stabil")
+                return False
+
+            time.sleep(poll_interval)
+            current = self.sample()
+            stable = 0 if self.frames_differ(previous, current) else stable + 1
+            previous = current
+
+        self._record(start, settled=True)
+        return True
+
+    def wait_until_changed(self, timeout: float = None, poll_interval: float = None,
+                           reference: Optional[np.ndarray] = None) -> bool:
+        """
+        Wartet bis sich der Bildschirm ändert
+
+        Args:
+            timeout: Maximale Wartezeit in Sekunden
+            poll_interval: Abstand zwischen den Abfragen in Sekunden
+            reference: Vergleichsframe (Standard: aktueller Bildschirm)
+
+        Returns:
+            True bei Änderung, False bei Timeout
+        """
+        timeout = config.SETTLE_TIMEOUT if timeout is None else timeout
+        poll_interval = config.SETTLE_POLL_INTERVAL if poll_interval is None else poll_interval
+
+        deadline = time.monotonic() + timeout
+        if reference is None:
+            reference = self.sample()
+
+        while time.monotonic() + poll_interval <= deadline:
+            time.sleep(poll_interval)
+            if self.frames_differ(reference, self.sample()):
+                return True
+
+        logger.debug(f"Keine Bildschirmänderung innerhalb von {timeout:.1f}s")
+        return False
+
+    def _record(self, start: float, settled: bool):
+        elapsed = time.monotonic() - start
+        self.settle_count += 1
+        self.total_settle_time += elapsed
+        if not settled:
+            self.settle_timeouts += 1
+        logger.debug(f"Settle: {'stabil' if settled else 'Timeout'} nach {elapsed * 1000:.0f} ms")
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "settle_count": self.settle_count,
+            "settle_timeouts": self.settle_timeouts,
+            "average_settle_time": self.total_settle_time / max(self.settle_count, 1),
+        }
+
+
+def main():
+    """Test-Funktion für den Settle Detector"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+    from capture_backends import create_capture_backend
+
+    print("Settle Detector Test")
+    print("=" * 50)
+
+    detector = SettleDetector(create_capture_backend())
+
+    print("Warte bis der Bildschirm stabil ist...")
+    settled = detector.wait_until_stable()
+    print(f"{'✓ Stabil' if settled else '✗ Timeout'}")
+
+    print("\nBewege ein Fenster (5 Sekunden)...")
+    changed = detector.wait_until_changed(timeout=5.0)
+    print(f"{'✓ Änderung erkannt' if changed else '✗ Keine Änderung'}")
+
+    print(f"\nStatistiken: {detector.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Stream Parser
+Inkrementelles Parsen der Action-JSON aus gestreamten Antworten (Server-Sent Events)
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Zustände auf oberster Objektebene
+_EXPECT_KEY = "key"
+_EXPECT_COLON = "colon"
+_EXPECT_VALUE = "value"
+_AFTER_VALUE = "after"
+
+
+def iter_sse_data(lines: Iterable[bytes]) -> Iterator[str]:
+    """
+    Liefert die data-Felder eines Server-Sent-Events Streams
+
+    Args:
+        lines: Zeilen des Streams (ohne Zeilenumbruch)
+
+    Returns:
+        Iterator über die data-Inhalte bis "[DONE]"
+    """
+    for line in lines:
+        if not line.startswith(b"data:"):
+            continue  # Kommentare, Leerzeilen, event:/id: Felder
+        data = line[5:].strip().decode("utf-8")
+        if data == "[DONE]":
+            return
+        yield data
+
+
+def iter_completion_deltas(lines: Iterable[bytes]) -> Iterator[str]:
+    """
+    Liefert die Text-Deltas eines gestreamten Chat Completion Requests
+
+    Args:
+        lines: Zeilen des SSE Streams
+
+    Returns:
+        Iterator über die Inhalte von choices[0].delta.content
+    """
+    for data in iter_sse_data(lines):
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+
+class IncrementalActionParser:
+    """
+    Parst ein JSON-Objekt, während es Stück für Stück ankommt
+
+    Jedes Feld der obersten Ebene steht in fields, sobald sein Wert
+    vollständig ist. Text vor dem Objekt (z.B. ```json) wird übersprungen.
+    Zahlen gelten erst als vollständig, wenn ein Komma oder die schließende
+    Klammer folgt.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.started = False
+        self.complete = False
+
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = _EXPECT_KEY
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Verarbeitet das nächste Textstück
+
+        Args:
+            chunk: Neuer Text
+
+        Returns:
+            True wenn dadurch mindestens ein Feld vollständig wurde
+        """
+        before = len(self.fields)
+        self.text += chunk
+        text = self.text
+
+        for i in range(self._position, len(text)):
+            if self.complete:
+                break
+            c = text[i]
+
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == _EXPECT_KEY:
+                        self._key = json.loads(text[self._token_start:i + 1])
+                        self._state = _EXPECT_COLON
+                    elif self._depth == 1 and self._state == _EXPECT_VALUE:
+                        self._finish_value(i + 1)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state in (_EXPECT_KEY, _EXPECT_VALUE):
+                    self._token_start = i
+            elif c in "{[":
+                if self._depth == 1 and self._state == _EXPECT_VALUE:
+                    self._token_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == _EXPECT_VALUE:
+                    self._finish_value(i + 1)
+                elif self._depth == 0:
+                    if self._state == _EXPECT_VALUE and self._token_start is not None:
+                        self._finish_value(i)
+                    self.complete = True
+            elif self._depth == 1:
+                if c == ":" and self._state == _EXPECT_COLON:
+                    self._state = _EXPECT_VALUE
+                    self._token_start = None
+                elif c == ",":
+                    if self._state == _EXPECT_VALUE and self._token_start is not None:
+                        self._finish_value(i)
+                    self._state = _EXPECT_KEY
+                elif not c.isspace() and self._state == _EXPECT_VALUE and self._token_start is None:
+                    self._token_start = i  # Zahl, true, false, null
+
+        self._position = len(text)
+        return len(self.fields) > before
+
+    def _finish_value(self, end: int):
+        raw = self.text[self._token_start:end]
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"Feld '{self._key}' nicht parsebar: {raw[:80]}")
+        self._state = _AFTER_VALUE
+        self._token_start = None
+
+    def has_fields(self, names: List[str]) -> bool:
+        """Prüft ob alle genannten Felder vollständig sind"""
+        return all(name in self.fields for name in names)
+
+
+def main():
+    """Test-Funktion für den Stream Parser"""
+    import config
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Stream Parser Test")
+    print("=" * 50)
+
+    response = ('```json\n{"action": "click", "parameters": {"x": 100, "y": 200}, '
+                '"confidence": 0.9, "is_critical": false, '
+                '"reasoning": "Ich sehe den \\"OK\\" Button unten rechts"}\n```')
+
+    parser = IncrementalActionParser()
+    for start in range(0, len(response), 7):
+        if parser.feed(response[start:start + 7]):
+            print(f"Nach {start + 7:3d} Zeichen: {sorted(parser.fields)}")
+
+    print(f"\nVollständig: {parser.complete}")
+    print(f"Felder: {parser.fields}")
+
+
+if __name__ == "__main__":
+    main()
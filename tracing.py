@@ -0,0 +1,318 @@
+"""
+Tracing
+Flight Recorder: Zeitleiste aller Abschnitte einer Aufgabe als Chrome Trace oder OTLP-JSON
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Felder eines Spans (Liste statt Objekt: geringer Overhead pro Span)
+NAME, START, END, THREAD, SPAN_ID, PARENT_ID, ATTRIBUTES = range(7)
+
+
+class Tracer:
+    """
+    Zeichnet Spans einer laufenden Aufgabe auf
+
+    start() und end() kosten wenige Mikrosekunden: ein Span ist eine Liste
+    mit perf_counter_ns Zeitstempeln, die Eltern-Beziehung kommt aus einem
+    Stack pro Thread und Aufgabe (Hintergrund-Threads beginnen jede Aufgabe
+    mit leerem Stack). Außerhalb einer Aufgabe (begin_task/end_task) wird
+    nichts aufgezeichnet. Am Ende der Aufgabe wird die Zeitleiste nach
+    TRACE_DIR geschrieben (Chrome Trace Events für chrome://tracing und
+    Perfetto oder OTLP-JSON), ältere Dateien werden gelöscht.
+    """
+
+    def __init__(self, enabled: bool = None, directory: str = None, max_spans: int = None):
+        self.enabled = config.TRACE_ENABLED if enabled is None else enabled
+        self.directory = config.TRACE_DIR if directory is None else directory
+        self.max_spans = max_spans or config.TRACE_MAX_SPANS
+
+        self.recording = False
+        self.spans: List[list] = []
+        self.dropped = 0
+        self.task_attributes: Dict = {}
+        self.trace_id = ""
+        self.last_file: Optional[str] = None
+        self.trace_count = 0
+
+        self._next_id = 1
+        self._generation = 0  # Zählt Aufgaben, ungültig gewordene Thread-Stacks werden verworfen
+        self._base_ns = 0  # perf_counter_ns beim Start der Aufgabe
+        self._base_unix_ns = 0  # Entsprechende Unix-Zeit (für OTLP)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin_task(self, task: str, **attributes):
+        """Beginnt eine neue Zeitleiste (verwirft die vorige)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans = []
+            self.dropped = 0
+            self.task_attributes = {"task": task, **attributes}
+            self.trace_id = os.urandom(16).hex()
+            self._base_ns = time.perf_counter_ns()
+            self._base_unix_ns = time.time_ns()
+            self._generation += 1
+            self.recording = True
+
+    def start(self, name: str, **attributes) -> Optional[list]:
+        """
+        Öffnet einen Span im aktuellen Thread
+
+        Args:
+            name: Name des Abschnitts
+            **attributes: Attribute (z.B. bytes, model, action)
+
+        Returns:
+            Span (für end/set) oder None wenn nicht aufgezeichnet wird
+        """
+        if not self.recording:
+            return None
+        stack = self._stack()
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return None
+            span_id = self._next_id
+            self._next_id += 1
+            span = [name, time.perf_counter_ns(), None, threading.get_ident(), span_id,
+                    stack[-1][SPAN_ID] if stack else 0, attributes]
+            self.spans.append(span)
+        stack.append(span)
+        return span
+
+    def _stack(self) -> List[list]:
+        """Span-Stack des aktuellen Threads für die laufende Aufgabe"""
+        local = self._local.__dict__
+        if local.get("generation") != self._generation:
+            local["generation"] = self._generation
+            local["stack"] = []
+        return local["stack"]
+
+    def end(self, span: Optional[list], **attributes):
+        """Schließt einen Span (None wird ignoriert)"""
+        if span is None:
+            return
+        end_ns = time.perf_counter_ns()
+        with self._lock:
+            span[END] = end_ns
+            if attributes:
+                span[ATTRIBUTES].update(attributes)
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            stack.remove(span)
+
+    def end_task(self, **attributes) -> Optional[str]:
+        """
+        Beendet die Aufzeichnung und schreibt die Zeitleiste
+
+        Args:
+            **attributes: Zusätzliche Attribute der Aufgabe (z.B. result)
+
+        Returns:
+            Pfad der Trace-Datei oder None
+        """
+        if not self.recording:
+            return None
+        with self._lock:
+            self.recording = False
+            self.task_attributes.update(attributes)
+            end_ns = time.perf_counter_ns()
+            for span in self.spans:
+                if span[END] is None:
+                    span[END] = end_ns  # Offene Spans (Abbruch) enden mit der Aufgabe
+        self.trace_count += 1
+        if self.directory:
+            self.last_file = self.write()
+        return self.last_file
+
+    def _snapshot(self) -> List[list]:
+        """Kopie der Spans (Hintergrund-Threads können noch end() aufrufen)"""
+        with self._lock:
+            return [span[:ATTRIBUTES] + [dict(span[ATTRIBUTES])] for span in self.spans]
+
+    def to_chrome_trace(self) -> Dict:
+        """Zeitleiste im Chrome Trace Event Format (Complete Events, Mikrosekunden)"""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for name, start, end, thread, span_id, parent_id, attributes in self._snapshot():
+            tid = threads.setdefault(thread, len(threads) + 1)
+            events.append({
+                "name": name, "cat": "desktopcontroller", "ph": "X", "pid": pid, "tid": tid,
+                "ts": (start - self._base_ns) / 1000, "dur": (end - start) / 1000,
+                "args": _plain(attributes),
+            })
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": names.get(thread, f"Thread {tid}")}})
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                       "args": {"name": "Desktop Controller"}})
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {**_plain(self.task_attributes), "trace_id": self.trace_id,
+                          "started_at": self._base_unix_ns / 1e9, "dropped_spans": self.dropped},
+        }
+
+    def to_otlp(self) -> Dict:
+        """Zeitleiste im OTLP-JSON Format (ExportTraceServiceRequest)"""
+        offset = self._base_unix_ns - self._base_ns
+        spans = []
+        for name, start, end, thread, span_id, parent_id, attributes in self._snapshot():
+            span = {
+                "traceId": self.trace_id,
+                "spanId": f"{span_id:016x}",
+                "name": name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(start + offset),
+                "endTimeUnixNano": str(end + offset),
+                "attributes": _otlp_attributes({**attributes, "thread.id": thread}),
+            }
+            if parent_id:
+                span["parentSpanId"] = f"{parent_id:016x}"
+            spans.append(span)
+        resource = {"service.name": "desktopcontroller", **{f"task.{key}": value
+                                                             for key, value in self.task_attributes.items()}}
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(resource)},
+            "scopeSpans": [{"scope": {"name": "desktopcontroller.tracing"}, "spans": spans}],
+        }]}
+
+    def write(self, path: str = None) -> Optional[str]:
+        """
+        Schreibt die Zeitleiste (Format: TRACE_FORMAT) und räumt alte Dateien auf
+
+        Args:
+            path: Zieldatei (Standard: TRACE_DIR/trace_<Zeit>.json)
+
+        Returns:
+            Pfad der Datei oder None bei Fehler
+        """
+        otlp = config.TRACE_FORMAT == "otlp"
+        if path is None:
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self._base_unix_ns / 1e9))
+            path = os.path.join(self.directory, f"trace_{stamp}_{self.trace_id[:8]}.json")
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.to_otlp() if otlp else self.to_chrome_trace(), f, ensure_ascii=False,
+                          separators=(",", ":"))
+            logger.debug(f"Trace gespeichert: {path} ({len(self.spans)} Spans)")
+        except OSError as e:
+            logger.warning(f"Trace konnte nicht gespeichert werden: {e}")
+            return None
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Behält nur die neuesten TRACE_MAX_FILES Dateien"""
+        try:
+            files = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                           if name.startswith("trace_") and name.endswith(".json"))
+            for path in files[:-config.TRACE_MAX_FILES]:
+                os.remove(path)
+        except OSError as e:
+            logger.debug(f"Alte Traces konnten nicht gelöscht werden: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "traces": self.trace_count,
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped,
+            "last_file": self.last_file,
+        }
+
+
+def _plain(attributes: Dict) -> Dict:
+    """Attribute JSON-fähig machen (unbekannte Typen als Text)"""
+    return {key: value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+            for key, value in attributes.items()}
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    """Attribute als OTLP KeyValue-Liste"""
+    result = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+# Gemeinsamer Tracer aller Komponenten im Prozess
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Gemeinsamer Tracer des Prozesses"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def main():
+    """Test-Funktion für den Tracer"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Tracing Test")
+    print("=" * 50)
+
+    tracer = Tracer(enabled=True, directory="")
+    tracer.begin_task("Test")
+    for step in range(1, 4):
+        step_span = tracer.start("step", step=step)
+        for name, duration in (("grab", 0.004), ("encode", 0.02), ("api_request", 0.05)):
+            span = tracer.start(name)
+            time.sleep(duration)
+            tracer.end(span, bytes=1234)
+        tracer.end(step_span, action="click", confidence=0.9)
+    tracer.end_task(result="success")
+
+    # Overhead pro Span
+    tracer.begin_task("Overhead")
+    start = time.perf_counter()
+    for _ in range(10000):
+        tracer.end(tracer.start("leer"))
+    elapsed = time.perf_counter() - start
+    tracer.end_task()
+    print(f"Overhead: {elapsed / 10000 * 1e6:.2f} µs pro Span")
+
+    trace = Tracer(enabled=True, directory="")
+    trace.begin_task("Export")
+    trace.end(trace.start("step"))
+    trace.end_task()
+    print(json.dumps(trace.to_chrome_trace()["traceEvents"][0], ensure_ascii=False))
+    print(json.dumps(trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"][0], ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
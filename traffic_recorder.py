@@ -0,0 +1,238 @@
+"""
+Traffic Recorder
+Aufzeichnung der Groq Requests mit Antworten und Latenzen für das Replay im Mock Server
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Mapping, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def request_fingerprint(request: Dict, include_images: bool = True) -> str:
+    """
+    Fingerprint eines Chat Completion Requests
+
+    Bilder gehen als Hash ein, "stream" und Sampling-Parameter gar nicht.
+
+    Args:
+        request: Request Dictionary
+        include_images: False = nur Modell und Texte (Bildschirm darf abweichen)
+
+    Returns:
+        Hex-String
+    """
+    messages = []
+    for message in request.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if part.get("type") == "image_url":
+                    url = (part.get("image_url") or {}).get("url", "")
+                    parts.append(_digest(url) if include_images else "<image>")
+                else:
+                    parts.append(part.get("text", ""))
+            content = parts
+        messages.append([message.get("role"), content])
+    return _digest(json.dumps([request.get("model"), messages], ensure_ascii=False))
+
+
+class TrafficRecorder:
+    """
+    Hängt jeden beantworteten Request als JSON-Zeile an eine Datei an
+
+    Gespeichert werden die Fingerprints des Requests, der Text der Antwort,
+    Status, Rate-Limit-Header, Token-Verbrauch und die gemessene Latenz,
+    aber keine Bilder. MockGroqServer spielt die Datei wieder ab.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.TRAFFIC_RECORD_FILE
+        self.record_count = 0
+        self._lock = threading.Lock()
+
+    def record(self, body: bytes, status: int, headers: Mapping[str, str], content: Optional[str],
+               latency: float, usage: Dict = None):
+        """
+        Speichert einen Request mit Antwort
+
+        Args:
+            body: Gesendeter Request Body
+            status: HTTP Status
+            headers: Response Header
+            content: Text der Antwort (choices[0].message.content)
+            latency: Zeit bis zur vollständigen Antwort in Sekunden
+            usage: Token-Verbrauch laut API (optional)
+        """
+        try:
+            request = json.loads(body)
+        except ValueError:
+            logger.debug("Request nicht aufgezeichnet: kein gültiges JSON")
+            return
+
+        entry = {
+            "fingerprint": request_fingerprint(request),
+            "text_fingerprint": request_fingerprint(request, include_images=False),
+            "model": request.get("model"),
+            "stream": bool(request.get("stream")),
+            "status": status,
+            "headers": {name.lower(): value for name, value in headers.items()
+                        if name.lower().startswith("x-ratelimit-") or name.lower() == "retry-after"},
+            "content": content,
+            "usage": usage,
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                self.record_count += 1
+            except OSError as e:
+                logger.warning(f"Aufzeichnung fehlgeschlagen: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {"path": self.path, "records": self.record_count}
+
+
+def load_recording(path: str) -> List[Dict]:
+    """
+    Lädt eine Aufzeichnung
+
+    Args:
+        path: JSONL-Datei von TrafficRecorder
+
+    Returns:
+        Liste der Einträge in Aufnahmereihenfolge
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"{path}:{number}: ungültige Zeile übersprungen")
+    return records
+
+
+class ReplayStore:
+    """
+    Ordnet eingehenden Requests die aufgezeichneten Antworten zu
+
+    Reihenfolge der Suche: gleicher Fingerprint (identischer Request), gleicher
+    Text-Fingerprint (nur der Bildschirm weicht ab), sonst der nächste noch
+    nicht verwendete Eintrag in Aufnahmereihenfolge. Jeder Eintrag wird nur
+    einmal ausgeliefert.
+    """
+
+    def __init__(self, records: List[Dict]):
+        self.records = [record for record in records if record.get("content") is not None]
+        self._by_fingerprint: Dict[str, Deque[int]] = defaultdict(deque)
+        self._by_text: Dict[str, Deque[int]] = defaultdict(deque)
+        for index, record in enumerate(self.records):
+            self._by_fingerprint[record.get("fingerprint")].append(index)
+            self._by_text[record.get("text_fingerprint")].append(index)
+
+        self._used = set()
+        self._next = 0
+        self._lock = threading.Lock()
+        self.matches = {"exact": 0, "text": 0, "sequential": 0, "miss": 0}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ReplayStore":
+        return cls(load_recording(path))
+
+    def match(self, request: Dict) -> Optional[Dict]:
+        """
+        Sucht die Antwort zu einem Request
+
+        Args:
+            request: Eingehender Request
+
+        Returns:
+            Aufgezeichneter Eintrag oder None (Aufzeichnung erschöpft)
+        """
+        with self._lock:
+            for kind, index, fingerprint in (
+                    ("exact", self._by_fingerprint, request_fingerprint(request)),
+                    ("text", self._by_text, request_fingerprint(request, include_images=False))):
+                queue = index.get(fingerprint)
+                while queue:
+                    position = queue.popleft()
+                    if position not in self._used:
+                        return self._take(kind, position)
+
+            while self._next < len(self.records):
+                position = self._next
+                self._next += 1
+                if position not in self._used:
+                    return self._take("sequential", position)
+
+            self.matches["miss"] += 1
+            return None
+
+    def _take(self, kind: str, position: int) -> Dict:
+        self._used.add(position)
+        self.matches[kind] += 1
+        return self.records[position]
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        with self._lock:
+            return dict(self.matches, remaining=len(self.records) - len(self._used))
+
+
+def main():
+    """Test-Funktion für den Traffic Recorder"""
+    import os
+    import tempfile
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Traffic Recorder Test")
+    print("=" * 50)
+
+    def make_request(task: str, image: str) -> Dict:
+        return {"model": config.GROQ_MODEL, "stream": False, "messages": [
+            {"role": "system", "content": "System"},
+            {"role": "user", "content": [{"type": "text", "text": task},
+                                         {"type": "image_url", "image_url": {"url": image}}]}]}
+
+    path = os.path.join(tempfile.mkdtemp(), "traffic.jsonl")
+    recorder = TrafficRecorder(path)
+    for step in range(3):
+        body = json.dumps(make_request(f"Schritt {step}", f"data:image/jpeg;base64,BILD{step}")).encode()
+        recorder.record(body, 200, {"x-ratelimit-remaining-tokens": "5000"},
+                        json.dumps({"action": "wait", "parameters": {"seconds": step}}), 0.5 + step)
+    print(f"Aufgezeichnet: {recorder.get_stats()}")
+
+    store = ReplayStore.from_file(path)
+    print(f"Gleicher Request:     {store.match(make_request('Schritt 1', 'data:image/jpeg;base64,BILD1'))['content']}")
+    print(f"Anderer Bildschirm:   {store.match(make_request('Schritt 2', 'data:image/jpeg;base64,NEU'))['content']}")
+    print(f"Unbekannter Request:  {store.match(make_request('Neu', 'data:image/jpeg;base64,X'))['content']}")
+    print(f"Erschöpft:            {store.match(make_request('Neu', 'data:image/jpeg;base64,X'))}")
+    print(f"\nStatistiken: {store.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
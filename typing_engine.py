@@ -0,0 +1,356 @@
+"""
+Typing Engine
+Schnelle Texteingabe über das Input-Backend: Tastenereignisse in Blöcken oder Einfügen über die Zwischenablage
+"""
+
+import logging
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import config
+from input_backends import InputBackend, create_input_backend, timing_policy
+
+try:
+    import pyperclip
+except ImportError:  # Optional: pip install pyperclip (Abhängigkeit von PyAutoGUI)
+    pyperclip = None
+
+logger = logging.getLogger(__name__)
+
+
+class Typer:
+    """Basisklasse für Strategien der Texteingabe (alle Tasten über das Input-Backend)"""
+
+    name = "base"
+
+    def __init__(self, backend: InputBackend):
+        self.backend = backend
+
+    def supports(self, text: str) -> bool:
+        """Kann diese Strategie den Text vollständig eingeben?"""
+        return True
+
+    def type(self, text: str) -> bool:
+        """
+        Gibt den Text im fokussierten Fenster ein
+
+        Returns:
+            True wenn alle Eingaben gesendet wurden
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Gibt Ressourcen frei"""
+        pass
+
+
+class KeyTyper(Typer):
+    """
+    Tippt den Text als Tastenereignisse des Input-Backends in Blöcken
+
+    Backends mit gebündelten Tastenereignissen (XTest) tippen ohne Pause pro
+    Zeichen. Sonst startet das Intervall bei key_interval der Timing-Policy
+    (Standard TYPING_KEY_INTERVAL), verdoppelt sich nach einer
+    fehlgeschlagenen Prüfung (höchstens bis TYPING_INTERVAL) und sinkt nach
+    erfolgreichen Prüfungen wieder (bis TYPING_MIN_INTERVAL).
+    """
+
+    name = "keys"
+
+    def __init__(self, backend: InputBackend):
+        super().__init__(backend)
+        self.interval = timing_policy("type_text")["key_interval"]
+
+    def current_interval(self) -> float:
+        """Pause nach jedem Zeichen in Sekunden"""
+        return 0.0 if self.backend.batched_typing else self.interval
+
+    def supports(self, text: str) -> bool:
+        return self.backend.can_type(text.replace("\r\n", "\n"))
+
+    def type(self, text: str) -> bool:
+        text = text.replace("\r\n", "\n")
+        interval = self.current_interval()
+        for start in range(0, len(text), config.TYPING_CHUNK_SIZE):
+            self.backend.check_failsafe()
+            self.backend.type_chars(text[start:start + config.TYPING_CHUNK_SIZE], interval)
+            time.sleep(config.TYPING_CHUNK_PAUSE)
+        return True
+
+    def slower(self):
+        self.interval = min(max(self.interval * 2, 0.005), config.TYPING_INTERVAL)
+        logger.info(f"Tipp-Intervall erhöht auf {self.interval * 1000:.0f} ms")
+
+    def faster(self):
+        self.interval = max(self.interval * 0.8, config.TYPING_MIN_INTERVAL)
+
+
+class ClipboardTyper(Typer):
+    """
+    Fügt den Text über die Zwischenablage ein und stellt sie danach wieder her
+
+    Unabhängig von Länge und Zeichensatz ein Tastendruck pro Zeile:
+    Zeilenumbrüche und Tabs werden wie beim Tippen als Enter/Tab gedrückt.
+    Nur der Textinhalt der Zwischenablage wird wiederhergestellt (Bilder
+    gehen verloren), und Zwischenablage-Manager sehen den Text.
+    """
+
+    name = "clipboard"
+
+    def __init__(self, backend: InputBackend):
+        super().__init__(backend)
+        if pyperclip is None:
+            raise RuntimeError("pyperclip nicht installiert")
+        pyperclip.paste()  # Wirft, wenn kein Mechanismus verfügbar ist (z.B. xclip fehlt)
+        self.hotkey = config.TYPING_PASTE_HOTKEY or (["command", "v"] if sys.platform == "darwin"
+                                                     else ["ctrl", "v"])
+        self.sent = False  # Letzter Aufruf hat bereits Tasten gesendet
+
+    def type(self, text: str) -> bool:
+        previous = self.read()
+        self.sent = False
+        try:
+            for part in re.split(r"(\r\n|\n|\t)", text):
+                if not part:
+                    continue
+                self.backend.check_failsafe()
+                if part == "\t":
+                    self.backend.press("tab")
+                elif part in ("\n", "\r\n"):
+                    self.backend.press("enter")
+                else:
+                    pyperclip.copy(part)
+                    if self.read() != part:
+                        logger.warning("Zwischenablage hat den Text nicht übernommen")
+                        return False
+                    self.backend.hotkey(*self.hotkey)
+                    # Die Anwendung liest die Zwischenablage asynchron: erst danach weiter
+                    time.sleep(config.TYPING_PASTE_RESTORE_DELAY)
+                self.sent = True
+        finally:
+            if previous is not None and config.TYPING_RESTORE_CLIPBOARD:
+                pyperclip.copy(previous)
+        return True
+
+    @staticmethod
+    def read() -> Optional[str]:
+        """Textinhalt der Zwischenablage oder None"""
+        try:
+            return pyperclip.paste()
+        except pyperclip.PyperclipException as e:
+            logger.debug(f"Zwischenablage nicht lesbar: {e}")
+            return None
+
+
+TYPERS = {
+    KeyTyper.name: KeyTyper,
+    ClipboardTyper.name: ClipboardTyper,
+}
+
+
+def select_all_readback(backend: InputBackend, expected: str) -> Optional[bool]:
+    """
+    Prüft das Eingabefeld über Alles markieren + Kopieren
+
+    Nur für einzeilige Formularfelder gedacht (markiert den ganzen Inhalt
+    und setzt den Cursor danach ans Ende). Die Zwischenablage wird
+    wiederhergestellt.
+
+    Args:
+        backend: Input-Backend für die Tastenkombinationen
+        expected: Eingegebener Text
+
+    Returns:
+        True/False oder None wenn keine Prüfung möglich ist
+    """
+    if pyperclip is None:
+        return None
+    try:
+        previous = pyperclip.paste()
+    except pyperclip.PyperclipException as e:
+        logger.debug(f"Prüfung nicht möglich: {e}")
+        return None
+    try:
+        pyperclip.copy("")
+        select, copy = (["command", "a"], ["command", "c"]) if sys.platform == "darwin" \
+            else (["ctrl", "a"], ["ctrl", "c"])
+        backend.hotkey(*select)
+        backend.hotkey(*copy)
+        time.sleep(config.TYPING_PASTE_RESTORE_DELAY)
+        content = pyperclip.paste()
+        backend.press("end")
+    except pyperclip.PyperclipException as e:
+        logger.debug(f"Prüfung nicht möglich: {e}")
+        return None
+    finally:
+        pyperclip.copy(previous)
+    if not content:
+        return None  # Feld unterstützt kein Kopieren (z.B. Passwortfeld)
+    return content.replace("\r\n", "\n").endswith(expected.replace("\r\n", "\n"))
+
+
+class TypingEngine:
+    """
+    Wählt pro Text die schnellste sichere Eingabe-Strategie
+
+    Alle Tastenereignisse laufen über das Input-Backend (Notfall-Stop und
+    Timing-Policy gelten auch beim Tippen). Reihenfolge bei "auto":
+    Tastenereignisse, wenn das Backend sie bündelt (XTest, auch Unicode,
+    lässt die Zwischenablage in Ruhe), Zwischenablage ab
+    TYPING_PASTE_MIN_LENGTH Zeichen oder für nicht-ASCII Texte, sonst
+    Tastenereignisse. Scheitert das Einfügen, bevor etwas gesendet wurde,
+    wird per Tastenereignisse getippt. Nicht verfügbare Strategien
+    werden beim ersten Versuch erkannt und übersprungen. Ein optionaler
+    Verifier prüft das Ergebnis (None = keine Aussage möglich).
+    """
+
+    def __init__(self, input_backend: InputBackend, strategy: str = None,
+                 verifier: Callable[[InputBackend, str], Optional[bool]] = None):
+        self.input = input_backend
+        self.strategy = strategy or config.TYPING_STRATEGY
+        if self.strategy != "auto" and self.strategy not in TYPERS:
+            raise ValueError(f"Unbekannte Tipp-Strategie: {self.strategy}")
+        if verifier is None and config.TYPING_VERIFY:
+            verifier = select_all_readback
+        self.verifier = verifier
+
+        self._typers: Dict[str, Optional[Typer]] = {}
+        self.counts = {name: 0 for name in TYPERS}
+        self.characters = 0
+        self.total_time = 0.0
+        self.verify_failures = 0
+        self.paste_failures = 0
+
+    def _typer(self, name: str) -> Optional[Typer]:
+        """Strategie (einmalig erzeugt) oder None wenn nicht verfügbar"""
+        if name not in self._typers:
+            try:
+                self._typers[name] = TYPERS[name](self.input)
+            except Exception as e:
+                logger.info(f"Tipp-Strategie {name} nicht verfügbar: {e}")
+                self._typers[name] = None
+        return self._typers[name]
+
+    def candidates(self, text: str) -> List[str]:
+        """Strategien in der Reihenfolge, in der sie versucht werden"""
+        order = []
+        if self.input.batched_typing:
+            order.append(KeyTyper.name)
+        if not text.isascii() or len(text) >= config.TYPING_PASTE_MIN_LENGTH:
+            order.append(ClipboardTyper.name)
+        order += [KeyTyper.name, ClipboardTyper.name]
+        if self.strategy != "auto":
+            order.insert(0, self.strategy)
+        return list(dict.fromkeys(order))
+
+    def select(self, text: str) -> Optional[Typer]:
+        """Erste verfügbare Strategie, die den Text vollständig eingeben kann"""
+        for name in self.candidates(text):
+            typer = self._typer(name)
+            if typer is not None and typer.supports(text):
+                return typer
+        return None
+
+    def type_text(self, text: str) -> bool:
+        """
+        Gibt den Text im fokussierten Fenster ein
+
+        Args:
+            text: Einzugebender Text (beliebige Unicode-Zeichen)
+
+        Returns:
+            True bei Erfolg (und bestandener Prüfung, falls möglich)
+        """
+        if not text:
+            return True
+        typer = self.select(text)
+        if typer is None:
+            logger.error(f"Text enthält Zeichen, die weder per {self.input.name} noch über die "
+                         f"Zwischenablage eingegeben werden können")
+            return False
+
+        start = time.perf_counter()
+        success = typer.type(text)
+        if not success and isinstance(typer, ClipboardTyper) and not typer.sent:
+            # Zwischenablage hat nichts eingefügt: per Tastenereignisse tippen
+            self.paste_failures += 1
+            keys = self._typer(KeyTyper.name)
+            if keys is not None and keys.supports(text):
+                logger.info("Einfügen fehlgeschlagen, tippe per Tastenereignisse")
+                typer = keys
+                success = typer.type(text)
+        elapsed = time.perf_counter() - start
+        self.counts[typer.name] += 1
+        self.characters += len(text)
+        self.total_time += elapsed
+        logger.debug(f"{len(text)} Zeichen per {typer.name} in {elapsed * 1000:.0f} ms")
+        if not success or self.verifier is None:
+            return success
+
+        verified = self.verifier(self.input, text)
+        if verified is False:
+            self.verify_failures += 1
+            logger.warning(f"Eingabe per {typer.name} stimmt nicht mit dem Text überein")
+            if isinstance(typer, KeyTyper):
+                typer.slower()
+            return False
+        if verified and isinstance(typer, KeyTyper):
+            typer.faster()
+        return True
+
+    def close(self):
+        for typer in self._typers.values():
+            if typer is not None:
+                typer.close()
+        self._typers.clear()
+
+    def get_stats(self) -> Dict:
+        """Gibt Statistiken zurück"""
+        return {
+            "strategy": self.strategy,
+            "available": [name for name, typer in self._typers.items() if typer is not None],
+            "counts": dict(self.counts),
+            "characters": self.characters,
+            "chars_per_second": self.characters / self.total_time if self.total_time else 0.0,
+            "verify_failures": self.verify_failures,
+            "paste_failures": self.paste_failures,
+        }
+
+
+def main():
+    """Test-Funktion für die Typing Engine"""
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format=config.LOG_FORMAT
+    )
+
+    print("Typing Engine Test")
+    print("=" * 50)
+
+    backend = create_input_backend()
+    engine = TypingEngine(backend)
+    samples = ["hallo", "Grüße aus Köln – 5 €", "x" * 400]
+    for text in samples:
+        typer = engine.select(text)
+        print(f"{text[:30]!r:35} -> {typer.name if typer else 'keine Strategie'}")
+
+    print("\nTippe Testtext ins fokussierte Fenster (3 Sekunden Pause)...")
+    time.sleep(3)
+    for name in TYPERS:
+        typer = engine._typer(name)
+        text = f"{name}: Schnelltest äöü ß 12345\n"
+        if typer is None or not typer.supports(text):
+            print(f"✗ {name}: {'nicht verfügbar' if typer is None else 'Text nicht unterstützt'}")
+            continue
+        start = time.perf_counter()
+        typer.type(text)
+        elapsed = time.perf_counter() - start
+        print(f"✓ {name}: {len(text) / elapsed:.0f} Zeichen/s")
+    engine.close()
+    backend.close()
+
+
+if __name__ == "__main__":
+    main()